@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Indexed alert-rule engine for price ratios.
+
+Every rule watches one scalar metric of a ratio: the price itself, its
+percentage change over a time window, or its realized volatility over a window.
+Rules are levels on that metric (`above`, `below`, or a `band` of both), with a
+small hysteresis so a value hovering at a level does not flap.
+
+A rule's state can only change when its metric crosses one of the rule's
+boundaries (the level, or the level minus the hysteresis). The boundaries of
+all rules on a metric are kept in one sorted array, so an update from value a
+to value b only evaluates the rules with a boundary between a and b: two binary
+searches, however many thousands of rules are loaded.
+
+Rule file (JSON), hot-reloaded when it changes on disk:
+    {"rules": [
+        {"id": "eth-wbtc-high", "ratio": "ETH/WBTC", "type": "above", "level": 0.04},
+        {"ratio": "ETH/WBTC", "type": "band", "lower": 0.03, "upper": 0.04, "cooldown": 600},
+        {"ratio": "WBTC/USD", "type": "pct_change", "pct": 5, "window": 3600},
+        {"ratio": "WBTC/USD", "type": "volatility", "max": 2.5, "window": 3600}
+    ]}
+
+`pct_change` alerts when the ratio moved more than `pct` percent (either way)
+over the last `window` seconds; `volatility` when the realized volatility (root
+of the summed squared log returns, in percent) over the window exceeds `max`.
+
+Usage:
+    engine = RuleEngine([("alert_rules.json", load_rule_file)])
+    for rule, state, message in engine.update("ETH/WBTC", 0.0412):
+        notifier.update(rule.id, state, message, rule.cooldown)
+"""
+import json
+import math
+import os
+import time
+from bisect import bisect_left, bisect_right
+
+# Fraction of a level's magnitude the metric must move back before an alert clears
+DEFAULT_HYSTERESIS = 0.002
+
+# Seconds between checks of the rule files' modification times
+RELOAD_CHECK_INTERVAL = 1.0
+
+PRICE = ("price", 0)
+
+class Rule:
+    """A level rule on one metric of a ratio: alerts 'above' `upper` and/or 'below' `lower`."""
+
+    def __init__(self, rule_id, ratio, metric, lower=None, upper=None, hysteresis=DEFAULT_HYSTERESIS,
+                 cooldown=None, name=None):
+        self.id = rule_id
+        self.ratio = ratio
+        self.metric = metric
+        self.lower = lower
+        self.upper = upper
+        self.hysteresis = hysteresis
+        self.cooldown = cooldown
+        self.name = name or rule_id
+
+    def boundaries(self):
+        """Metric values at which the rule's state can change."""
+        values = []
+        if self.upper is not None:
+            values += [self.upper, self.upper - self.hysteresis * abs(self.upper)]
+        if self.lower is not None:
+            values += [self.lower, self.lower + self.hysteresis * abs(self.lower)]
+        return values
+
+    def evaluate(self, value, state):
+        """Returns the new state ('above', 'below' or None) for a metric value."""
+        if self.upper is not None:
+            limit = self.upper - self.hysteresis * abs(self.upper) if state == "above" else self.upper
+            if value > limit:
+                return "above"
+        if self.lower is not None:
+            limit = self.lower + self.hysteresis * abs(self.lower) if state == "below" else self.lower
+            if value < limit:
+                return "below"
+        return None
+
+    def message(self, state, value):
+        kind, window = self.metric
+        subject = {
+            "price": self.ratio,
+            "change": f"{self.ratio} change over {window:g}s (%)",
+            "volatility": f"{self.ratio} volatility over {window:g}s (%)",
+        }[kind]
+        if state == "above":
+            return f"📈 {subject} is above {self.name}!\n\nCurrent: {value:.8g}\nUpper: {self.upper:.8g}"
+        return f"📉 {subject} is below {self.name}!\n\nCurrent: {value:.8g}\nLower: {self.lower:.8g}"
+
+def rule_from_dict(entry, default_id):
+    """Builds a Rule from one entry of a rule file."""
+    kind = entry["type"]
+    options = {
+        "rule_id": str(entry.get("id", default_id)),
+        "ratio": entry["ratio"],
+        "hysteresis": entry.get("hysteresis", DEFAULT_HYSTERESIS),
+        "cooldown": entry.get("cooldown"),
+        "name": entry.get("name"),
+    }
+    if kind == "above":
+        return Rule(metric=PRICE, upper=entry["level"], **options)
+    if kind == "below":
+        return Rule(metric=PRICE, lower=entry["level"], **options)
+    if kind == "band":
+        return Rule(metric=PRICE, lower=entry["lower"], upper=entry["upper"], **options)
+    if kind == "pct_change":
+        return Rule(metric=("change", entry["window"]), lower=-entry["pct"], upper=entry["pct"], **options)
+    if kind == "volatility":
+        return Rule(metric=("volatility", entry["window"]), upper=entry["max"], **options)
+    raise ValueError(f"Unknown rule type {kind!r}")
+
+def load_rule_file(path):
+    """Reads the rule dicts of a JSON rule file."""
+    with open(path, "r") as f:
+        return json.load(f)["rules"]
+
+# --- Indexes ---
+
+class MetricIndex:
+    """Rules on one metric of one ratio, indexed by their sorted boundaries."""
+
+    def __init__(self, rules):
+        pairs = sorted(((value, rule) for rule in rules for value in rule.boundaries()), key=lambda pair: pair[0])
+        self.values = [value for value, _ in pairs]
+        self.rules = [rule for _, rule in pairs]
+        self.all_rules = list(rules)
+        self.last_value = None
+
+    def crossed(self, old, new):
+        """Rules with a boundary between two metric values."""
+        low, high = min(old, new), max(old, new)
+        start, end = bisect_left(self.values, low), bisect_right(self.values, high)
+        return list({id(rule): rule for rule in self.rules[start:end]}.values())
+
+class History:
+    """Timestamped prices of a ratio with prefix sums of squared log returns."""
+
+    def __init__(self):
+        self.times = []
+        self.prices = []
+        self.squared_returns = [0.0]
+        self.start = 0
+
+    def add(self, now, price, keep):
+        if self.prices and price > 0 and self.prices[-1] > 0:
+            squared = math.log(price / self.prices[-1]) ** 2
+        else:
+            squared = 0.0
+        self.times.append(now)
+        self.prices.append(price)
+        self.squared_returns.append(self.squared_returns[-1] + squared)
+        # Drop samples older than the longest window, compacting now and then
+        self.start = bisect_left(self.times, now - keep, self.start)
+        if self.start > 1024 and self.start > len(self.times) // 2:
+            self.times = self.times[self.start - 1:]
+            self.prices = self.prices[self.start - 1:]
+            self.squared_returns = self.squared_returns[self.start - 1:]
+            self.start = 1
+
+    def _window_start(self, now, window):
+        return max(bisect_left(self.times, now - window, self.start) - 1, self.start, 0)
+
+    def change(self, now, window):
+        """Percentage change of the price since `window` seconds ago (the oldest sample within it)."""
+        reference = self.prices[self._window_start(now, window)]
+        return (self.prices[-1] / reference - 1) * 100 if reference else 0.0
+
+    def volatility(self, now, window):
+        """Realized volatility over the last `window` seconds, in percent."""
+        first = self._window_start(now, window)
+        return math.sqrt(self.squared_returns[-1] - self.squared_returns[first + 1]) * 100
+
+# --- Engine ---
+
+class RuleEngine:
+    """
+    Evaluates many rules over many ratios. `sources` is a list of (path, loader) pairs,
+    where loader(path) returns rule dicts; they are reloaded whenever a file changes.
+    `static_rules` are Rule objects that are always active.
+    """
+
+    def __init__(self, sources=(), static_rules=()):
+        self.sources = list(sources)
+        self.static_rules = list(static_rules)
+        self.states = {}
+        self.indexes = {}
+        self.histories = {}
+        self._mtimes = None
+        self._next_check = 0.0
+        self.reload_if_changed(force=True)
+
+    @property
+    def rule_count(self):
+        return sum(len(index.all_rules) for index in self.indexes.values())
+
+    def rules(self, ratio=None):
+        """All loaded rules, or those of one ratio."""
+        return [rule for (name, _), index in self.indexes.items() if ratio in (None, name) for rule in index.all_rules]
+
+    def _file_mtimes(self):
+        mtimes = []
+        for path, _ in self.sources:
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return mtimes
+
+    def reload_if_changed(self, force=False):
+        """Rebuilds the indexes if a rule file changed. Returns True if rules were (re)loaded."""
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return False
+        self._next_check = now + RELOAD_CHECK_INTERVAL
+        mtimes = self._file_mtimes()
+        if not force and mtimes == self._mtimes:
+            return False
+
+        rules = list(self.static_rules)
+        for (path, loader), mtime in zip(self.sources, mtimes):
+            if mtime is None:
+                continue
+            try:
+                entries = loader(path) or []
+                rules += [rule_from_dict(entry, f"{path}#{i}") for i, entry in enumerate(entries)]
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                # The mtimes are not recorded, so the files are retried at the next check
+                print(f"Error loading alert rules from {path}: {e}. Keeping the previous rules.")
+                return False
+        self._mtimes = mtimes
+
+        grouped = {}
+        for rule in rules:
+            grouped.setdefault((rule.ratio, rule.metric), []).append(rule)
+        self.indexes = {key: MetricIndex(group) for key, group in grouped.items()}
+        # States of rules that still exist survive a reload
+        active = {rule.id for rule in rules}
+        self.states = {rule_id: state for rule_id, state in self.states.items() if rule_id in active}
+        if not force:
+            print(f"Reloaded {len(rules)} alert rules.")
+        return True
+
+    def _metric_value(self, ratio, metric, price, now):
+        kind, window = metric
+        if kind == "price":
+            return price
+        history = self.histories[ratio]
+        return history.change(now, window) if kind == "change" else history.volatility(now, window)
+
+    def update(self, ratio, price, now=None):
+        """
+        Feeds a new price of a ratio. Returns [(rule, state, message)] for every rule
+        whose state changed (state None means the rule cleared).
+        """
+        self.reload_if_changed()
+        now = time.time() if now is None else now
+        windows = [window for (name, (kind, window)) in self.indexes if name == ratio and kind != "price"]
+        if windows:
+            self.histories.setdefault(ratio, History()).add(now, price, max(windows))
+
+        transitions = []
+        for (name, metric), index in self.indexes.items():
+            if name != ratio:
+                continue
+            value = self._metric_value(ratio, metric, price, now)
+            candidates = index.all_rules if index.last_value is None else index.crossed(index.last_value, value)
+            index.last_value = value
+            for rule in candidates:
+                state = self.states.get(rule.id)
+                new_state = rule.evaluate(value, state)
+                if new_state != state:
+                    self.states[rule.id] = new_state
+                    transitions.append((rule, new_state, rule.message(new_state, value) if new_state else None))
+        return transitions
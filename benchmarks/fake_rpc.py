@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for an Arbitrum JSON-RPC node, for benchmarks.
+
+The node serves a recording: a table of contract reads (target, calldata) and
+their raw return data. `eth_call`s are answered from it, and Multicall3
+`aggregate3` calls are unpacked and answered call by call, exactly like the
+real contract does. Reads that are not in the recording behave like calls to an
+address without code (success, empty return data), which is also what the
+CREATE2-derived address of a pool that does not exist returns.
+
+Every HTTP request waits `latency` seconds before it is answered, so round trips
+cost what they cost against a remote node, and the server counts HTTP requests
+(round trips) and JSON-RPC calls per method.
+
+`build_fixtures()` records a synthetic but realistic chain: token metadata,
+`getPool`, pools with slot0/liquidity/fee growth/ticks, and an owner with any
+number of NonfungiblePositionManager positions.
+
+Usage:
+    recording, info = build_fixtures(positions=500, pairs=200)
+    with FakeRPCServer(recording, latency=0.02) as server:
+        w3 = create_web3([server.url])
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import (FACTORY_ADDRESS, NFPM_ADDRESS, POSITION_TYPES, SLOT0_TYPES, TICK_TYPES, USDC_ADDRESS,
+                  WBTC_ADDRESS, WETH_ADDRESS, compute_pool_address, sort_tokens)
+from multicall import AGGREGATE3_SELECTOR, MULTICALL3_ADDRESS, Call
+from tick_math import get_sqrt_ratio_at_tick
+
+ARBITRUM_CHAIN_ID = 42161
+
+# Block number reported by eth_blockNumber
+FAKE_BLOCK_NUMBER = 250_000_000
+
+# Owner of every recorded position
+FAKE_OWNER = "0x000000000000000000000000000000000000bEEF"
+
+# Positions are spread over this many of the recorded pools
+POSITION_POOLS = 20
+
+# --- Recording ---
+
+class Recording:
+    """Raw return data of contract reads, keyed by (target, calldata)."""
+
+    def __init__(self):
+        self.reads = {}
+
+    def add(self, target, signature, args, returns, values):
+        from eth_abi import encode
+        calldata = Call(target, signature, args).encode()
+        self.reads[(target.lower(), calldata)] = encode(returns, values)
+
+    def answer(self, target, calldata):
+        """Returns (success, return data) for a read, like a call to a contract would."""
+        return True, self.reads.get((target.lower(), bytes(calldata)), b"")
+
+def _address(label):
+    """A deterministic checksummed address for a synthetic contract."""
+    from eth_utils import keccak, to_checksum_address
+    return to_checksum_address(keccak(text=label)[12:])
+
+def build_fixtures(positions=500, pairs=200, tick_spacing=60):
+    """
+    Records `pairs` pools (WETH/USDC and WBTC/WETH first, then synthetic tokens against
+    WETH) and `positions` positions of FAKE_OWNER. Returns the recording and a dict with
+    the pairs, position IDs and owner.
+    """
+    recording = Recording()
+    tokens = {WETH_ADDRESS: ("WETH", 18), USDC_ADDRESS: ("USDC", 6), WBTC_ADDRESS: ("WBTC", 8)}
+    pair_list = [(WETH_ADDRESS, USDC_ADDRESS), (WBTC_ADDRESS, WETH_ADDRESS)]
+    for i in range(max(0, pairs - len(pair_list))):
+        token = _address(f"token{i}")
+        tokens[token] = (f"TKN{i}", 18)
+        pair_list.append((token, WETH_ADDRESS))
+    pair_list = pair_list[:pairs]
+
+    for token, (symbol, decimals) in tokens.items():
+        recording.add(token, "symbol()", [], ["string"], [symbol])
+        recording.add(token, "decimals()", [], ["uint8"], [decimals])
+
+    pools = []
+    for i, (token_a, token_b) in enumerate(pair_list):
+        token0, token1 = sort_tokens(token_a, token_b)
+        fee = 3000
+        pool = compute_pool_address(token0, token1, fee)
+        tick = (i * 7919) % 20000 - 10000
+        pools.append((pool, token0, token1, fee, tick))
+        for a, b in ((token0, token1), (token1, token0)):
+            recording.add(FACTORY_ADDRESS, "getPool(address,address,uint24)", [a, b, fee], ["address"], [pool])
+        recording.add(pool, "slot0()", [], SLOT0_TYPES, [get_sqrt_ratio_at_tick(tick), tick, 0, 1, 1, 0, True])
+        recording.add(pool, "liquidity()", [], ["uint128"], [10 ** 18 + i])
+        recording.add(pool, "feeGrowthGlobal0X128()", [], ["uint256"], [5 << 128])
+        recording.add(pool, "feeGrowthGlobal1X128()", [], ["uint256"], [7 << 128])
+
+    position_ids = list(range(1_000_000, 1_000_000 + positions))
+    recording.add(NFPM_ADDRESS, "balanceOf(address)", [FAKE_OWNER], ["uint256"], [positions])
+    ticks = set()
+    for index, nft_id in enumerate(position_ids):
+        pool, token0, token1, fee, tick = pools[index % min(POSITION_POOLS, len(pools))]
+        base = tick - tick % tick_spacing
+        lower = base - tick_spacing * (1 + index % 10)
+        upper = base + tick_spacing * (1 + index % 7)
+        recording.add(NFPM_ADDRESS, "tokenOfOwnerByIndex(address,uint256)", [FAKE_OWNER, index], ["uint256"], [nft_id])
+        recording.add(NFPM_ADDRESS, "positions(uint256)", [nft_id], POSITION_TYPES, [
+            0, "0x" + "00" * 20, token0, token1, fee, lower, upper, 10 ** 15 + index, 1 << 128, 2 << 128, 0, 0,
+        ])
+        for t in (lower, upper):
+            if (pool, t) not in ticks:
+                ticks.add((pool, t))
+                recording.add(pool, "ticks(int24)", [t], TICK_TYPES, [10 ** 15, 10 ** 15, 1 << 128, 1 << 128, 0, 0, 0, True])
+
+    return recording, {"pairs": pair_list, "position_ids": position_ids, "owner": FAKE_OWNER}
+
+# --- Server ---
+
+class FakeRPCServer:
+    """A threaded JSON-RPC server over a Recording. Use as a context manager."""
+
+    def __init__(self, recording, latency=0.0, host="127.0.0.1", port=0):
+        self.recording = recording
+        self.latency = latency
+        self.round_trips = 0
+        self.calls = {}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out as separate writes; without this, Nagle's
+            # algorithm and delayed ACKs add ~40ms to every request
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if server.latency:
+                    time.sleep(server.latency)
+                request = json.loads(body)
+                if isinstance(request, list):
+                    response = [server.handle(item) for item in request]
+                else:
+                    response = server.handle(request)
+                with server._lock:
+                    server.round_trips += 1
+                payload = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, name="fake-rpc", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counters(self):
+        with self._lock:
+            self.round_trips = 0
+            self.calls = {}
+
+    def handle(self, request):
+        method, params = request.get("method"), request.get("params") or []
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+        result = {
+            "eth_chainId": lambda: hex(ARBITRUM_CHAIN_ID),
+            "net_version": lambda: str(ARBITRUM_CHAIN_ID),
+            "eth_blockNumber": lambda: hex(FAKE_BLOCK_NUMBER),
+            "web3_clientVersion": lambda: "fake-rpc/1.0",
+            "eth_call": lambda: self.eth_call(params[0]),
+        }.get(method)
+        if result is None:
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": -32601, "message": f"Method {method} not found"}}
+        return {"jsonrpc": "2.0", "id": request.get("id"), "result": result()}
+
+    def eth_call(self, tx):
+        target = tx["to"]
+        data = bytes.fromhex((tx.get("data") or tx.get("input") or "0x")[2:])
+        if target.lower() == MULTICALL3_ADDRESS.lower() and data[:4] == AGGREGATE3_SELECTOR:
+            from eth_abi import decode, encode
+            calls = decode(["(address,bool,bytes)[]"], data[4:])[0]
+            results = [self.recording.answer(call_target, calldata) for call_target, _, calldata in calls]
+            return "0x" + encode(["(bool,bytes)[]"], [results]).hex()
+        return "0x" + self.recording.answer(target, data)[1].hex()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Import-time benchmark for the project's modules.
+
+Each module is imported in a fresh interpreter with `python -X importtime`, and
+its cumulative import time is compared with a startup budget. The script exits
+with status 1 if any module goes over budget, so it can be used as a check.
+
+Importing must also be side-effect free: the RPC URLs are pointed at an
+unreachable address, so a module that connects at import time fails loudly.
+
+Usage:
+    python benchmarks/import_time.py [--budget-ms 50] [--runs 3]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must stay cheap to import
+MODULES = [
+    "core",
+    "multicall",
+    "metadata_cache",
+    "pool_info",
+    "price_ratio_monitor",
+]
+
+DEFAULT_BUDGET_MS = 50
+
+# Unreachable endpoint: any network access at import time fails instead of hanging
+UNREACHABLE_URL = "http://127.0.0.1:9"
+
+def measure_import(module):
+    """Returns the cumulative import time of `module` in milliseconds, measured in a fresh interpreter."""
+    env = dict(os.environ, ETHEREUM_NODE_URL=UNREACHABLE_URL, ARBITRUM_RPC_URL=UNREACHABLE_URL)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0 or result.stdout:
+        raise RuntimeError(f"importing {module} had side effects or failed:\n{result.stdout}{result.stderr}")
+    for line in reversed(result.stderr.splitlines()):
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\S+)$", line)
+        if match and match.group(2) == module:
+            return int(match.group(1)) / 1000
+    raise RuntimeError(f"no import time reported for {module}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that modules import within a startup budget.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Maximum import time per module in milliseconds.")
+    parser.add_argument("--runs", type=int, default=3, help="Imports per module; the fastest run is reported.")
+    args = parser.parse_args()
+
+    over_budget = []
+    print(f"{'Module':<24} {'Import (ms)':>12}  Budget: {args.budget_ms:.0f} ms")
+    print("-" * 52)
+    for module in MODULES:
+        elapsed = min(measure_import(module) for _ in range(args.runs))
+        status = "OK" if elapsed <= args.budget_ms else "OVER BUDGET"
+        print(f"{module:<24} {elapsed:>12.1f}  {status}")
+        if elapsed > args.budget_ms:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"\n{len(over_budget)} module(s) over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite for the RPC-bound scripts and the liquidity calculators.
+
+The RPC scenarios run against a local fake node (see fake_rpc.py) with a fixed
+per-request latency, so results measure round trips and client-side work, not
+the public network:
+
+  - pool_info/1:      single-position mode, cold metadata cache;
+  - pool_info/500:    portfolio mode over an owner with 500 positions;
+  - monitor/2, /200:  one monitor cycle (slot0 multicall, pricing, alert rules)
+                      over 2 and 200 pairs, after pool discovery;
+  - calculator/*:     scalar, vectorized and streaming-batch (CSV in, CSV out)
+                      liquidity calculator throughput.
+
+Before anything is timed, the fast paths are cross-checked against their
+reference implementations (exact position amounts, the range sweep against the
+scalar calculators, ...), and the suite fails if they disagree.
+
+Results are printed as JSON (with the commit they were measured on), and a
+previous result file can be compared against with --compare.
+
+Usage:
+    python benchmarks/suite.py [--latency-ms 20] [--repeat 5] [--output bench.json]
+    python benchmarks/suite.py --compare bench.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from fake_rpc import ARBITRUM_CHAIN_ID, FAKE_BLOCK_NUMBER, FakeRPCServer, build_fixtures
+
+DEFAULT_LATENCY_MS = 20
+DEFAULT_REPEAT = 5
+
+# Monitor cycles timed per scenario
+MONITOR_CYCLES = 20
+
+# Scenarios per calculator throughput run
+SCALAR_SCENARIOS = 100_000
+VECTOR_SCENARIOS = 1_000_000
+BATCH_SCENARIOS = 200_000
+
+def summarize(samples):
+    """Median, minimum and 95th percentile of a list of wall times (seconds)."""
+    ordered = sorted(samples)
+    return {
+        "median_s": statistics.median(ordered),
+        "min_s": ordered[0],
+        "p95_s": ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+    }
+
+def measure(server, run, repeat, setup=None):
+    """Runs `run()` `repeat` times (after an optional fresh `setup()` each time) and counts round trips."""
+    times, round_trips = [], []
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        server.reset_counters()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            if setup:
+                run(argument)
+            else:
+                run()
+        times.append(time.perf_counter() - start)
+        round_trips.append(server.round_trips)
+    return {**summarize(times), "round_trips": max(round_trips), "rpc_calls": sum(server.calls.values())}
+
+def fresh_cache():
+    from metadata_cache import MetadataCache
+    return MetadataCache(ARBITRUM_CHAIN_ID, os.path.join(tempfile.mkdtemp(prefix="bench-cache-"), "metadata.sqlite"))
+
+# --- Scenarios ---
+
+def bench_pool_info(server, info, repeat):
+    import pool_info
+    from rpc_pool import create_web3
+
+    # A fresh client per run, so its eth_call cache starts cold too
+    single = measure(
+        server,
+        lambda setup: pool_info.fetch_position_data(setup[0], info["position_ids"][0], setup[1]),
+        repeat, lambda: (create_web3([server.url], hedge=False), fresh_cache()),
+    )
+    portfolio = measure(
+        server,
+        lambda cache: asyncio.run(pool_info.fetch_portfolio(server.url, [info["owner"]], [], pool_info.DEFAULT_CONCURRENCY, cache)),
+        repeat, fresh_cache,
+    )
+    return {"pool_info/1": single, f"pool_info/{len(info['position_ids'])}": portfolio}
+
+def bench_monitor(server, info, pairs, repeat):
+    from alert_rules import PRICE, Rule, RuleEngine
+    from market_graph import MarketGraph, Ratio
+    from multicall import Call, aggregate3
+    from pool_discovery import find_deepest_pools
+    from price_ratio_monitor import check_rules
+    from rpc_pool import create_web3
+
+    w3 = create_web3([server.url], hedge=False)
+    tokens = list(dict.fromkeys(token for pair in info["pairs"][:pairs] for token in pair))
+    decimals = dict(zip(tokens, aggregate3(w3, [Call(token, "decimals()", returns=["uint8"]) for token in tokens])))
+
+    ratios = [Ratio(f"pair{i}", base, quote) for i, (base, quote) in enumerate(info["pairs"][:pairs])]
+    graph = MarketGraph(ratios)
+    server.reset_counters()
+    start = time.perf_counter()
+    graph.resolve(lambda keys: {key: (found or (None,))[0] for key, found in find_deepest_pools(w3, keys).items()}, decimals.get)
+    discovery = {"wall_s": time.perf_counter() - start, "round_trips": server.round_trips}
+
+    # Wide bands: every rule is evaluated, none fires
+    engine = RuleEngine(static_rules=[Rule(ratio.name, ratio.name, PRICE, 1e-30, 1e30) for ratio in ratios])
+
+    blocks = itertools.count(FAKE_BLOCK_NUMBER)
+
+    def cycle():
+        # Like the block feed: every cycle reads a new block
+        slot0s = aggregate3(w3, graph.slot0_calls(), hex(next(blocks)))
+        check_rules(engine, graph.prices({pool: slot0[0] for pool, slot0 in zip(graph.pools, slot0s)}))
+
+    result = measure(server, cycle, max(repeat, MONITOR_CYCLES))
+    result["discovery"] = discovery
+    return {f"monitor/{pairs}": result}
+
+def bench_calculators():
+    import random
+    import numpy as np
+    import scenario_batch
+    from range_sweep import sweep
+    from wbtc_eth_liquidity import calculate_batch, calculate_liquidity
+
+    rng = random.Random(1)
+    # Prices are the ETH/WBTC ratio (eth_usd / wbtc_usd), as the calculators take them
+    usd_prices = {"wbtc_usd": CHECK_USD["wrapped-bitcoin"], "eth_usd": CHECK_USD["ethereum"]}
+    current = usd_prices["eth_usd"] / usd_prices["wbtc_usd"]
+    scenarios = [(rng.uniform(0.0375, 0.0475), rng.uniform(0.0525, 0.0625)) for _ in range(SCALAR_SCENARIOS)]
+    start = time.perf_counter()
+    for low, high in scenarios:
+        calculate_liquidity(10000, low, high, current, usd_prices)
+    scalar = time.perf_counter() - start
+
+    grid = np.random.default_rng(1)
+    min_prices = grid.uniform(0.04, 0.05, VECTOR_SCENARIOS)
+    max_prices = grid.uniform(0.05, 0.06, VECTOR_SCENARIOS)
+    start = time.perf_counter()
+    sweep(min_prices, max_prices, 10000.0, current, usd_prices["eth_usd"], usd_prices["wbtc_usd"])
+    vector = time.perf_counter() - start
+
+    lines = io.StringIO("".join(
+        f"{rng.uniform(100, 100000):.2f},{rng.uniform(0.0375, 0.0475):.6f},{rng.uniform(0.0525, 0.0625):.6f}\n" for _ in range(BATCH_SCENARIOS)
+    ))
+    start = time.perf_counter()
+    scenario_batch.run(
+        lines, io.StringIO(), lambda total, low, high: calculate_batch(total, low, high, current, usd_prices), ["amount_wbtc", "amount_eth"],
+    )
+    batch = time.perf_counter() - start
+    return {
+        "calculator/scalar": {"wall_s": scalar, "scenarios_per_s": SCALAR_SCENARIOS / scalar},
+        "calculator/sweep": {"wall_s": vector, "scenarios_per_s": VECTOR_SCENARIOS / vector},
+        "calculator/batch": {"wall_s": batch, "scenarios_per_s": BATCH_SCENARIOS / batch},
+    }
+
+# --- Correctness checks ---
+
+# (current tick, tick_lower, tick_upper) -> LiquidityAmounts.getAmountsForLiquidity for 1e18 liquidity
+VALUATION_REFERENCE = {
+    (0, -500, 500): (24688868914785167, 24688868914785167),
+    (200, -300, 700): (24443222785331682, 24936983704834082),
+    (-900, -500, 500): (50002707881550791, 0),
+    (900, -500, 500): (0, 50002707881550791),
+}
+
+def check_valuation():
+    """Position amounts must match LiquidityAmounts reference values below, inside and above the range."""
+    import numpy as np
+    from position_valuation import amounts_for_liquidity
+    from tick_math import get_sqrt_ratio_at_tick
+
+    for (tick, lower, upper), expected in VALUATION_REFERENCE.items():
+        column = lambda value: np.array([value], dtype=object)
+        amount0, amount1 = amounts_for_liquidity(
+            column(get_sqrt_ratio_at_tick(tick)), column(get_sqrt_ratio_at_tick(lower)),
+            column(get_sqrt_ratio_at_tick(upper)), column(10 ** 18),
+        )
+        assert (amount0[0], amount1[0]) == expected, f"amounts at tick {tick} in [{lower}, {upper}]: {(amount0[0], amount1[0])} != {expected}"
+
+# USD prices by CoinGecko ID used for the calculator checks and benchmarks
+CHECK_USD = {"wrapped-bitcoin": 60000.0, "ethereum": 3000.0, "pendle": 5.0}
+
+def check_calculators():
+    """The range_sweep CLI's pairs and both calculators (scalar and batch) must agree below, inside and above the range."""
+    import numpy as np
+    import pendle_eth_liquidity
+    import wbtc_eth_liquidity
+    from range_sweep import PAIRS, sweep
+
+    calculators = {
+        "wbtc-eth": (wbtc_eth_liquidity, "wrapped-bitcoin", ("WBTC", "ETH")),
+        "pendle-eth": (pendle_eth_liquidity, "pendle", ("PENDLE", "ETH")),
+    }
+    for pair, (module, coin, symbols) in calculators.items():
+        symbol0, symbol1, coin0, coin1 = PAIRS[pair]
+        usd_prices = {f"{symbols[0].lower()}_usd": CHECK_USD[coin], "eth_usd": CHECK_USD["ethereum"]}
+        current = CHECK_USD[coin0] / CHECK_USD[coin1]
+        for low, high in ((current * 0.9, current * 1.2), (current * 1.1, current * 1.2), (current * 0.8, current * 0.9)):
+            swept = sweep(low, high, 10000.0, current, CHECK_USD[coin0], CHECK_USD[coin1])
+            by_symbol = {symbol0: float(swept["amount0"]), symbol1: float(swept["amount1"])}
+            expected = [by_symbol[symbol] for symbol in symbols]
+            scalar = module.calculate_liquidity(10000.0, low, high, current, usd_prices)
+            batch = [float(column[0]) for column in module.calculate_batch(np.array([10000.0]), np.array([low]), np.array([high]), current, usd_prices)]
+            for name, amounts in (("calculate_liquidity", scalar), ("calculate_batch", batch)):
+                assert np.allclose(amounts, expected, rtol=1e-9), f"{pair} [{low}, {high}]: {name} {amounts} != range_sweep {expected}"
+
+def check_optimizer():
+    """range_optimizer's time in range must match a brute-force count over the same paths, however wide the ranges."""
+    import math
+    import numpy as np
+    from range_optimizer import _simulate_chunk, candidate_ranges
+
+    current, sigma, years, steps, paths = 100.0, 0.8, 30 / 365, 60, 50
+    min_prices, max_prices = candidate_ranges(current, np.array([0.5, 5.0, 40.0, 99.0]))
+    seed = np.random.SeedSequence(1)
+    result = _simulate_chunk((seed, paths, steps, sigma, years, current, min_prices, max_prices, 0.1, 0.005))
+
+    rng = np.random.default_rng(seed)
+    dt = years / steps
+    log_paths = np.cumsum(rng.standard_normal((paths, steps)) * (sigma * math.sqrt(dt)) - 0.5 * sigma ** 2 * dt, axis=1)
+    log_min, log_max = np.log(min_prices / current), np.log(max_prices / current)
+    inside = (log_paths[:, :, None] >= log_min) & (log_paths[:, :, None] <= log_max)
+    expected = inside.mean(axis=1).sum(axis=0)
+    assert np.allclose(result["in_range"], expected), f"time in range {result['in_range']} != brute force {expected}"
+
+def run_checks():
+    """Cross-checks the fast paths against their references before anything is timed."""
+    check_valuation()
+    check_calculators()
+    check_optimizer()
+
+# --- Reporting ---
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+def headline(result):
+    """The number a scenario is compared on, and whether higher is better."""
+    if "scenarios_per_s" in result:
+        return result["scenarios_per_s"], True
+    return result.get("median_s", result.get("wall_s")), False
+
+def compare(baseline, current):
+    """Prints the change of every scenario's headline number relative to a baseline run."""
+    print(f"{'Scenario':<22} {'Baseline':>12} {'Current':>12} {'Change':>9}  Round trips", file=sys.stderr)
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        value, higher_is_better = headline(result)
+        if before is None:
+            print(f"{name:<22} {'-':>12} {value:>12.4g} {'new':>9}", file=sys.stderr)
+            continue
+        old, _ = headline(before)
+        change = (value - old) / old * 100 if old else 0.0
+        better = change > 0 if higher_is_better else change < 0
+        trips = f"{before.get('round_trips', '-')} -> {result.get('round_trips', '-')}"
+        print(f"{name:<22} {old:>12.4g} {value:>12.4g} {change:>+8.1f}%{' ' if better else '!'} {trips}", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite against a local fake JSON-RPC node.")
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_LATENCY_MS, help="Latency of every fake RPC request.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per scenario.")
+    parser.add_argument("--positions", type=int, default=500, help="Positions for the portfolio scenario.")
+    parser.add_argument("--output", help="Also write the JSON results to this file.")
+    parser.add_argument("--compare", help="Compare with a previous JSON result file.")
+    args = parser.parse_args()
+
+    run_checks()
+    recording, info = build_fixtures(positions=args.positions, pairs=200)
+    results = {}
+    with FakeRPCServer(recording, latency=args.latency_ms / 1000) as server:
+        results.update(bench_pool_info(server, info, args.repeat))
+        for pairs in (2, 200):
+            results.update(bench_monitor(server, info, pairs, args.repeat))
+    results.update(bench_calculators())
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "latency_ms": args.latency_ms,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Block-scoped response cache and request coalescing for `eth_call`.
+
+Results are keyed on (block, to, calldata), so the same read inside one block
+is sent to the node once:
+
+  - `latest` reads are pinned to the current block number, which is refreshed
+    at most every BLOCK_REFRESH_INTERVAL seconds (half a block) and moved ahead
+    at once when a new-block notification is passed to `observe_block`. All
+    reads of a run therefore see one consistent block, and their cache entries
+    stop matching as soon as the block advances;
+  - identical requests that are in flight at the same time (e.g. from the
+    threads of a chunked multicall) share one request;
+  - entries are evicted least-recently-used beyond `size`;
+  - `eth_chainId`/`net_version` never change for a node and are cached for the
+    life of the provider (web3 asks for the chain ID around every eth_call).
+
+Error responses are never cached; a pinned read that fails is retried at
+`latest`, since a lagging endpoint may not know the pinned block yet. Reads at `pending`/`safe`/`finalized` or with
+state overrides go straight to the node.
+
+Usage:
+    cache = CallCache(send)          # send(method, params) -> JSON-RPC response
+    response = cache.request("eth_call", [tx, "latest"])
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import metrics
+
+# Entries kept before the least recently used one is evicted
+DEFAULT_CACHE_SIZE = 4096
+
+# Arbitrum One produces a block about every 0.25 seconds
+BLOCK_TIME = 0.25
+
+# Seconds a fetched block number is used to pin `latest` reads
+BLOCK_REFRESH_INTERVAL = BLOCK_TIME / 2
+
+# Methods whose answer never changes for a given node
+STATIC_METHODS = {"eth_chainId", "net_version"}
+
+class CallCache:
+    """LRU cache of JSON-RPC responses with in-flight request coalescing."""
+
+    def __init__(self, send, size=DEFAULT_CACHE_SIZE, block_refresh_interval=BLOCK_REFRESH_INTERVAL):
+        self._send = send
+        self.size = size
+        self.block_refresh_interval = block_refresh_interval
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._block_lock = threading.Lock()
+        self._block = None
+        self._block_fetched_at = 0.0
+
+    def current_block(self):
+        """The current block number as a hex string, refreshed at most every block_refresh_interval."""
+        # Threads arriving during a refresh wait for it instead of sending their own
+        with self._block_lock:
+            if time.monotonic() - self._block_fetched_at >= self.block_refresh_interval:
+                response = self._send("eth_blockNumber", [])
+                if "result" in response:
+                    self._block = response["result"]
+                    self._block_fetched_at = time.monotonic()
+        return self._block
+
+    def observe_block(self, block_number):
+        """Pins `latest` reads to a block announced by a feed (an int or hex string); never moves back."""
+        number = int(block_number, 16) if isinstance(block_number, str) else int(block_number)
+        with self._block_lock:
+            if self._block is None or number > int(self._block, 16):
+                self._block = hex(number)
+                self._block_fetched_at = time.monotonic()
+
+    def _key(self, method, params):
+        """The cache key of a request, or None if it must not be cached."""
+        if method in STATIC_METHODS:
+            return (method,)
+        if method != "eth_call" or len(params) != 2:
+            return None
+        tx, block = params
+        if block == "latest":
+            block = self.current_block()
+            if block is None:
+                return None
+            params[1] = block
+        elif isinstance(block, dict):
+            block = block.get("blockHash") or block.get("blockNumber")
+        elif not (isinstance(block, str) and block.startswith("0x")):
+            return None
+        return (block, tuple(sorted((field, str(value).lower()) for field, value in tx.items())))
+
+    def request(self, method, params):
+        """Answers a request from the cache, an identical request in flight, or the node."""
+        original = list(params or [])
+        params = list(original)
+        key = self._key(method, params)
+        if key is None:
+            return self._send(method, original)
+        response = self._coalesced(key, lambda: self._send(method, params))
+        if "error" in response and params != original:
+            # The endpoint may not have the pinned block yet; let it answer at its own latest
+            return self._send(method, original)
+        return response
+
+    def _coalesced(self, key, fetch):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                metrics.observe_cache("rpc_responses", True)
+                return self._entries[key]
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+        if not owner:
+            metrics.observe_cache("rpc_responses", True)
+            return future.result()
+
+        metrics.observe_cache("rpc_responses", False)
+        try:
+            response = fetch()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._in_flight[key]
+            if "error" not in response:
+                self._entries[key] = response
+                if len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+        future.set_result(response)
+        return response
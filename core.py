@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Shared building blocks for the liquidity pool scripts.
+
+Importing this module is cheap: it does no network I/O and parses no ABIs.
+Contract reads use plain function signatures (see multicall.Call) instead of
+full JSON ABIs, and the Web3 client, the metadata cache and the .env file are
+only set up the first time they are needed.
+
+Usage:
+    from core import get_web3, FACTORY_ADDRESS
+    w3 = get_web3()
+"""
+import functools
+
+# --- Contract Addresses (These are the same for Mainnet and Arbitrum) ---
+
+# Uniswap V3 Nonfungible Position Manager
+NFPM_ADDRESS = "0xC36442b4a4522E871399CD717aBDD847Ab11FE88"
+
+# Uniswap V3 Factory
+FACTORY_ADDRESS = "0x1F98431c8aD98523631AE4a59f267346ea31F984"
+
+# Keccak hash of the Uniswap V3 pool init code, used to derive pool addresses (CREATE2)
+POOL_INIT_CODE_HASH = "0xe34f199b19b2b4f47f68442619d555527d244f78a3297ea89325f843f87b8b54"
+
+# --- Token Addresses (Arbitrum) ---
+
+WETH_ADDRESS = "0x82aF49447D8a07e3bd95BD0d56f35241523fBab1"
+WBTC_ADDRESS = "0x2f2a2543B76A4166549F7aaB2e75Bef0aefC5B0f"
+USDC_ADDRESS = "0xaf88d065e77c8cC2239327C5EDb3A432268e5831"
+PENDLE_ADDRESS = "0x0c880f6761F1af8d9Aa9C466984b80DAb9a8c9e8"
+
+# --- Return Types ---
+
+# NonfungiblePositionManager.positions(tokenId)
+POSITION_TYPES = [
+    "uint96", "address", "address", "address", "uint24", "int24", "int24",
+    "uint128", "uint256", "uint256", "uint128", "uint128",
+]
+
+# UniswapV3Pool.slot0()
+SLOT0_TYPES = ["uint160", "int24", "uint16", "uint16", "uint16", "uint8", "bool"]
+
+# UniswapV3Pool.ticks(int24)
+TICK_TYPES = ["uint128", "int128", "uint256", "uint256", "int56", "uint160", "uint32", "bool"]
+
+# --- Lazy Resources ---
+
+@functools.cache
+def load_env():
+    """Loads the .env file once."""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+@functools.cache
+def get_web3(urls=None):
+    """
+    Returns the shared Web3 client on the RPC endpoint pool, creating it on first use.
+    `urls` must be a tuple when given.
+    """
+    load_env()
+    from rpc_pool import create_web3
+    return create_web3(list(urls) if urls else None)
+
+@functools.cache
+def get_metadata_cache(w3=None):
+    """
+    Returns the shared on-disk metadata cache, opening it on first use. Entries are
+    keyed by the chain ID of `w3` (default: get_web3()), read once with eth_chainId.
+    """
+    load_env()
+    from metadata_cache import MetadataCache
+    return MetadataCache((w3 or get_web3()).eth.chain_id)
+
+# --- Helpers ---
+
+def sort_tokens(token_a, token_b):
+    """Orders two token addresses the way Uniswap does (numerically, token0 < token1)."""
+    return (token_a, token_b) if int(token_a, 16) < int(token_b, 16) else (token_b, token_a)
+
+def compute_pool_address(token0, token1, fee):
+    """Derives the pool address from the factory's CREATE2 parameters, without any RPC call."""
+    from eth_utils import keccak, to_checksum_address
+
+    salt = keccak(bytes.fromhex("".join([
+        token0[2:].lower().rjust(64, "0"),
+        token1[2:].lower().rjust(64, "0"),
+        hex(fee)[2:].rjust(64, "0"),
+    ])))
+    digest = keccak(b"\xff" + bytes.fromhex(FACTORY_ADDRESS[2:]) + salt + bytes.fromhex(POOL_INIT_CODE_HASH[2:]))
+    return to_checksum_address(digest[12:])
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Graph of pool "legs" for pricing many ratios from one set of slot0 reads.
+
+Tokens are nodes and each leg (a Uniswap V3 pool between two tokens) is an
+edge. Every watched ratio is priced along the shortest path of legs from its
+base to its quote token, so legs shared by several ratios (e.g. WETH/USDC) are
+read only once, and any number of ratios needs one Multicall3 batch of slot0
+reads per block.
+
+Config file (JSON):
+    {
+        "tokens": {"WETH": "0x82aF...", "USDC": "0xaf88...", "WBTC": "0x2f2a..."},
+        "legs": [["WETH", "USDC"], ["WBTC", "WETH"]],
+        "ratios": [
+            {"name": "ETH/WBTC", "base": "WETH", "quote": "WBTC", "lower": 0.03, "upper": 0.04},
+            {"name": "WBTC/USD", "base": "WBTC", "quote": "USDC"}
+        ]
+    }
+
+`legs` is optional: without it, every ratio is priced from the direct pool of
+its two tokens. `lower`/`upper` are optional alert thresholds (quote per base).
+"""
+import json
+from collections import deque
+
+from core import SLOT0_TYPES, sort_tokens
+from multicall import Call
+from tick_math import sqrt_price_x96_to_price
+
+class Leg:
+    """A pool between two tokens; `token0`/`token1` follow the pool's ordering."""
+
+    def __init__(self, token0, token1, pool=None, decimals0=None, decimals1=None):
+        self.token0 = token0
+        self.token1 = token1
+        self.pool = pool
+        self.decimals0 = decimals0
+        self.decimals1 = decimals1
+
+    def price(self, sqrt_price_x96):
+        """token1 per token0 at a sqrtPriceX96."""
+        return sqrt_price_x96_to_price(sqrt_price_x96, self.decimals0, self.decimals1)
+
+    def __repr__(self):
+        return f"Leg({self.token0}, {self.token1}, pool={self.pool})"
+
+class Ratio:
+    """A watched price of `base` in `quote` units, with the legs it is priced along."""
+
+    def __init__(self, name, base, quote, lower=None, upper=None):
+        self.name = name
+        self.base = base
+        self.quote = quote
+        self.lower = lower
+        self.upper = upper
+        # (leg, True if the path walks the leg from token0 to token1)
+        self.path = []
+
+class MarketGraph:
+    """Ratios over a shared set of legs. Token arguments are addresses."""
+
+    def __init__(self, ratios, legs=None, symbols=None):
+        self.ratios = ratios
+        self.symbols = symbols or {}
+        pairs = legs if legs is not None else [(ratio.base, ratio.quote) for ratio in ratios]
+        self.legs = {}
+        for token_a, token_b in pairs:
+            token0, token1 = sort_tokens(token_a, token_b)
+            self.legs.setdefault((token0, token1), Leg(token0, token1))
+
+        neighbours = {}
+        for leg in self.legs.values():
+            neighbours.setdefault(leg.token0, []).append((leg, True, leg.token1))
+            neighbours.setdefault(leg.token1, []).append((leg, False, leg.token0))
+        for ratio in ratios:
+            ratio.path = _shortest_path(neighbours, ratio.base, ratio.quote)
+            if ratio.path is None:
+                raise ValueError(f"No path of legs from {ratio.base} to {ratio.quote} for {ratio.name}")
+
+        # Only legs some ratio is priced along need to be read
+        used = {id(leg) for ratio in ratios for leg, _ in ratio.path}
+        self.legs = {key: leg for key, leg in self.legs.items() if id(leg) in used}
+
+    def resolve(self, find_pools, get_decimals):
+        """
+        Resolves every leg's pool and token decimals. `find_pools(pairs)` returns
+        {(token0, token1): pool address or None} for all legs at once.
+        Returns the legs no pool was found for.
+        """
+        missing = []
+        pools = find_pools(list(self.legs))
+        for key, leg in self.legs.items():
+            leg.pool = pools[key]
+            if leg.pool is None:
+                missing.append(leg)
+                continue
+            leg.decimals0, leg.decimals1 = get_decimals(leg.token0), get_decimals(leg.token1)
+        return missing
+
+    def symbol(self, token):
+        return self.symbols.get(token, token[:10])
+
+    @property
+    def pools(self):
+        """Distinct pools to read, in a stable order."""
+        return list(dict.fromkeys(leg.pool for leg in self.legs.values()))
+
+    def slot0_calls(self):
+        """One slot0 read per distinct pool, for a single Multicall3 batch."""
+        return [Call(pool, "slot0()", returns=SLOT0_TYPES, allow_failure=False) for pool in self.pools]
+
+    def prices(self, sqrt_prices):
+        """
+        Prices every ratio from {pool: sqrtPriceX96}. Each leg is priced once and shared
+        by all ratios that use it. Ratios whose pools have no price yet are left out.
+        """
+        leg_prices = {
+            id(leg): leg.price(sqrt_prices[leg.pool])
+            for leg in self.legs.values()
+            if leg.pool in sqrt_prices
+        }
+        values = {}
+        for ratio in self.ratios:
+            value = 1.0
+            for leg, forward in ratio.path:
+                price = leg_prices.get(id(leg))
+                if price is None or price == 0:
+                    break
+                value *= price if forward else 1 / price
+            else:
+                values[ratio.name] = value
+        return values
+
+def _shortest_path(neighbours, start, goal):
+    """Breadth-first search over the legs; returns [(leg, forward), ...] or None."""
+    if start == goal:
+        return []
+    previous = {start: None}
+    frontier = deque([start])
+    while frontier:
+        token = frontier.popleft()
+        for leg, forward, other in neighbours.get(token, []):
+            if other in previous:
+                continue
+            previous[other] = (token, leg, forward)
+            if other == goal:
+                path = []
+                while previous[other] is not None:
+                    token, leg, forward = previous[other]
+                    path.append((leg, forward))
+                    other = token
+                return path[::-1]
+            frontier.append(other)
+    return None
+
+def load_graph(path):
+    """Builds a MarketGraph from a JSON config file (see the module docstring)."""
+    from eth_utils import to_checksum_address
+
+    with open(path, "r") as f:
+        config = json.load(f)
+    tokens = {symbol: to_checksum_address(address) for symbol, address in config["tokens"].items()}
+    ratios = [
+        Ratio(
+            entry.get("name", f"{entry['base']}/{entry['quote']}"),
+            tokens[entry["base"]], tokens[entry["quote"]],
+            entry.get("lower"), entry.get("upper"),
+        )
+        for entry in config["ratios"]
+    ]
+    legs = [(tokens[a], tokens[b]) for a, b in config["legs"]] if "legs" in config else None
+    return MarketGraph(ratios, legs, {address: symbol for symbol, address in tokens.items()})
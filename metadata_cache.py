@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Persistent on-disk cache for immutable chain metadata.
+
+Token `symbol()`/`decimals()` and the pool address returned by
+`factory.getPool(tokenA, tokenB, fee)` never change once deployed, so they are
+stored in a small SQLite database keyed by chain ID and address. Warm runs read
+them from disk instead of the RPC node.
+
+Pools that do not exist (getPool returns the zero address) are cached too, but
+only for NEGATIVE_CACHE_TTL seconds, since the pool may be created later.
+
+The deepest pool chosen for a pair (see pool_discovery.py) is also stored, with
+the time it was chosen, so callers can decide when to re-check it.
+
+The notifier's per-rule alert state (the state each rule last alerted in and
+when) is kept here as well, so one-shot runs (e.g. from cron) do not repeat an
+alert on every run and still honour its cooldown.
+
+The database location can be set with the METADATA_CACHE_PATH environment
+variable (default: metadata_cache.sqlite in the working directory).
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+DEFAULT_CACHE_PATH = "metadata_cache.sqlite"
+
+# Seconds before a "pool does not exist" answer is re-checked on chain
+NEGATIVE_CACHE_TTL = 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tokens (
+    chain_id INTEGER NOT NULL,
+    address TEXT NOT NULL,
+    symbol TEXT,
+    decimals INTEGER NOT NULL,
+    PRIMARY KEY (chain_id, address)
+);
+CREATE TABLE IF NOT EXISTS pools (
+    chain_id INTEGER NOT NULL,
+    token0 TEXT NOT NULL,
+    token1 TEXT NOT NULL,
+    fee INTEGER NOT NULL,
+    pool TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (chain_id, token0, token1, fee)
+);
+CREATE TABLE IF NOT EXISTS pool_choices (
+    chain_id INTEGER NOT NULL,
+    token0 TEXT NOT NULL,
+    token1 TEXT NOT NULL,
+    pool TEXT NOT NULL,
+    fee INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (chain_id, token0, token1)
+);
+CREATE TABLE IF NOT EXISTS alert_states (
+    rule TEXT PRIMARY KEY,
+    state TEXT,
+    last_alert REAL NOT NULL
+);
+"""
+
+class MetadataCache:
+    """SQLite-backed cache of token metadata and pool addresses for one chain."""
+
+    def __init__(self, chain_id, path=None):
+        self.path = path or os.getenv("METADATA_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.chain_id = chain_id
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    # --- Tokens ---
+
+    def get_token(self, address):
+        """Returns (symbol, decimals) for a token, or None if it is not cached."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT symbol, decimals FROM tokens WHERE chain_id = ? AND address = ?",
+                (self.chain_id, address.lower()),
+            ).fetchone()
+        metrics.observe_cache("tokens", row is not None)
+        return row
+
+    def set_token(self, address, symbol, decimals):
+        """Stores a token's symbol and decimals."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tokens (chain_id, address, symbol, decimals) VALUES (?, ?, ?, ?)",
+                (self.chain_id, address.lower(), symbol, decimals),
+            )
+
+    # --- Pools ---
+
+    def get_pool(self, token_a, token_b, fee):
+        """
+        Returns the cached pool address for a pair and fee tier, ZERO_ADDRESS if the
+        pool is known not to exist, or None if there is no (fresh) entry.
+        """
+        token0, token1 = sorted([token_a.lower(), token_b.lower()])
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT pool, updated_at FROM pools WHERE chain_id = ? AND token0 = ? AND token1 = ? AND fee = ?",
+                (self.chain_id, token0, token1, fee),
+            ).fetchone()
+        if row is None or (row[0] == ZERO_ADDRESS and time.time() - row[1] > NEGATIVE_CACHE_TTL):
+            metrics.observe_cache("pools", False)
+            return None
+        metrics.observe_cache("pools", True)
+        return row[0]
+
+    def set_pool(self, token_a, token_b, fee, pool):
+        """Stores the pool address for a pair and fee tier (ZERO_ADDRESS for missing pools)."""
+        token0, token1 = sorted([token_a.lower(), token_b.lower()])
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pools (chain_id, token0, token1, fee, pool, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.chain_id, token0, token1, fee, pool, time.time()),
+            )
+
+    def get_pool_choice(self, token_a, token_b, max_age):
+        """Returns the (pool, fee) chosen for a pair, or None if there is none younger than `max_age` seconds."""
+        token0, token1 = sorted([token_a.lower(), token_b.lower()])
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT pool, fee, updated_at FROM pool_choices WHERE chain_id = ? AND token0 = ? AND token1 = ?",
+                (self.chain_id, token0, token1),
+            ).fetchone()
+        if row is None or time.time() - row[2] > max_age:
+            metrics.observe_cache("pool_choices", False)
+            return None
+        metrics.observe_cache("pool_choices", True)
+        return row[0], row[1]
+
+    def set_pool_choice(self, token_a, token_b, pool, fee):
+        """Stores the pool chosen for a pair."""
+        token0, token1 = sorted([token_a.lower(), token_b.lower()])
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pool_choices (chain_id, token0, token1, pool, fee, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.chain_id, token0, token1, pool, fee, time.time()),
+            )
+
+    # --- Alert state ---
+
+    def get_alert_states(self):
+        """Returns {rule: (state, last_alert)}; state is None for rules that re-armed since their last alert."""
+        with self._lock:
+            rows = self._conn.execute("SELECT rule, state, last_alert FROM alert_states").fetchall()
+        return {rule: (state, last_alert) for rule, state, last_alert in rows}
+
+    def set_alert_state(self, rule, state, last_alert):
+        """Stores a rule's alert state and the time (seconds since the epoch) of its last alert."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO alert_states (rule, state, last_alert) VALUES (?, ?, ?)",
+                (rule, state, last_alert),
+            )
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Prometheus-style metrics for the RPC, HTTP and alerting hot paths.
+
+Counters and histograms live in one process-wide registry and are rendered in
+the Prometheus text format, either on a local `/metrics` HTTP endpoint or as
+text. Everything is stdlib-only and cheap to import; recording a sample is a
+dict lookup and a bisect under a lock.
+
+What is recorded:
+  - rpc_request_seconds / rpc_errors_total: every JSON-RPC request, per method
+    and endpoint host (rpc_pool.py, and async multicalls);
+  - http_request_seconds / http_errors_total: CoinGecko and Telegram requests;
+  - cache_lookups_total: metadata cache hits and misses;
+  - cycle_seconds / cycle_rpc_requests: duration and RPC requests of one unit
+    of work (a monitor update, a pool_info run);
+  - block_to_alert_seconds: from receiving a block's data to handing its alerts
+    to the notifier;
+  - rate_limited_total: 429s per host, and requests shed by the client rate
+    limiter (rate_limit.py).
+
+A single cycle can also be profiled with pyinstrument (if installed) or cProfile.
+
+Usage:
+    metrics.serve(9464)                      # http://127.0.0.1:9464/metrics
+    with metrics.cycle("monitor", profile=True):
+        ...
+"""
+import contextlib
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds of the requests-per-cycle histogram buckets
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Rows of profiler output printed for a profiled cycle
+PROFILE_ROWS = 30
+
+# --- Metric types ---
+
+class Metric:
+    """A named metric with one value per combination of label values."""
+
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _label_text(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines += self._render_value(key, value)
+        return lines
+
+class Counter(Metric):
+    """A monotonically increasing count."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{self._label_text(key)} {_number(value)}"]
+
+class Histogram(Metric):
+    """Counts of observations per bucket, plus their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [count per bucket (the last one is +Inf), sum, count]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, errors=None, **labels):
+        """Observes the duration of a block; exceptions also increment the `errors` counter."""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            if errors is not None:
+                errors.inc(**labels)
+            raise
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_value(self, key, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += bucket_count
+            lines.append(f"{self.name}_bucket{self._label_text(key, [('le', _number(bound))])} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(key)} {_number(total)}")
+        lines.append(f"{self.name}_count{self._label_text(key)} {count}")
+        return lines
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _number(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+class Registry:
+    """A set of metrics rendered together."""
+
+    def __init__(self):
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+REGISTRY = Registry()
+
+RPC_LATENCY = REGISTRY.histogram("rpc_request_seconds", "JSON-RPC request latency.", ["method", "endpoint"])
+RPC_ERRORS = REGISTRY.counter("rpc_errors_total", "Failed JSON-RPC requests.", ["method", "endpoint"])
+HTTP_LATENCY = REGISTRY.histogram("http_request_seconds", "HTTP API request latency.", ["service"])
+HTTP_ERRORS = REGISTRY.counter("http_errors_total", "Failed HTTP API requests.", ["service"])
+CACHE_LOOKUPS = REGISTRY.counter("cache_lookups_total", "Cache lookups by result (hit or miss).", ["cache", "result"])
+CYCLE_LATENCY = REGISTRY.histogram("cycle_seconds", "Duration of one unit of work.", ["job"])
+CYCLE_REQUESTS = REGISTRY.histogram("cycle_rpc_requests", "JSON-RPC requests made by one unit of work.", ["job"], COUNT_BUCKETS)
+BLOCK_TO_ALERT = REGISTRY.histogram("block_to_alert_seconds", "Time from receiving a block's data to queueing its alerts.")
+RATE_LIMITED = REGISTRY.counter("rate_limited_total", "Requests throttled by a host (429) or shed by the client rate limiter.", ["host", "reason"])
+
+# --- Recording helpers ---
+
+_cycle_start = contextvars.ContextVar("cycle_start", default=None)
+# RPC requests of the current cycle, as a one-element list shared with its worker threads
+_cycle_requests = contextvars.ContextVar("cycle_requests", default=None)
+
+def endpoint_label(url):
+    """The host of an endpoint URL: paths often carry API keys, so they are left out."""
+    from urllib.parse import urlsplit
+    return urlsplit(url).netloc or url
+
+def observe_rpc(method, endpoint, elapsed, error=False):
+    """Records one JSON-RPC request (and counts it for the current cycle, if there is one)."""
+    requests = _cycle_requests.get()
+    if requests is not None:
+        with REGISTRY.lock:
+            requests[0] += 1
+    RPC_LATENCY.observe(elapsed, method=method, endpoint=endpoint)
+    if error:
+        RPC_ERRORS.inc(method=method, endpoint=endpoint)
+
+def observe_cache(cache, hit):
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+
+def observe_rate_limit(host, reason):
+    """Records a rate-limit answer ('throttled') or a request dropped by the client limiter ('shed')."""
+    RATE_LIMITED.inc(host=host, reason=reason)
+
+def http_request(service):
+    """Context manager timing one request to an HTTP API; exceptions count as errors."""
+    return HTTP_LATENCY.time(HTTP_ERRORS, service=service)
+
+def observe_alert():
+    """Records the block-to-alert latency of the current cycle, if there is one."""
+    start = _cycle_start.get()
+    if start is not None:
+        BLOCK_TO_ALERT.observe(time.perf_counter() - start)
+
+@contextlib.contextmanager
+def cycle(job, profile=False):
+    """
+    Measures one unit of work: its duration and the RPC requests it made. Requests are
+    counted per context, so concurrent cycles do not count each other's; worker threads
+    count towards the cycle when they run in a copy of its context (contextvars.copy_context).
+    With `profile`, the cycle also runs under a profiler whose report goes to stderr.
+    """
+    start = time.perf_counter()
+    requests = [0]
+    start_token = _cycle_start.set(start)
+    requests_token = _cycle_requests.set(requests)
+    try:
+        with profiled(profile):
+            yield
+    finally:
+        _cycle_requests.reset(requests_token)
+        _cycle_start.reset(start_token)
+        CYCLE_LATENCY.observe(time.perf_counter() - start, job=job)
+        CYCLE_REQUESTS.observe(requests[0], job=job)
+
+@contextlib.contextmanager
+def profiled(enabled=True):
+    """Profiles a block with pyinstrument if it is installed, otherwise with cProfile."""
+    if not enabled:
+        yield
+        return
+    import sys
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+
+    if Profiler is not None:
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            print(profiler.output_text(unicode=True), file=sys.stderr)
+        return
+
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(PROFILE_ROWS)
+
+# --- Exposition ---
+
+def serve(port, host="127.0.0.1", registry=REGISTRY):
+    """Serves the registry on http://host:port/metrics from a daemon thread. Returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Batched contract reads through Multicall3.
+
+Instead of issuing one `eth_call` per contract read, calls are collected into
+a single `aggregate3` request to the Multicall3 contract, so any number of
+independent reads costs one network round trip.
+
+Each call can be marked with `allow_failure`. A failing call that allows
+failure (e.g. a token whose `symbol()` returns bytes32 or reverts) simply
+yields `None` instead of reverting the whole batch.
+
+Usage:
+    calls = [
+        Call(token, "symbol()", returns=["string"], decoder=decode_symbol),
+        Call(token, "decimals()", returns=["uint8"]),
+    ]
+    symbol, decimals = aggregate3(w3, calls)
+"""
+import functools
+import time
+
+import metrics
+import rate_limit
+
+# Multicall3 is deployed at the same address on Mainnet, Arbitrum and most EVM chains
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+# Calls per aggregate3 request when splitting large batches, to stay within node gas limits
+DEFAULT_BATCH_SIZE = 200
+
+# Precomputed selector of aggregate3((address,bool,bytes)[])
+AGGREGATE3_SELECTOR = bytes.fromhex("82ad56cb")
+
+# eth_abi/eth_utils are imported on first use: they take ~0.2s to import
+@functools.cache
+def _abi():
+    import eth_abi
+    import eth_utils
+    return eth_abi, eth_utils
+
+@functools.lru_cache(maxsize=None)
+def selector(signature):
+    """Returns the 4-byte function selector for a signature like 'slot0()'."""
+    return _abi()[1].function_signature_to_4byte_selector(signature)
+
+# --- Calls ---
+
+class Call:
+    """A single contract read to be executed inside a Multicall3 batch."""
+
+    def __init__(self, target, signature, args=(), returns=(), allow_failure=True, decoder=None):
+        self.target = target
+        self.signature = signature
+        self.args = list(args)
+        self.returns = list(returns)
+        self.allow_failure = allow_failure
+        self.decoder = decoder
+
+    def encode(self):
+        """Returns the calldata (selector + encoded arguments) for this call."""
+        return selector(self.signature) + _abi()[0].encode(_argument_types(self.signature), self.args)
+
+    def decode(self, success, data):
+        """Decodes the raw return data, returning None for failed or undecodable calls."""
+        if not success or not data:
+            return None
+        try:
+            if self.decoder:
+                return self.decoder(data)
+            values = _abi()[0].decode(self.returns, data)
+        except Exception:
+            return None
+        values = [
+            _abi()[1].to_checksum_address(value) if abi_type == "address" else value
+            for abi_type, value in zip(self.returns, values)
+        ]
+        return values[0] if len(values) == 1 else tuple(values)
+
+    def __repr__(self):
+        return f"Call({self.target}, {self.signature!r}, {self.args!r})"
+
+def _argument_types(signature):
+    """Extracts the argument types from a plain signature like 'getPool(address,address,uint24)'."""
+    arguments = signature[signature.index("(") + 1:signature.rindex(")")]
+    return [t for t in arguments.split(",") if t]
+
+def decode_symbol(data):
+    """Decodes an ERC20 symbol, supporting both `string` and legacy `bytes32` return types."""
+    try:
+        return _abi()[0].decode(["string"], data)[0]
+    except Exception:
+        return data[:32].rstrip(b"\x00").decode("utf-8", errors="replace")
+
+# --- Encoding ---
+
+def encode_aggregate3(calls):
+    """Builds the calldata for a Multicall3 `aggregate3` call."""
+    packed = [(call.target, call.allow_failure, call.encode()) for call in calls]
+    return AGGREGATE3_SELECTOR + _abi()[0].encode(["(address,bool,bytes)[]"], [packed])
+
+def decode_aggregate3(calls, raw):
+    """Decodes the `aggregate3` return data into one result per call."""
+    results = _abi()[0].decode(["(bool,bytes)[]"], bytes(raw))[0]
+    return [call.decode(success, data) for call, (success, data) in zip(calls, results)]
+
+# --- Execution ---
+
+def execute(w3, call, block_identifier="latest"):
+    """Executes a single call directly (no Multicall3) and returns its decoded result."""
+    raw = w3.eth.call({"to": call.target, "data": "0x" + call.encode().hex()}, block_identifier)
+    return call.decode(True, bytes(raw))
+
+def aggregate3(w3, calls, block_identifier="latest"):
+    """Executes all calls in a single `eth_call` and returns their decoded results in order."""
+    if not calls:
+        return []
+    tx = {"to": MULTICALL3_ADDRESS, "data": "0x" + encode_aggregate3(calls).hex()}
+    raw = w3.eth.call(tx, block_identifier)
+    return decode_aggregate3(calls, raw)
+
+def aggregate3_chunked(w3, calls, batch_size=DEFAULT_BATCH_SIZE, block_identifier="latest", max_workers=4):
+    """
+    Splits a large list of calls into `aggregate3` batches and runs them on a few
+    threads. Results are returned in the original call order.
+    """
+    import contextvars
+    from concurrent.futures import ThreadPoolExecutor
+
+    chunks = [calls[i:i + batch_size] for i in range(0, len(calls), batch_size)]
+    if len(chunks) <= 1:
+        return aggregate3(w3, calls, block_identifier)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        # Each chunk runs in a copy of the caller's context (request priority, metrics cycle)
+        results = executor.map(
+            lambda chunk, context: context.run(aggregate3, w3, chunk, block_identifier),
+            chunks, [contextvars.copy_context() for _ in chunks],
+        )
+        return [value for chunk_results in results for value in chunk_results]
+
+async def aggregate3_async(w3, calls, block_identifier="latest"):
+    """
+    Async counterpart of `aggregate3` for AsyncWeb3 instances. The request goes through the
+    host's rate limiter, and transient failures are retried (see rate_limit.py).
+    """
+    if not calls:
+        return []
+    import asyncio
+
+    tx = {"to": MULTICALL3_ADDRESS, "data": "0x" + encode_aggregate3(calls).hex()}
+    # Async providers bypass the endpoint pool, so the request is rate limited, retried
+    # and recorded here
+    url = getattr(w3.provider, "endpoint_uri", "") or ""
+    endpoint = metrics.endpoint_label(url)
+    limiter = rate_limit.limiter_for(url)
+    for attempt in range(rate_limit.MAX_ATTEMPTS):
+        await limiter.acquire_async()
+        start = time.monotonic()
+        try:
+            raw = await w3.eth.call(tx, block_identifier)
+        except Exception as e:
+            metrics.observe_rpc("eth_call", endpoint, time.monotonic() - start, error=True)
+            throttled, retry_after = rate_limit.throttling(e)
+            if throttled:
+                limiter.throttled(retry_after)
+            if attempt + 1 >= rate_limit.MAX_ATTEMPTS or not rate_limit.is_transient(e) or not limiter.retries.withdraw():
+                raise
+            await asyncio.sleep(rate_limit.backoff(attempt))
+            continue
+        metrics.observe_rpc("eth_call", endpoint, time.monotonic() - start)
+        limiter.succeeded()
+        return decode_aggregate3(calls, raw)
+
+async def aggregate3_batched(w3, calls, semaphore=None, batch_size=DEFAULT_BATCH_SIZE, block_identifier="latest"):
+    """
+    Splits a large list of calls into `aggregate3` batches and runs them concurrently,
+    bounded by `semaphore`. Results are returned in the original call order.
+    """
+    import asyncio
+
+    async def run(chunk):
+        if semaphore is None:
+            return await aggregate3_async(w3, chunk, block_identifier)
+        async with semaphore:
+            return await aggregate3_async(w3, chunk, block_identifier)
+
+    chunks = [calls[i:i + batch_size] for i in range(0, len(calls), batch_size)]
+    results = await asyncio.gather(*(run(chunk) for chunk in chunks))
+    return [value for chunk_results in results for value in chunk_results]
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Background Telegram notifier.
+
+`notify()` only puts the message on a queue, so the monitoring loop never waits
+on the network. A worker thread owns one persistent HTTP session and:
+
+  - coalesces bursts: messages queued within COALESCE_WINDOW seconds go out as
+    one Telegram message, keeping only the latest message per rule;
+  - respects Telegram's rate limits: at most one message per MIN_SEND_INTERVAL,
+    and a 429 answer's `retry_after` is honoured;
+  - retries network errors and 5xx answers with jittered exponential backoff.
+
+`update()` adds per-rule gating on top: a rule alerts once when it enters a
+state, re-arms only after it reports the normal state (None) again, and never
+alerts more often than its cooldown. An alert held back by the cooldown is kept
+pending and goes out when the cooldown ends, unless the rule cleared meanwhile.
+With a `state_store` (see MetadataCache.get_alert_states), that gating survives
+restarts, so one-shot runs do not repeat an alert every time they run.
+
+Usage:
+    notifier = TelegramNotifier(bot_token, chat_id)
+    notifier.update("eth-wbtc", "above", "ETH/WBTC ratio is above the threshold")
+    notifier.close()
+"""
+import queue
+import random
+import threading
+import time
+
+# Seconds to wait for more messages before sending a batch
+COALESCE_WINDOW = 2.0
+
+# Telegram allows about one message per second in a chat
+MIN_SEND_INTERVAL = 1.0
+
+# Delivery attempts per batch, and the backoff between them (seconds)
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+# Minimum seconds between two alerts of the same rule
+DEFAULT_COOLDOWN = 300.0
+
+# Seconds before a Telegram API request is abandoned
+REQUEST_TIMEOUT = 10
+
+# Queue item that only wakes the worker to reschedule pending alerts
+_WAKE = object()
+
+class TelegramNotifier:
+    """Queues Telegram messages and delivers them from a background thread."""
+
+    def __init__(self, bot_token, chat_id, cooldown=DEFAULT_COOLDOWN, parse_mode="Markdown", state_store=None):
+        self.url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+        self.chat_id = chat_id
+        self.cooldown = cooldown
+        self.parse_mode = parse_mode
+        self.state_store = state_store
+        self._queue = queue.Queue()
+        self._active = {}
+        self._last_alert = {}
+        if state_store is not None:
+            for rule, (state, last_alert) in state_store.get_alert_states().items():
+                if state is not None:
+                    self._active[rule] = state
+                self._last_alert[rule] = last_alert
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_send = 0.0
+        self._session = None
+        self._worker = threading.Thread(target=self._run, name="telegram-notifier", daemon=True)
+        self._worker.start()
+
+    # --- Producer side (never blocks) ---
+
+    def notify(self, message, rule=None):
+        """Queues a message. Messages of the same rule queued in one burst replace each other."""
+        self._queue.put((rule, message))
+
+    def update(self, rule, state, message=None, cooldown=None):
+        """
+        Reports a rule's current state (None when normal). Queues `message` when the rule
+        enters a new alert state; if it alerted less than `cooldown` seconds ago, the
+        message is held until the cooldown ends. Returns True if a message was queued.
+        """
+        with self._lock:
+            if state is None or self._active.get(rule) == state:
+                self._pending.pop(rule, None)
+                if state is None and self._active.pop(rule, None) is not None and self.state_store is not None:
+                    self.state_store.set_alert_state(rule, None, self._last_alert[rule])
+                return False
+            cooldown = self.cooldown if cooldown is None else cooldown
+            due = self._last_alert.get(rule, -cooldown) + cooldown
+            if time.time() < due:
+                # Still cooling down: the worker sends it once the cooldown ends
+                self._pending[rule] = (due, state, message)
+                self._queue.put(_WAKE)
+                return False
+            self._pending.pop(rule, None)
+            self._send(rule, state, message)
+            return True
+
+    def _send(self, rule, state, message):
+        self._active[rule] = state
+        self._last_alert[rule] = time.time()
+        if self.state_store is not None:
+            self.state_store.set_alert_state(rule, state, self._last_alert[rule])
+        self.notify(message, rule)
+
+    def close(self, timeout=30):
+        """Delivers everything still queued (waiting at most `timeout` seconds) and stops the worker."""
+        self._queue.put(None)
+        self._worker.join(timeout)
+
+    # --- Worker side ---
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self._release_due())
+            except queue.Empty:
+                continue
+            if item is _WAKE:
+                continue
+            if item is None:
+                return
+            batch = {}
+            stop = self._collect(item, batch)
+            self._deliver("\n\n".join(batch.values()))
+            if stop:
+                return
+
+    def _release_due(self):
+        """Queues the pending alerts whose cooldown ended. Returns seconds until the next one (None if none)."""
+        with self._lock:
+            now = time.time()
+            for rule, (due, state, message) in list(self._pending.items()):
+                if due <= now:
+                    del self._pending[rule]
+                    self._send(rule, state, message)
+            return max(0.0, min(due for due, _, _ in self._pending.values()) - now) if self._pending else None
+
+    def _collect(self, item, batch):
+        """Gathers the messages of one burst into `batch`. Returns True if close() was requested."""
+        deadline = time.monotonic() + COALESCE_WINDOW
+        while True:
+            if item is not _WAKE:
+                rule, message = item
+                # Unnamed messages never replace each other
+                batch[rule if rule is not None else object()] = message
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                return False
+            if item is None:
+                return True
+
+    def _deliver(self, text):
+        import requests
+        import metrics
+
+        if self._session is None:
+            self._session = requests.Session()
+        payload = {"chat_id": self.chat_id, "text": text, "parse_mode": self.parse_mode}
+        for attempt in range(MAX_RETRIES):
+            wait = MIN_SEND_INTERVAL - (time.monotonic() - self._last_send)
+            if wait > 0:
+                time.sleep(wait)
+            self._last_send = time.monotonic()
+            try:
+                with metrics.http_request("telegram"):
+                    response = self._session.post(self.url, json=payload, timeout=REQUEST_TIMEOUT)
+            except requests.exceptions.RequestException as e:
+                print(f"Error sending Telegram notification: {e}")
+                time.sleep(_backoff(attempt))
+                continue
+
+            if response.ok:
+                print("Telegram notification sent successfully.")
+                return
+            metrics.HTTP_ERRORS.inc(service="telegram")
+            if response.status_code == 429:
+                retry_after = _retry_after(response)
+                print(f"Telegram rate limit hit. Retrying in {retry_after:.0f} seconds.")
+                time.sleep(retry_after)
+            elif response.status_code >= 500:
+                print(f"Telegram API error {response.status_code}. Retrying.")
+                time.sleep(_backoff(attempt))
+            else:
+                print(f"Telegram rejected the notification ({response.status_code}): {response.text}")
+                return
+        print(f"Giving up on a Telegram notification after {MAX_RETRIES} attempts.")
+
+def _backoff(attempt):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def _retry_after(response):
+    try:
+        return float(response.json()["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        return float(response.headers.get("Retry-After", BACKOFF_BASE))
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Finds the deepest Uniswap V3 pool for token pairs across all fee tiers.
+
+Pool addresses are derived locally (CREATE2), so discovery needs no `getPool`
+calls: the in-range `liquidity()` of every fee tier of every requested pair is
+read in one Multicall3 batch. Addresses without a deployed pool simply return
+nothing. The pool with the most in-range liquidity wins, since that is the one
+whose price is hardest to move.
+
+The choice is stored in the metadata cache and re-checked after
+POOL_REFRESH_INTERVAL seconds (env POOL_REFRESH_INTERVAL, default 6 hours),
+because liquidity migrates between tiers over time.
+
+Usage:
+    pools = find_deepest_pools(w3, [(WETH_ADDRESS, USDC_ADDRESS), (WBTC_ADDRESS, WETH_ADDRESS)])
+    pool, fee = pools[(WETH_ADDRESS, USDC_ADDRESS)]
+"""
+import os
+
+from core import compute_pool_address, sort_tokens
+from multicall import Call, aggregate3_chunked
+
+FEE_TIERS = [100, 500, 3000, 10000]
+
+POOL_REFRESH_INTERVAL = float(os.getenv("POOL_REFRESH_INTERVAL", 6 * 60 * 60))
+
+def tier_liquidity(w3, pairs, fee_tiers=FEE_TIERS):
+    """
+    Reads the in-range liquidity of every fee tier of every pair in one batch.
+    Returns {pair: [(fee, pool, liquidity), ...]} with only the pools that exist.
+    """
+    candidates = [
+        (pair, fee, compute_pool_address(*sort_tokens(*pair), fee))
+        for pair in pairs
+        for fee in fee_tiers
+    ]
+    results = aggregate3_chunked(w3, [Call(pool, "liquidity()", returns=["uint128"]) for _, _, pool in candidates])
+    tiers = {pair: [] for pair in pairs}
+    for (pair, fee, pool), liquidity in zip(candidates, results):
+        if liquidity is not None:
+            tiers[pair].append((fee, pool, liquidity))
+    return tiers
+
+def find_deepest_pools(w3, pairs, cache=None, refresh_interval=POOL_REFRESH_INTERVAL):
+    """
+    Returns {pair: (pool, fee)} with the deepest pool of each (token_a, token_b) pair,
+    or None for pairs without any pool. Choices younger than `refresh_interval` are
+    taken from the cache; the rest are discovered together in one multicall.
+    """
+    chosen = {}
+    stale = []
+    for pair in dict.fromkeys(pairs):
+        cached = cache.get_pool_choice(*pair, refresh_interval) if cache else None
+        if cached:
+            chosen[pair] = cached
+        else:
+            stale.append(pair)
+
+    if stale:
+        for pair, tiers in tier_liquidity(w3, stale).items():
+            if not tiers:
+                chosen[pair] = None
+                continue
+            # Deepest first; on equal liquidity the cheaper tier wins
+            fee, pool, _ = max(tiers, key=lambda tier: (tier[2], -tier[0]))
+            chosen[pair] = (pool, fee)
+            if cache:
+                cache.set_pool_choice(*pair, pool, fee)
+    return chosen
@@ -0,0 +1,371 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Local, reorg-tolerant indexer of Uniswap V3 pool events.
+
+Backfills the `Swap`, `Mint`, `Burn` and `Collect` logs of the configured pools
+with chunked `eth_getLogs` requests, fetched in parallel across every endpoint
+of the RPC pool, and stores them in a compact SQLite database (raw topics and
+data, decoded on read). Each pool has a block checkpoint, so later runs only
+fetch new blocks. A sync stops at the lowest head among the endpoints it fetches
+from, so a lagging node can never leave a silent gap behind the checkpoint.
+Long backfills are written in block order, CHUNKS_PER_BATCH chunks at a time,
+each with its checkpoint, so memory stays bounded and an interrupted backfill
+resumes where it stopped.
+
+Near the head, the hashes of recently indexed blocks are kept. On every sync the
+stored tip is compared with the chain; after a reorg the indexer walks back to
+the last block that still matches and deletes everything after it.
+
+Usage:
+    python pool_indexer.py --pool 0xC6962004f452bE9203591991D15f6b388e09E8D0 --from-block 250000000
+    python pool_indexer.py --pool 0x... --follow
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core import get_web3, load_env
+
+DEFAULT_INDEX_PATH = "pool_events.sqlite"
+
+# Blocks per eth_getLogs request (chunks that return too many logs are split)
+DEFAULT_CHUNK_SIZE = 5000
+
+# Chunks fetched, stored and checkpointed together, so a backfill resumes where it stopped
+CHUNKS_PER_BATCH = 32
+
+# Block hashes kept for reorg detection
+REORG_WINDOW = 1024
+
+# Seconds between syncs in --follow mode
+FOLLOW_INTERVAL = 5
+
+# How far back a new pool is backfilled when no --from-block is given
+DEFAULT_BACKFILL_BLOCKS = 100000
+
+# Endpoints further than this many blocks behind the newest head sit out a sync
+MAX_HEAD_LAG = 100
+
+# Event name -> (topic0, types of the non-indexed data fields, names of the indexed fields, names of the data fields)
+EVENTS = {
+    "Swap": (
+        "0xc42079f94a6350d7e6235f29174924f928cc2ac818eb64fed8004e115fbcca67",
+        ["int256", "int256", "uint160", "uint128", "int24"],
+        ["sender", "recipient"],
+        ["amount0", "amount1", "sqrt_price_x96", "liquidity", "tick"],
+    ),
+    "Mint": (
+        "0x7a53080ba414158be7ec69b987b5fb7d07dee101fe85488f0853ae16239d0bde",
+        ["address", "uint128", "uint256", "uint256"],
+        ["owner", "tick_lower", "tick_upper"],
+        ["sender", "amount", "amount0", "amount1"],
+    ),
+    "Burn": (
+        "0x0c396cd989a39f4459b5fa1aed6a9a8dcdbc45908acfd67e028cd568da98982c",
+        ["uint128", "uint256", "uint256"],
+        ["owner", "tick_lower", "tick_upper"],
+        ["amount", "amount0", "amount1"],
+    ),
+    "Collect": (
+        "0x70935338e69775456a85ddef226c395fb668b63fa0115f5f20610b388e6ca9c0",
+        ["address", "uint128", "uint128"],
+        ["owner", "tick_lower", "tick_upper"],
+        ["recipient", "amount0", "amount1"],
+    ),
+}
+
+EVENT_IDS = {name: index for index, name in enumerate(EVENTS)}
+TOPIC_TO_EVENT = {spec[0]: name for name, spec in EVENTS.items()}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pools (
+    id INTEGER PRIMARY KEY,
+    address TEXT NOT NULL UNIQUE,
+    start_block INTEGER NOT NULL,
+    checkpoint INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    pool_id INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    event INTEGER NOT NULL,
+    tx_hash BLOB NOT NULL,
+    topics BLOB NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (pool_id, block_number, log_index)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS block_hashes (
+    block_number INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+"""
+
+class RangeTooLarge(Exception):
+    """The node refused an eth_getLogs range (too many results or blocks)."""
+
+# --- Store ---
+
+class PoolEventStore:
+    """SQLite store of raw pool events with per-pool checkpoints and recent block hashes."""
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("POOL_INDEX_PATH", DEFAULT_INDEX_PATH)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    def add_pool(self, address, start_block):
+        """Registers a pool; indexing starts after `start_block`. Existing pools keep their checkpoint."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO pools (address, start_block, checkpoint) VALUES (?, ?, ?)",
+                (address.lower(), start_block, start_block),
+            )
+
+    def checkpoints(self):
+        """Returns {pool_address: last indexed block}."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT address, checkpoint FROM pools").fetchall())
+
+    def store_logs(self, logs, pools, to_block, block_hash=None):
+        """
+        Stores raw logs and moves the given pools' checkpoints to `to_block` in one transaction.
+        `block_hash` (of `to_block`, kept for reorg detection) may be None when it is unknown.
+        """
+        with self._lock, self._conn:
+            pool_ids = dict(self._conn.execute("SELECT address, id FROM pools").fetchall())
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        pool_ids[log["address"].lower()],
+                        int(log["blockNumber"], 16),
+                        int(log["logIndex"], 16),
+                        EVENT_IDS[TOPIC_TO_EVENT[log["topics"][0]]],
+                        bytes.fromhex(log["transactionHash"][2:]),
+                        b"".join(bytes.fromhex(topic[2:]) for topic in log["topics"][1:]),
+                        bytes.fromhex(log["data"][2:]),
+                    )
+                    for log in logs
+                ],
+            )
+            self._conn.executemany(
+                "UPDATE pools SET checkpoint = ? WHERE address = ?",
+                [(to_block, pool.lower()) for pool in pools],
+            )
+            if block_hash is not None:
+                self._conn.execute("INSERT OR REPLACE INTO block_hashes VALUES (?, ?)", (to_block, block_hash))
+                self._conn.execute("DELETE FROM block_hashes WHERE block_number < ?", (to_block - REORG_WINDOW,))
+
+    def recent_block_hashes(self):
+        """Returns the stored (block_number, hash) pairs, newest first."""
+        with self._lock:
+            return self._conn.execute("SELECT block_number, hash FROM block_hashes ORDER BY block_number DESC").fetchall()
+
+    def rollback(self, block_number):
+        """Deletes everything after `block_number` and rewinds checkpoints to it (never before a pool's start)."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM events WHERE block_number > ?", (block_number,))
+            self._conn.execute("DELETE FROM block_hashes WHERE block_number > ?", (block_number,))
+            self._conn.execute(
+                "UPDATE pools SET checkpoint = MAX(start_block, ?) WHERE checkpoint > ?",
+                (block_number, block_number),
+            )
+
+    def events(self, pool, from_block=0, to_block=None, kinds=None):
+        """Yields decoded events of a pool in chain order, optionally filtered by block range and event names."""
+        query = (
+            "SELECT e.block_number, e.log_index, e.event, e.tx_hash, e.topics, e.data FROM events e "
+            "JOIN pools p ON p.id = e.pool_id WHERE p.address = ? AND e.block_number >= ? AND e.block_number <= ?"
+        )
+        params = [pool.lower(), from_block, to_block if to_block is not None else sys.maxsize]
+        if kinds:
+            query += f" AND e.event IN ({','.join('?' * len(kinds))})"
+            params += [EVENT_IDS[kind] for kind in kinds]
+        query += " ORDER BY e.block_number, e.log_index"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        for row in rows:
+            yield decode_event(*row)
+
+    def close(self):
+        self._conn.close()
+
+def decode_event(block_number, log_index, event_id, tx_hash, topics, data):
+    """Decodes a stored event row into a dict."""
+    from eth_abi import decode
+
+    name = list(EVENTS)[event_id]
+    _, data_types, indexed_names, data_names = EVENTS[name]
+    event = {"event": name, "block_number": block_number, "log_index": log_index, "tx_hash": "0x" + bytes(tx_hash).hex()}
+    for i, field in enumerate(indexed_names):
+        word = bytes(topics[32 * i:32 * (i + 1)])
+        if field.startswith("tick"):
+            event[field] = decode(["int24"], word)[0]
+        else:
+            event[field] = "0x" + word[12:].hex()
+    event.update(zip(data_names, decode(data_types, bytes(data))))
+    return event
+
+# --- Fetching ---
+
+def _rpc(provider, endpoint, method, params):
+    response = provider.send_to(endpoint, method, params)
+    if "error" in response:
+        message = str(response["error"].get("message", response["error"]))
+        if method == "eth_getLogs" and any(hint in message.lower() for hint in ("range", "too many", "limit", "exceed", "10000")):
+            raise RangeTooLarge(message)
+        raise RuntimeError(f"{method} failed: {message}")
+    return response["result"]
+
+def fetch_logs(provider, pools, from_block, to_block, chunk_size=DEFAULT_CHUNK_SIZE, endpoints=None):
+    """
+    Fetches all pool event logs in [from_block, to_block] with chunked eth_getLogs.
+    Chunks are spread across `endpoints` (default: all of the pool's) and fetched in
+    parallel; a chunk the node refuses is split in half, and a failing endpoint hands
+    its chunk to the next. Every endpoint must already be at `to_block`.
+    """
+    topics = [[spec[0] for spec in EVENTS.values()]]
+    endpoints = endpoints or provider.ranked_endpoints()
+
+    def fetch(chunk_start, chunk_end, attempt=0):
+        endpoint = endpoints[(chunk_start // chunk_size + attempt) % len(endpoints)]
+        log_filter = {"address": pools, "topics": topics, "fromBlock": hex(chunk_start), "toBlock": hex(chunk_end)}
+        try:
+            return _rpc(provider, endpoint, "eth_getLogs", [log_filter])
+        except RangeTooLarge:
+            if chunk_start == chunk_end:
+                raise
+            middle = (chunk_start + chunk_end) // 2
+            return fetch(chunk_start, middle, attempt) + fetch(middle + 1, chunk_end, attempt)
+        except Exception:
+            if attempt + 1 >= len(endpoints):
+                raise
+            return fetch(chunk_start, chunk_end, attempt + 1)
+
+    chunks = [(start, min(start + chunk_size - 1, to_block)) for start in range(from_block, to_block + 1, chunk_size)]
+    with ThreadPoolExecutor(max_workers=max(1, 2 * len(endpoints))) as executor:
+        results = executor.map(lambda chunk: fetch(*chunk), chunks)
+        return [log for chunk_logs in results for log in chunk_logs if not log.get("removed")]
+
+def endpoint_heads(provider):
+    """Returns {endpoint: head block} for every endpoint of the pool that answers, best first."""
+    endpoints = provider.ranked_endpoints()
+
+    def head(endpoint):
+        try:
+            return int(_rpc(provider, endpoint, "eth_blockNumber", []), 16)
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=len(endpoints)) as executor:
+        heads = list(executor.map(head, endpoints))
+    return {endpoint: block for endpoint, block in zip(endpoints, heads) if block is not None}
+
+def get_block_hash(provider, endpoint, block_number):
+    """The hash of a block on one endpoint, or None if the endpoint does not have it (yet)."""
+    block = _rpc(provider, endpoint, "eth_getBlockByNumber", [hex(block_number), False])
+    return block["hash"] if block else None
+
+# --- Indexer ---
+
+def detect_reorg(store, provider, endpoint):
+    """
+    Compares the stored block hashes with `endpoint`'s chain, newest first. Blocks the
+    endpoint does not have are skipped as unknown. If a known block no longer matches,
+    rolls the store back to the newest block that does and returns it; otherwise None.
+    """
+    recent = store.recent_block_hashes()
+    mismatched = False
+    for block_number, block_hash in recent:
+        current = get_block_hash(provider, endpoint, block_number)
+        if current is None:
+            continue
+        if current == block_hash:
+            if not mismatched:
+                return None
+            store.rollback(block_number)
+            return block_number
+        mismatched = True
+    if not mismatched:
+        return None
+    # No stored block survived: re-index a whole window below the oldest one
+    fork_point = max(0, recent[-1][0] - REORG_WINDOW)
+    store.rollback(fork_point)
+    return fork_point
+
+def sync(store, provider, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Brings every pool up to the current head. Returns (head, number of new events)."""
+    # An endpoint answers eth_getLogs with [] past its own head, so only index up to
+    # the lowest head of the endpoints used; far-behind endpoints sit this sync out
+    heads = endpoint_heads(provider)
+    if not heads:
+        raise RuntimeError("No RPC endpoint answered eth_blockNumber")
+    newest = max(heads.values())
+    heads = {endpoint: block for endpoint, block in heads.items() if block >= newest - MAX_HEAD_LAG}
+    # Block hashes come from the endpoint whose head bounds the sync, so they match its logs
+    lowest = min(heads, key=heads.get)
+    head = heads[lowest]
+
+    rolled_back_to = detect_reorg(store, provider, lowest)
+    if rolled_back_to is not None:
+        print(f"Reorg detected: rolled back to block {rolled_back_to}.")
+
+    # Pools with the same checkpoint are fetched together
+    by_checkpoint = {}
+    for pool, checkpoint in store.checkpoints().items():
+        if checkpoint < head:
+            by_checkpoint.setdefault(checkpoint, []).append(pool)
+
+    total = 0
+    batch_size = chunk_size * CHUNKS_PER_BATCH
+    for checkpoint, pools in sorted(by_checkpoint.items()):
+        for batch_start in range(checkpoint + 1, head + 1, batch_size):
+            batch_end = min(batch_start + batch_size - 1, head)
+            logs = fetch_logs(provider, pools, batch_start, batch_end, chunk_size, list(heads))
+            # Only blocks a reorg can still reach need their hash
+            block_hash = get_block_hash(provider, lowest, batch_end) if head - batch_end <= REORG_WINDOW else None
+            store.store_logs(logs, pools, batch_end, block_hash)
+            total += len(logs)
+    return head, total
+
+def main():
+    parser = argparse.ArgumentParser(description="Index Uniswap V3 pool events into a local SQLite store.")
+    parser.add_argument("--pool", action="append", default=[], help="Pool address to index (repeatable).")
+    parser.add_argument("--from-block", type=int, help=f"First block for newly added pools (default: head - {DEFAULT_BACKFILL_BLOCKS}).")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Blocks per eth_getLogs request.")
+    parser.add_argument("--db", help=f"Path of the SQLite store (default: POOL_INDEX_PATH or {DEFAULT_INDEX_PATH}).")
+    parser.add_argument("--follow", action="store_true", help="Keep syncing new blocks.")
+    args = parser.parse_args()
+    load_env()
+
+    provider = get_web3().provider
+    store = PoolEventStore(args.db)
+    if args.pool:
+        if args.from_block is None:
+            head = int(provider.make_request("eth_blockNumber", [])["result"], 16)
+            start_block = max(0, head - DEFAULT_BACKFILL_BLOCKS)
+        else:
+            start_block = args.from_block
+        for pool in args.pool:
+            store.add_pool(pool, start_block - 1)
+
+    if not store.checkpoints():
+        print("No pools configured. Add one with --pool.")
+        sys.exit(1)
+
+    while True:
+        started = time.monotonic()
+        head, count = sync(store, provider, args.chunk_size)
+        print(f"Indexed up to block {head}: {count} new events in {time.monotonic() - started:.1f}s.")
+        if not args.follow:
+            break
+        time.sleep(FOLLOW_INTERVAL)
+
+if __name__ == "__main__":
+    main()
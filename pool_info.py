@@ -10,97 +10,355 @@ Usage:
 
   2. Run the script with the NFT ID as the argument:
      python pool_info.py <YOUR_NFT_ID>
+
+  3. Portfolio mode: summarize several positions and/or every position owned by
+     one or more addresses in a single table (or JSON with --json):
+     python pool_info.py 12345 67890 --owner 0xYourWallet --owner 0xOtherWallet
+
+  4. Add --depth to a single position to see how much liquidity the pool has
+     within a few percent of the current price:
+     python pool_info.py <YOUR_NFT_ID> --depth
+
+  5. Add --metrics to print the run's RPC latencies, errors and cache hit rates,
+     and --profile to see where the time went.
 """
 import os
 import sys
 import argparse
-from web3 import Web3
+import contextlib
 import json
-from dotenv import load_dotenv
-
-load_dotenv()
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# --- Contract Addresses and ABIs (These are the same for Mainnet and Arbitrum) ---
-
-# Uniswap V3 Nonfungible Position Manager
-NFPM_ADDRESS = "0xC36442b4a4522E871399CD717aBDD847Ab11FE88"
-NFPM_ABI = json.loads('[{"inputs":[{"internalType":"address","name":"_factory","type":"address"},{"internalType":"address","name":"_WETH9","type":"address"},{"internalType":"address","name":"_tokenDescriptor_","type":"address"}],"stateMutability":"nonpayable","type":"constructor"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"address","name":"owner","type":"address"},{"indexed":true,"internalType":"address","name":"approved","type":"address"},{"indexed":true,"internalType":"uint256","name":"tokenId","type":"uint256"}],"name":"Approval","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"address","name":"owner","type":"address"},{"indexed":true,"internalType":"address","name":"operator","type":"address"},{"indexed":false,"internalType":"bool","name":"approved","type":"bool"}],"name":"ApprovalForAll","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"uint256","name":"tokenId","type":"uint256"},{"indexed":false,"internalType":"address","name":"recipient","type":"address"},{"indexed":false,"internalType":"uint256","name":"amount0","type":"uint256"},{"indexed":false,"internalType":"uint256","name":"amount1","type":"uint256"}],"name":"Collect","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"uint256","name":"tokenId","type":"uint256"},{"indexed":false,"internalType":"uint128","name":"liquidity","type":"uint128"},{"indexed":false,"internalType":"uint256","name":"amount0","type":"uint256"},{"indexed":false,"internalType":"uint256","name":"amount1","type":"uint256"}],"name":"DecreaseLiquidity","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"uint256","name":"tokenId","type":"uint256"},{"indexed":false,"internalType":"uint128","name":"liquidity","type":"uint128"},{"indexed":false,"internalType":"uint256","name":"amount0","type":"uint256"},{"indexed":false,"internalType":"uint256","name":"amount1","type":"uint256"}],"name":"IncreaseLiquidity","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"address","name":"from","type":"address"},{"indexed":true,"internalType":"address","name":"to","type":"address"},{"indexed":true,"internalType":"uint256","name":"tokenId","type":"uint256"}],"name":"Transfer","type":"event"},{"inputs":[],"name":"DOMAIN_SEPARATOR","outputs":[{"internalType":"bytes32","name":"","type":"bytes32"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"PERMIT_TYPEHASH","outputs":[{"internalType":"bytes32","name":"","type":"bytes32"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"WETH9","outputs":[{"internalType":"address","name":"","type":"address"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"to","type":"address"},{"internalType":"uint256","name":"tokenId","type":"uint256"}],"name":"approve","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"address","name":"owner","type":"address"}],"name":"balanceOf","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[{"components":[{"internalType":"address","name":"token0","type":"address"},{"internalType":"address","name":"token1","type":"address"},{"internalType":"uint24","name":"fee","type":"uint24"},{"internalType":"int24","name":"tickLower","type":"int24"},{"internalType":"int24","name":"tickUpper","type":"int24"},{"internalType":"uint256","name":"amount0Desired","type":"uint256"},{"internalType":"uint256","name":"amount1Desired","type":"uint256"},{"internalType":"uint256","name":"amount0Min","type":"uint256"},{"internalType":"uint256","name":"amount1Min","type":"uint256"},{"internalType":"address","name":"recipient","type":"address"},{"internalType":"uint256","name":"deadline","type":"uint256"}],"internalType":"struct INonfungiblePositionManager.MintParams","name":"params","type":"tuple"}],"name":"mint","outputs":[{"internalType":"uint256","name":"tokenId","type":"uint256"},{"internalType":"uint128","name":"liquidity","type":"uint128"},{"internalType":"uint256","name":"amount0","type":"uint256"},{"internalType":"uint256","name":"amount1","type":"uint256"}],"stateMutability":"payable","type":"function"},{"inputs":[{"internalType":"uint256","name":"tokenId","type":"uint256"}],"name":"positions","outputs":[{"internalType":"uint96","name":"nonce","type":"uint96"},{"internalType":"address","name":"operator","type":"address"},{"internalType":"address","name":"token0","type":"address"},{"internalType":"address","name":"token1","type":"address"},{"internalType":"uint24","name":"fee","type":"uint24"},{"internalType":"int24","name":"tickLower","type":"int24"},{"internalType":"int24","name":"tickUpper","type":"int24"},{"internalType":"uint128","name":"liquidity","type":"uint128"},{"internalType":"uint256","name":"feeGrowthInside0LastX128","type":"uint256"},{"internalType":"uint256","name":"feeGrowthInside1LastX128","type":"uint256"},{"internalType":"uint128","name":"tokensOwed0","type":"uint128"},{"internalType":"uint128","name":"tokensOwed1","type":"uint128"}],"stateMutability":"view","type":"function"}]')
-
-# Uniswap V3 Factory
-FACTORY_ADDRESS = "0x1F98431c8aD98523631AE4a59f267346ea31F984"
-FACTORY_ABI = json.loads('[{"inputs":[{"internalType":"address","name":"_feeTo","type":"address"},{"internalType":"address","name":"_feeToSetter","type":"address"}],"stateMutability":"nonpayable","type":"constructor"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"uint24","name":"fee","type":"uint24"},{"indexed":true,"internalType":"int24","name":"tickSpacing","type":"int24"}],"name":"FeeAmountEnabled","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"address","name":"oldOwner","type":"address"},{"indexed":true,"internalType":"address","name":"newOwner","type":"address"}],"name":"OwnerChanged","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"address","name":"token0","type":"address"},{"indexed":true,"internalType":"address","name":"token1","type":"address"},{"indexed":true,"internalType":"uint24","name":"fee","type":"uint24"},{"indexed":false,"internalType":"int24","name":"tickSpacing","type":"int24"},{"indexed":false,"internalType":"address","name":"pool","type":"address"}],"name":"PoolCreated","type":"event"},{"inputs":[{"internalType":"address","name":"tokenA","type":"address"},{"internalType":"address","name":"tokenB","type":"address"},{"internalType":"uint24","name":"fee","type":"uint24"}],"name":"getPool","outputs":[{"internalType":"address","name":"pool","type":"address"}],"stateMutability":"view","type":"function"}]')
-
-# Standard ERC20 ABI (for symbol and decimals)
-ERC20_ABI = json.loads('[{"constant":true,"inputs":[],"name":"symbol","outputs":[{"name":"","type":"string"}],"payable":false,"stateMutability":"view","type":"function"},{"constant":true,"inputs":[],"name":"decimals","outputs":[{"name":"","type":"uint8"}],"payable":false,"stateMutability":"view","type":"function"}]')
-
-# Uniswap V3 Pool ABI (for slot0)
-POOL_ABI = json.loads('[{"inputs":[],"name":"slot0","outputs":[{"internalType":"uint160","name":"sqrtPriceX96","type":"uint160"},{"internalType":"int24","name":"tick","type":"int24"},{"internalType":"uint16","name":"observationIndex","type":"uint16"},{"internalType":"uint16","name":"observationCardinality","type":"uint16"},{"internalType":"uint16","name":"observationCardinalityNext","type":"uint16"},{"internalType":"uint8","name":"feeProtocol","type":"uint8"},{"internalType":"bool","name":"unlocked","type":"bool"}],"stateMutability":"view","type":"function"}]')
+import metrics
+from core import NFPM_ADDRESS, POSITION_TYPES, SLOT0_TYPES, TICK_TYPES, compute_pool_address, get_metadata_cache, get_web3, load_env
+from multicall import Call, aggregate3, aggregate3_batched, decode_symbol
+from tick_math import sqrt_price_x96_to_price, tick_to_price
+
+# Maximum number of concurrent multicall requests in portfolio mode
+DEFAULT_CONCURRENCY = 8
+
+def fetch_position_data(w3, nft_id, cache=None):
+    """
+    Reads everything needed for a position in two Multicall3 rounds:
+    the position itself, then token metadata, the pool's state and its bound ticks.
+    Token metadata found in `cache` is not read again.
+    """
+    # Round 1: the position determines which tokens and pool to read
+    position = aggregate3(w3, [
+        Call(NFPM_ADDRESS, "positions(uint256)", [nft_id], POSITION_TYPES, allow_failure=False),
+    ])[0]
+    token0_addr, token1_addr, fee = position[2], position[3], position[4]
+    pool_address = compute_pool_address(token0_addr, token1_addr, fee)
+
+    # Round 2: token metadata, pool state and the position's ticks. A broken symbol() must not sink the batch.
+    tokens, missing, calls = resolve_token_calls(cache, [token0_addr, token1_addr])
+    results = aggregate3(w3, [
+        *calls,
+        *pool_state_calls(pool_address),
+        tick_call(pool_address, position[5]),
+        tick_call(pool_address, position[6]),
+    ])
+    store_token_results(cache, tokens, missing, results[:len(calls)])
+    slot0, fee_growth_global0, fee_growth_global1, lower, upper = results[len(calls):]
+    if slot0 is None:
+        raise ValueError(f"Could not read slot0 from pool {pool_address}")
+    for token in (token0_addr, token1_addr):
+        if tokens[token][1] is None:
+            raise ValueError(f"Could not read decimals() of token {token}")
+
+    data = build_position_data(position, tokens, pool_address, slot0)
+    add_valuations([data], [valuation_inputs(position, slot0, (fee_growth_global0, fee_growth_global1), lower, upper)])
+    return data
+
+def token_calls(token):
+    """Multicall reads for a token's symbol and decimals."""
+    return [
+        Call(token, "symbol()", decoder=decode_symbol),
+        Call(token, "decimals()", returns=["uint8"]),
+    ]
+
+def resolve_token_calls(cache, addresses):
+    """
+    Looks tokens up in the metadata cache. Returns the cached {address: (symbol, decimals)},
+    the addresses still missing and the multicall reads needed for them.
+    """
+    tokens = {}
+    missing = []
+    for address in addresses:
+        cached = cache.get_token(address) if cache else None
+        # Rows without a symbol (written by decimals-only lookups) are re-read
+        if cached and cached[0] is not None:
+            tokens[address] = cached
+        else:
+            missing.append(address)
+    calls = [call for token in missing for call in token_calls(token)]
+    return tokens, missing, calls
+
+def store_token_results(cache, tokens, missing, results):
+    """Adds freshly read token metadata to `tokens` and to the metadata cache."""
+    for i, address in enumerate(missing):
+        symbol, decimals = results[2 * i], results[2 * i + 1]
+        tokens[address] = (symbol, decimals)
+        if cache and decimals is not None:
+            cache.set_token(address, symbol, decimals)
+
+def pool_state_calls(pool_address):
+    """Multicall reads for a pool's slot0 and global fee growth."""
+    return [
+        Call(pool_address, "slot0()", returns=SLOT0_TYPES),
+        Call(pool_address, "feeGrowthGlobal0X128()", returns=["uint256"]),
+        Call(pool_address, "feeGrowthGlobal1X128()", returns=["uint256"]),
+    ]
+
+def tick_call(pool_address, tick):
+    """Multicall read of a pool tick (its feeGrowthOutside values are needed for fees)."""
+    return Call(pool_address, "ticks(int24)", [tick], TICK_TYPES)
+
+def valuation_inputs(position, slot0, fee_growth_globals, lower, upper):
+    """Collects the inputs of position_valuation.value_positions, or None if a read failed."""
+    if None in (slot0, lower, upper, *fee_growth_globals):
+        return None
+    return {
+        "sqrt_price_x96": slot0[0],
+        "current_tick": slot0[1],
+        "tick_lower": position[5],
+        "tick_upper": position[6],
+        "liquidity": position[7],
+        "fee_growth_global0": fee_growth_globals[0],
+        "fee_growth_global1": fee_growth_globals[1],
+        "fee_growth_outside_lower0": lower[2],
+        "fee_growth_outside_lower1": lower[3],
+        "fee_growth_outside_upper0": upper[2],
+        "fee_growth_outside_upper1": upper[3],
+        "fee_growth_inside_last0": position[8],
+        "fee_growth_inside_last1": position[9],
+        "tokens_owed0": position[10],
+        "tokens_owed1": position[11],
+    }
+
+def add_valuations(rows, inputs):
+    """
+    Adds token amounts and uncollected fees (raw units) to each row, valuing all
+    positions in one vectorized pass. Rows whose inputs are None get None values.
+    """
+    from position_valuation import value_positions
+
+    valid = [i for i, position_inputs in enumerate(inputs) if position_inputs is not None]
+    values = value_positions([inputs[i] for i in valid]) if valid else {}
+    for row in rows:
+        row.update(amount0=None, amount1=None, fees0=None, fees1=None)
+    for j, i in enumerate(valid):
+        rows[i].update({key: int(column[j]) for key, column in values.items()})
+
+def build_position_data(position, tokens, pool_address, slot0):
+    """Combines a decoded position, token metadata ({address: (symbol, decimals)}) and slot0."""
+    token0_addr, token1_addr = position[2], position[3]
+    token0_symbol, token0_decimals = tokens[token0_addr]
+    token1_symbol, token1_decimals = tokens[token1_addr]
+    return {
+        "token0": token0_addr,
+        "token1": token1_addr,
+        "token0_symbol": token0_symbol or token0_addr[:10],
+        "token1_symbol": token1_symbol or token1_addr[:10],
+        "token0_decimals": token0_decimals,
+        "token1_decimals": token1_decimals,
+        "fee": position[4],
+        "tick_lower": position[5],
+        "tick_upper": position[6],
+        "liquidity": position[7],
+        "pool_address": pool_address,
+        "sqrt_price_x96": slot0[0],
+        "current_tick": slot0[1],
+    }
+
+# --- Portfolio Mode ---
+
+async def fetch_portfolio(node_url, owners, nft_ids, concurrency=DEFAULT_CONCURRENCY, cache=None):
+    """
+    Resolves every requested position concurrently with AsyncWeb3.
+
+    Owners are enumerated through balanceOf/tokenOfOwnerByIndex, and each distinct
+    token and pool is read only once, so the number of requests grows with the
+    number of distinct pools rather than the number of positions. All rounds read
+    the same block, so the table is a consistent snapshot.
+    """
+    import asyncio
+    from web3 import AsyncHTTPProvider, AsyncWeb3
+    from eth_utils import to_checksum_address
+
+    # The chain ID web3 checks around every eth_call never changes
+    w3 = AsyncWeb3(AsyncHTTPProvider(node_url, cache_allowed_requests=True, cacheable_requests={"eth_chainId"}))
+    semaphore = asyncio.Semaphore(concurrency)
+    try:
+        block = await w3.eth.block_number
+
+        # Round 1: how many positions each owner holds
+        owners = [to_checksum_address(owner) for owner in owners]
+        balances = await aggregate3_batched(w3, [
+            Call(NFPM_ADDRESS, "balanceOf(address)", [owner], ["uint256"], allow_failure=False)
+            for owner in owners
+        ], semaphore, block_identifier=block)
+
+        # Round 2: enumerate the token IDs of every owner
+        owned_ids = await aggregate3_batched(w3, [
+            Call(NFPM_ADDRESS, "tokenOfOwnerByIndex(address,uint256)", [owner, index], ["uint256"], allow_failure=False)
+            for owner, balance in zip(owners, balances)
+            for index in range(balance)
+        ], semaphore, block_identifier=block)
+        all_ids = list(dict.fromkeys(list(nft_ids) + owned_ids))
+
+        # Round 3: position details. Burned or invalid IDs yield None.
+        positions = await aggregate3_batched(w3, [
+            Call(NFPM_ADDRESS, "positions(uint256)", [nft_id], POSITION_TYPES)
+            for nft_id in all_ids
+        ], semaphore, block_identifier=block)
+        found = [(nft_id, position) for nft_id, position in zip(all_ids, positions) if position is not None]
+        for nft_id, position in zip(all_ids, positions):
+            if position is None:
+                print(f"Warning: Could not read position {nft_id}. Skipping.", file=sys.stderr)
+
+        # Round 4: each distinct pool, pool tick and uncached token is read once
+        tokens, missing, calls = resolve_token_calls(cache, list(dict.fromkeys(
+            address for _, position in found for address in (position[2], position[3])
+        )))
+        pool_addresses = list(dict.fromkeys(
+            compute_pool_address(position[2], position[3], position[4]) for _, position in found
+        ))
+        pool_ticks = list(dict.fromkeys(
+            (compute_pool_address(position[2], position[3], position[4]), tick)
+            for _, position in found
+            for tick in (position[5], position[6])
+        ))
+        results = await aggregate3_batched(w3, [
+            *calls,
+            *(call for pool in pool_addresses for call in pool_state_calls(pool)),
+            *(tick_call(pool, tick) for pool, tick in pool_ticks),
+        ], semaphore, block_identifier=block)
+    finally:
+        await w3.provider.disconnect()
+
+    store_token_results(cache, tokens, missing, results[:len(calls)])
+    pool_results = results[len(calls):len(calls) + 3 * len(pool_addresses)]
+    pool_states = {pool: pool_results[3 * i:3 * i + 3] for i, pool in enumerate(pool_addresses)}
+    tick_infos = dict(zip(pool_ticks, results[len(calls) + 3 * len(pool_addresses):]))
+
+    rows = []
+    inputs = []
+    for nft_id, position in found:
+        pool_address = compute_pool_address(position[2], position[3], position[4])
+        slot0, fee_growth_global0, fee_growth_global1 = pool_states[pool_address]
+        if slot0 is None:
+            print(f"Warning: Could not read slot0 from pool {pool_address}. Skipping position {nft_id}.", file=sys.stderr)
+            continue
+        data = build_position_data(position, tokens, pool_address, slot0)
+        data["nft_id"] = nft_id
+        data["in_range"] = data["tick_lower"] <= data["current_tick"] <= data["tick_upper"]
+        rows.append(data)
+        # A token whose decimals() failed cannot be priced: its positions are reported with an error
+        broken = [token for token in (position[2], position[3]) if tokens[token][1] is None]
+        if broken:
+            data["price"] = None
+            data["error"] = f"Could not read decimals() of token {broken[0]}"
+            inputs.append(None)
+            continue
+        data["price"] = sqrt_price_x96_to_price(data["sqrt_price_x96"], data["token0_decimals"], data["token1_decimals"])
+        data["error"] = None
+        inputs.append(valuation_inputs(
+            position, slot0, (fee_growth_global0, fee_growth_global1),
+            tick_infos[(pool_address, position[5])], tick_infos[(pool_address, position[6])],
+        ))
+    add_valuations(rows, inputs)
+    return rows
+
+def format_amounts(row, key0, key1):
+    """Formats a pair of raw token amounts of a row as 'x TOKEN0 + y TOKEN1'."""
+    if row[key0] is None:
+        return "n/a"
+    return (f"{row[key0] / 10 ** row['token0_decimals']:.6g} {row['token0_symbol']} + "
+            f"{row[key1] / 10 ** row['token1_decimals']:.6g} {row['token1_symbol']}")
+
+def print_portfolio(rows):
+    """Prints a consolidated table with one line per position."""
+    header = (f"{'NFT ID':>10}  {'Pair':<16} {'Fee':>6}  {'Tick Range':>17}  {'Tick':>8}  {'Price (t1 in t0)':>18}  "
+              f"{'Holdings':<34}  {'Uncollected Fees':<34}  Status")
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        pair = f"{row['token0_symbol']}/{row['token1_symbol']}"
+        tick_range = f"{row['tick_lower']}:{row['tick_upper']}"
+        status = "In Range" if row["in_range"] else "Out of Range"
+        if row["error"]:
+            status = f"Error: {row['error']}"
+        price = "n/a" if row["price"] is None else f"{row['price']:.6f}"
+        print(f"{row['nft_id']:>10}  {pair:<16} {row['fee'] / 10000:>5}%  {tick_range:>17}  {row['current_tick']:>8}  "
+              f"{price:>18}  {format_amounts(row, 'amount0', 'amount1'):<34}  "
+              f"{format_amounts(row, 'fees0', 'fees1'):<34}  {status}")
+    pools = {row["pool_address"] for row in rows}
+    print(f"\n{len(rows)} positions across {len(pools)} pools, "
+          f"{sum(1 for row in rows if row['in_range'])} in range.")
+
+def run_portfolio(node_url, args, cache=None):
+    """Runs portfolio mode and prints a table or JSON."""
+    import asyncio
+    rows = asyncio.run(fetch_portfolio(node_url, args.owner, args.nft_ids, args.concurrency, cache))
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_portfolio(rows)
+
+def connect():
+    """Connects to a pool of ETHEREUM_NODE_URL/ARBITRUM_RPC_URL and the public Arbitrum nodes."""
+    if not os.environ.get("ETHEREUM_NODE_URL"):
+        print("ETHEREUM_NODE_URL not set. Using public Arbitrum nodes...")
+        print("Note: Public nodes may be slow or unreliable. For best results, set ETHEREUM_NODE_URL.")
 
-# List of public RPC nodes for Arbitrum
-PUBLIC_ARBITRUM_NODES = [
-    "https://arb1.arbitrum.io/rpc",
-    "https://rpc.ankr.com/arbitrum",
-    "https://arbitrum-one.public.blastapi.io",
-]
+    w3 = get_web3()
+    if not w3.is_connected():
+        print("\nError: Could not connect to any Arbitrum node.")
+        print("Please set the ETHEREUM_NODE_URL environment variable to a reliable Arbitrum node URL.")
+        print("e.g., export ETHEREUM_NODE_URL='https://arbitrum-mainnet.infura.io/v3/YOUR_PROJECT_ID'")
+        sys.exit(1)
 
-def tick_to_price(tick, decimals0, decimals1):
-    """Converts a Uniswap V3 tick to a human-readable price."""
-    return (1.0001 ** tick) * (10 ** (decimals0 - decimals1))
+    print(f"Connected. Fastest endpoint so far: {w3.provider.best_url()}")
+    return w3
 
 def main():
     """Main execution function."""
     parser = argparse.ArgumentParser(description="Get Uniswap V3 pool info from an NFT ID on Arbitrum.")
-    parser.add_argument("nft_id", type=int, help="The ID of the NFT representing the liquidity position.")
+    parser.add_argument("nft_ids", type=int, nargs="*", metavar="nft_id", help="The ID(s) of the NFT(s) representing the liquidity positions.")
+    parser.add_argument("--owner", action="append", default=[], help="Include every position owned by this address (repeatable).")
+    parser.add_argument("--json", action="store_true", help="Print the portfolio as JSON instead of a table.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Maximum concurrent requests in portfolio mode.")
+    parser.add_argument("--depth", action="store_true", help="Also snapshot the pool's ticks and show its liquidity depth.")
+    parser.add_argument("--profile", action="store_true", help="Profile the run (pyinstrument if installed, else cProfile) and print the report to stderr.")
+    parser.add_argument("--metrics", action="store_true", help="Print the run's RPC and cache metrics (Prometheus text format) to stderr.")
     args = parser.parse_args()
+    load_env()
 
-    # --- Initial Setup ---
-    node_url = os.environ.get("ETHEREUM_NODE_URL")
-    w3 = None
-
-    # Try connecting with the provided node_url first
-    if node_url:
-        print(f"Attempting to connect using ETHEREUM_NODE_URL: {node_url}")
+    if not args.nft_ids and not args.owner:
+        parser.error("provide at least one NFT ID or --owner address")
+    try:
+        with metrics.cycle("pool_info", args.profile):
+            run(args)
+    finally:
+        if args.metrics:
+            print(metrics.REGISTRY.render(), file=sys.stderr)
+
+def run(args):
+    """Fetches and prints the requested positions."""
+    portfolio_mode = len(args.nft_ids) != 1 or bool(args.owner) or args.json
+
+    # Keep stdout clean for JSON output
+    with contextlib.redirect_stdout(sys.stderr if args.json else sys.stdout):
+        w3 = connect()
+    cache = get_metadata_cache()
+
+    if portfolio_mode:
         try:
-            w3_test = Web3(Web3.HTTPProvider(node_url))
-            if w3_test.is_connected():
-                w3 = w3_test
-                print("Successfully connected using ETHEREUM_NODE_URL.")
-            else:
-                print(f"Warning: Could not connect to the node at {node_url}.")
+            run_portfolio(w3.provider.best_url(), args, cache)
         except Exception as e:
-            print(f"Warning: An error occurred while connecting to {node_url}: {e}")
-
-    # If the connection via ETHEREUM_NODE_URL failed or it wasn't set, try public nodes
-    if not w3:
-        if node_url:
-             print("Falling back to public Arbitrum nodes...")
-        else:
-             print("ETHEREUM_NODE_URL not set. Trying public Arbitrum nodes...")
-        
-        print("Note: Public nodes may be slow or unreliable. For best results, set ETHEREUM_NODE_URL.")
-        for url in PUBLIC_ARBITRUM_NODES:
-            try:
-                print(f"  Trying {url}... ", end="")
-                w3_test = Web3(Web3.HTTPProvider(url))
-                if w3_test.is_connected():
-                    print("Success!")
-                    w3 = w3_test
-                    break
-                else:
-                    print("Failed.")
-            except Exception:
-                print("Failed.")
-
-    # If still no connection, exit
-    if not w3:
-        print("\nError: Could not connect to any public Arbitrum nodes.")
-        print("Please set the ETHEREUM_NODE_URL environment variable to a reliable Arbitrum node URL.")
-        print("e.g., export ETHEREUM_NODE_URL='https://arbitrum-mainnet.infura.io/v3/YOUR_PROJECT_ID'")
-        sys.exit(1)
-
+            print(f"\nAn error occurred: {e}", file=sys.stderr)
+            print("Please check that the owner addresses and NFT IDs are valid on the Arbitrum Network.", file=sys.stderr)
+            sys.exit(1)
+        return
 
     print("--- Uniswap V4 Notice ---")
     print("Uniswap V4 is not yet deployed.")
@@ -109,42 +367,24 @@ def main():
 
 
     try:
-        nft_id = args.nft_id
+        nft_id = args.nft_ids[0]
         print(f"Fetching data for NFT Position ID: {nft_id} on Arbitrum...")
 
-        # --- Contract Instances ---
-        nfpm_contract = w3.eth.contract(address=NFPM_ADDRESS, abi=NFPM_ABI)
-        factory_contract = w3.eth.contract(address=FACTORY_ADDRESS, abi=FACTORY_ABI)
-
-        # 1. Get Position Details from the NFT
-        position = nfpm_contract.functions.positions(nft_id).call()
-        token0_addr = position[2]
-        token1_addr = position[3]
-        fee = position[4]
-        tick_lower = position[5]
-        tick_upper = position[6]
-        liquidity = position[7]
-
-        # 2. Get Token Information
-        token0_contract = w3.eth.contract(address=token0_addr, abi=ERC20_ABI)
-        token1_contract = w3.eth.contract(address=token1_addr, abi=ERC20_ABI)
-
-        token0_symbol = token0_contract.functions.symbol().call()
-        token0_decimals = token0_contract.functions.decimals().call()
-        token1_symbol = token1_contract.functions.symbol().call()
-        token1_decimals = token1_contract.functions.decimals().call()
-
-        # 3. Get Pool Address
-        pool_address = factory_contract.functions.getPool(token0_addr, token1_addr, fee).call()
-
-        # 4. Get Current Pool Price
-        pool_contract = w3.eth.contract(address=pool_address, abi=POOL_ABI)
-        slot0 = pool_contract.functions.slot0().call()
-        current_tick = slot0[1]
+        data = fetch_position_data(w3, nft_id, cache)
+        token0_symbol = data["token0_symbol"]
+        token1_symbol = data["token1_symbol"]
+        token0_decimals = data["token0_decimals"]
+        token1_decimals = data["token1_decimals"]
+        fee = data["fee"]
+        tick_lower = data["tick_lower"]
+        tick_upper = data["tick_upper"]
+        liquidity = data["liquidity"]
+        pool_address = data["pool_address"]
+        current_tick = data["current_tick"]
 
         # --- Calculations ---
         # The price of token1 in terms of token0
-        price_t1_in_t0 = tick_to_price(current_tick, token0_decimals, token1_decimals)
+        price_t1_in_t0 = sqrt_price_x96_to_price(data["sqrt_price_x96"], token0_decimals, token1_decimals)
         price_lower = tick_to_price(tick_lower, token0_decimals, token1_decimals)
         price_upper = tick_to_price(tick_upper, token0_decimals, token1_decimals)
 
@@ -168,6 +408,8 @@ def main():
         print("\n--- Your Position Details ---")
         print(f"Liquidity: {liquidity}")
         print(f"Status: {'In Range' if tick_lower <= current_tick <= tick_upper else 'Out of Range'}")
+        print(f"Holdings: {format_amounts(data, 'amount0', 'amount1')}")
+        print(f"Uncollected Fees: {format_amounts(data, 'fees0', 'fees1')}")
 
         print("\n--- Position Price Range ---")
         print("Range (Token1 in terms of Token0):")
@@ -178,6 +420,14 @@ def main():
         print(f"  Lower: 1 {token0_symbol} = {price_lower_inv:.6f} {token1_symbol}")
         print(f"  Upper: 1 {token0_symbol} = {price_upper_inv:.6f} {token1_symbol}")
 
+        if args.depth:
+            from tick_snapshot import fetch_snapshot, print_depth
+
+            snapshot = fetch_snapshot(w3, pool_address)
+            print("\n--- Pool Depth ---")
+            print_depth(snapshot, token0_decimals, token1_decimals, token0_symbol, token1_symbol)
+            print(f"Pool liquidity at your bounds: {snapshot.liquidity_at_tick(tick_lower)} (lower), "
+                  f"{snapshot.liquidity_at_tick(tick_upper - 1)} (upper)")
 
     except Exception as e:
         print(f"\nAn error occurred: {e}")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Streaming price feed for Uniswap V3 pools based on `Swap` events.
+
+Instead of polling `slot0` for every pool on every cycle, the feed subscribes to
+the pools' `Swap` logs over a websocket (`eth_subscribe("logs")`) and decodes
+`sqrtPriceX96` and `tick` straight from each event, so every price change is
+seen as soon as it is mined.
+
+Whenever the subscription is (re)established, `slot0` is read once for every
+pool so swaps missed during the gap are reflected. While the websocket is down,
+the feed falls back to polling `slot0` over HTTP.
+
+Usage:
+    async for update in stream_pool_prices(ws_url, [pool_a, pool_b], http_url):
+        print(update.pool, update.sqrt_price_x96, update.tick)
+"""
+import asyncio
+from collections import namedtuple
+
+from eth_abi import decode
+from web3 import AsyncHTTPProvider, AsyncWeb3, Web3, WebSocketProvider
+from web3.exceptions import Web3Exception
+from websockets.exceptions import ConnectionClosed
+
+from core import SLOT0_TYPES
+from multicall import Call, aggregate3_async
+
+# keccak("Swap(address,address,int256,int256,uint160,uint128,int24)")
+SWAP_TOPIC = Web3.keccak(text="Swap(address,address,int256,int256,uint160,uint128,int24)").to_0x_hex()
+
+# Types of the non-indexed Swap event fields: amount0, amount1, sqrtPriceX96, liquidity, tick
+SWAP_DATA_TYPES = ["int256", "int256", "uint160", "uint128", "int24"]
+
+# Seconds between slot0 polls while the websocket is down
+POLL_INTERVAL = 2
+
+# Seconds of slot0 polling before trying to reconnect the websocket
+RECONNECT_DELAY = 10
+
+# Sorts after every log index, so a slot0 read supersedes all swaps in its block
+END_OF_BLOCK = float("inf")
+
+PriceUpdate = namedtuple("PriceUpdate", ["pool", "sqrt_price_x96", "tick", "block_number", "source"])
+
+# --- Decoding ---
+
+def decode_swap_log(log):
+    """Decodes a Swap log into a PriceUpdate."""
+    data = log["data"]
+    if isinstance(data, str):
+        data = bytes.fromhex(data.removeprefix("0x"))
+    _, _, sqrt_price_x96, _, tick = decode(SWAP_DATA_TYPES, bytes(data))
+    return PriceUpdate(Web3.to_checksum_address(log["address"]), sqrt_price_x96, tick, log["blockNumber"], "swap")
+
+async def read_slot0_prices(w3, pools):
+    """Reads slot0 for all pools in one multicall pinned to the latest block."""
+    block_number = await w3.eth.block_number
+    calls = [Call(pool, "slot0()", returns=SLOT0_TYPES, allow_failure=False) for pool in pools]
+    slot0s = await aggregate3_async(w3, calls, block_number)
+    return [PriceUpdate(pool, slot0[0], slot0[1], block_number, "slot0") for pool, slot0 in zip(pools, slot0s)]
+
+# --- Streaming ---
+
+async def stream_pool_prices(ws_url, pools, http_url=None):
+    """
+    Yields a PriceUpdate every time one of the pools' prices changes.
+
+    Updates never go backwards in chain order for a given pool: swaps that are
+    older than the last update seen (e.g. a slot0 read after reconnecting) are dropped.
+    """
+    pools = [Web3.to_checksum_address(pool) for pool in pools]
+    last_seen = {}
+
+    def is_new(update, position):
+        if position <= last_seen.get(update.pool, (-1, -1)):
+            return False
+        last_seen[update.pool] = position
+        return True
+
+    while True:
+        try:
+            async with AsyncWeb3(WebSocketProvider(ws_url)) as w3:
+                await w3.eth.subscribe("logs", {"address": pools, "topics": [SWAP_TOPIC]})
+                print(f"Subscribed to Swap events for {len(pools)} pools on {ws_url}")
+
+                # Catch up on anything that happened while we were not subscribed
+                for update in await read_slot0_prices(w3, pools):
+                    if is_new(update, (update.block_number, END_OF_BLOCK)):
+                        yield update
+
+                async for payload in w3.socket.process_subscriptions():
+                    log = payload["result"]
+                    if log.get("removed"):
+                        continue
+                    update = decode_swap_log(log)
+                    if is_new(update, (update.block_number, log["logIndex"])):
+                        yield update
+        except (ConnectionError, OSError, Web3Exception, ConnectionClosed) as e:
+            print(f"Swap event stream lost ({e}).")
+
+        if not http_url:
+            print(f"Reconnecting in {RECONNECT_DELAY} seconds...")
+            await asyncio.sleep(RECONNECT_DELAY)
+            continue
+
+        # Fall back to slot0 polling until it is time to retry the websocket
+        print(f"Polling slot0 over HTTP for {RECONNECT_DELAY} seconds before reconnecting...")
+        http_w3 = AsyncWeb3(AsyncHTTPProvider(http_url))
+        try:
+            for _ in range(max(1, RECONNECT_DELAY // POLL_INTERVAL)):
+                try:
+                    for update in await read_slot0_prices(http_w3, pools):
+                        if is_new(update, (update.block_number, END_OF_BLOCK)):
+                            yield update
+                except (ConnectionError, OSError, Web3Exception, ConnectionClosed) as e:
+                    print(f"slot0 polling failed ({e}).")
+                await asyncio.sleep(POLL_INTERVAL)
+        finally:
+            await http_w3.provider.disconnect()
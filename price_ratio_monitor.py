@@ -1,24 +1,46 @@
 
 import os
+import sys
 import json
-import requests
-from web3 import Web3
-from dotenv import load_dotenv, set_key
-
-load_dotenv()
+import argparse
+import functools
+import metrics
+import rate_limit
+from alert_rules import DEFAULT_HYSTERESIS, PRICE, Rule, RuleEngine, load_rule_file
+from core import FACTORY_ADDRESS, SLOT0_TYPES, USDC_ADDRESS, WBTC_ADDRESS, WETH_ADDRESS, get_metadata_cache, get_web3, load_env, sort_tokens
+from multicall import Call, aggregate3, aggregate3_async, decode_symbol, execute
+from tick_math import sqrt_price_x96_to_price
 
 # --- Environment Variables ---
-# Get the Arbitrum RPC URL from an environment variable
-ARBITRUM_RPC_URL = os.getenv("ARBITRUM_RPC_URL", "https://arb1.arbitrum.io/rpc")
-# Get Telegram Bot Token and Chat ID from environment variables
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN") # @ETHBTCPriceMonitorBot
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+def read_settings():
+    """
+    Reads the monitor's settings from the environment. Importing the module only reads
+    the process environment; main() loads .env first and then reads them again.
+    """
+    global ARBITRUM_RPC_URL, ARBITRUM_WS_URL, TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
+    global ALERT_COOLDOWN, ALERT_RULES_PATH, METRICS_PORT
+    # Get the Arbitrum RPC URL from an environment variable
+    ARBITRUM_RPC_URL = os.getenv("ARBITRUM_RPC_URL", "https://arb1.arbitrum.io/rpc")
+    # Websocket RPC URL used by --daemon mode to subscribe to new blocks
+    ARBITRUM_WS_URL = os.getenv("ARBITRUM_WS_URL", "wss://arbitrum-one-rpc.publicnode.com")
+    # Get Telegram Bot Token and Chat ID from environment variables
+    TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN") # @ETHBTCPriceMonitorBot
+    TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+    # Minimum seconds between two ratio alerts
+    ALERT_COOLDOWN = float(os.getenv("ALERT_COOLDOWN", 300))
+    # Alert rule file (see alert_rules.py), hot-reloaded when it changes
+    ALERT_RULES_PATH = os.getenv("ALERT_RULES_PATH", "alert_rules.json")
+    # Local port of the Prometheus /metrics endpoint (disabled when unset)
+    METRICS_PORT = os.getenv("METRICS_PORT")
+
+read_settings()
 
 # --- Telegram Configuration ---
 def configure_telegram():
     """Checks for Telegram credentials and prompts the user if they are not found."""
     global TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
+        from dotenv import set_key
         print("Telegram credentials not found.")
         if not TELEGRAM_BOT_TOKEN:
             bot_token = input("Please enter your Telegram Bot Token: ")
@@ -37,189 +59,269 @@ def configure_telegram():
 # 2. Forward a message from @egaillera to a bot like @userinfobot.
 # 3. The bot will reply with the user's information, including the Chat ID.
 
-# Initialize Web3
-w3 = Web3(Web3.HTTPProvider(ARBITRUM_RPC_URL))
-
-# Check if connected to the network
-if not w3.is_connected():
-    print("Error: Could not connect to the Arbitrum network.")
-    exit()
-
-# --- Uniswap V3 Contracts ---
-# Uniswap V3 Factory address on Arbitrum
-FACTORY_ADDRESS = w3.to_checksum_address("0x1F98431c8aD98523631AE4a59f267346ea31F984")
-
-# Minimal ABI for the Uniswap V3 Factory
-FACTORY_ABI = json.loads('''
-[
-  {
-    "inputs": [
-      {
-        "internalType": "address",
-        "name": "tokenA",
-        "type": "address"
-      },
-      {
-        "internalType": "address",
-        "name": "tokenB",
-        "type": "address"
-      },
-      {
-        "internalType": "uint24",
-        "name": "fee",
-        "type": "uint24"
-      }
-    ],
-    "name": "getPool",
-    "outputs": [
-      {
-        "internalType": "address",
-        "name": "pool",
-        "type": "address"
-      }
-    ],
-    "stateMutability": "view",
-    "type": "function"
-  }
-]
-''')
-
-# Minimal ABI for the Uniswap V3 Pool
-POOL_ABI = json.loads('''
-[
-    {
-        "inputs": [],
-        "name": "slot0",
-        "outputs": [
-            {
-                "internalType": "uint160",
-                "name": "sqrtPriceX96",
-                "type": "uint160"
-            },
-            {
-                "internalType": "int24",
-                "name": "tick",
-                "type": "int24"
-            },
-            {
-                "internalType": "uint16",
-                "name": "observationIndex",
-                "type": "uint16"
-            },
-            {
-                "internalType": "uint16",
-                "name": "observationCardinality",
-                "type": "uint16"
-            },
-            {
-                "internalType": "uint16",
-                "name": "observationCardinalityNext",
-                "type": "uint16"
-            },
-            {
-                "internalType": "uint8",
-                "name": "feeProtocol",
-                "type": "uint8"
-            },
-            {
-                "internalType": "bool",
-                "name": "unlocked",
-                "type": "bool"
-            }
-        ],
-        "stateMutability": "view",
-        "type": "function"
-    }
-]
-''')
+# Seconds to wait before reconnecting the daemon's websocket
+DAEMON_RECONNECT_DELAY = 5
 
-# Create a contract instance for the Factory
-factory_contract = w3.eth.contract(address=FACTORY_ADDRESS, abi=FACTORY_ABI)
+# Legacy single-band rule file (see thresholds_rules)
+THRESHOLDS_PATH = "thresholds.json"
 
-# --- Token Information ---
-# Token addresses on Arbitrum
-WETH_ADDRESS = w3.to_checksum_address("0x82aF49447D8a07e3bd95BD0d56f35241523fBab1")
-WBTC_ADDRESS = w3.to_checksum_address("0x2f2a2543B76A4166549F7aaB2e75Bef0aefC5B0f")
-USDC_ADDRESS = w3.to_checksum_address("0xaf88d065e77c8cC2239327C5EDb3A432268e5831")
+# Name the ETH/WBTC ratio goes by in alert rules
+ETH_WBTC_RATIO = "ETH/WBTC"
 
-# Token decimals
-WETH_DECIMALS = 18
-WBTC_DECIMALS = 8
-USDC_DECIMALS = 6
+# Recent block timestamps kept in memory for the price store
+BLOCK_TIMESTAMP_CACHE_SIZE = 256
 
 # --- Functions ---
+def get_w3():
+    """Returns the shared Web3 client (ARBITRUM_RPC_URL first, then the rest of the endpoint pool)."""
+    from rpc_pool import default_urls
+    return get_web3(tuple(dict.fromkeys([ARBITRUM_RPC_URL] + default_urls())))
+
+def observe_block(block_number):
+    """Moves the shared client's `latest` pin (see call_cache.py) to a block seen on a websocket feed."""
+    call_cache = get_w3().provider.call_cache
+    if call_cache is not None:
+        call_cache.observe_block(block_number)
+
 def get_pool_address(tokenA, tokenB, fee):
-    return factory_contract.functions.getPool(tokenA, tokenB, fee).call()
+    """Returns the pool address for a pair and fee tier, using the metadata cache when possible."""
+    metadata_cache = get_metadata_cache(get_w3())
+    pool_address = metadata_cache.get_pool(tokenA, tokenB, fee)
+    if pool_address is None:
+        pool_address = execute(get_w3(), Call(FACTORY_ADDRESS, "getPool(address,address,uint24)", [tokenA, tokenB, fee], ["address"]))
+        if pool_address is None:
+            # A failed read is not "no pool": it must not be cached
+            raise ValueError(f"Could not read getPool({tokenA}, {tokenB}, {fee}) from the factory")
+        metadata_cache.set_pool(tokenA, tokenB, fee, pool_address)
+    return pool_address
+
+def get_token_decimals(token_address):
+    """Returns a token's decimals, using the metadata cache when possible."""
+    metadata_cache = get_metadata_cache(get_w3())
+    cached = metadata_cache.get_token(token_address)
+    if cached:
+        return cached[1]
+    # Read the symbol too, so the shared cache row is complete for pool_info
+    symbol, decimals = aggregate3(get_w3(), [
+        Call(token_address, "symbol()", decoder=decode_symbol),
+        Call(token_address, "decimals()", returns=["uint8"], allow_failure=False),
+    ])
+    metadata_cache.set_token(token_address, symbol, decimals)
+    return decimals
+
+@functools.lru_cache(maxsize=BLOCK_TIMESTAMP_CACHE_SIZE)
+def get_block_timestamp(block_number):
+    """Returns a block's timestamp; swaps of the same block share one eth_getBlockByNumber."""
+    return get_w3().eth.get_block(block_number)["timestamp"]
 
 def get_pool_price(pool_address):
-    pool_contract = w3.eth.contract(address=pool_address, abi=POOL_ABI)
-    slot0 = pool_contract.functions.slot0().call()
+    slot0 = execute(get_w3(), Call(pool_address, "slot0()", returns=SLOT0_TYPES))
     return slot0[0]
 
 def calculate_price(sqrt_price_x96, decimals0, decimals1):
-    return ((sqrt_price_x96 / 2**96)**2) * (10**(decimals0 - decimals1))
+    """Converts a pool's sqrtPriceX96 to a price (token1 per token0) with exact integer math."""
+    return sqrt_price_x96_to_price(sqrt_price_x96, decimals0, decimals1)
+
+@functools.cache
+def get_notifier():
+    """
+    Returns the shared background Telegram notifier, or None without credentials.
+    Queued messages are still delivered when the process exits. Alert states and
+    cooldowns are kept in the metadata cache, so they carry over between runs.
+    """
+    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
+        return None
+    import atexit
+    from notifier import TelegramNotifier
+    notifier = TelegramNotifier(TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, cooldown=ALERT_COOLDOWN, state_store=get_metadata_cache(get_w3()))
+    atexit.register(notifier.close)
+    return notifier
 
 def send_telegram_notification(message):
-    """Sends a message to a Telegram user or group."""
-    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
+    """Queues a message to a Telegram user or group; it is delivered in the background."""
+    notifier = get_notifier()
+    if notifier is None:
         print("Telegram bot token or chat ID not set. Skipping notification.")
         return
+    notifier.notify(message)
+
+def alert(rule, state, message, cooldown=None):
+    """Reports a rule's new state to the notifier, which alerts on new states (with re-arming and a cooldown)."""
+    if state:
+        metrics.observe_alert()
+    notifier = get_notifier()
+    if notifier is not None:
+        notifier.update(rule, state, message, cooldown)
+    elif state:
+        print("Telegram bot token or chat ID not set. Skipping notification.")
 
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    payload = {
-        'chat_id': TELEGRAM_CHAT_ID,
-        'text': message,
-        'parse_mode': 'Markdown'
+def find_pools(pairs):
+    """
+    Returns {(tokenA, tokenB): pool or None} with the deepest pool of each pair across
+    all fee tiers, discovered in one multicall and cached for POOL_REFRESH_INTERVAL.
+    """
+    from pool_discovery import find_deepest_pools
+    choices = find_deepest_pools(get_w3(), pairs, get_metadata_cache(get_w3()))
+    return {pair: choice[0] if choice else None for pair, choice in choices.items()}
+
+def resolve_market():
+    """Resolves the pools and token decimals needed to price ETH and WBTC."""
+    pools = find_pools([(WETH_ADDRESS, USDC_ADDRESS), (WBTC_ADDRESS, WETH_ADDRESS)])
+    weth_usdc_pool_address = pools[(WETH_ADDRESS, USDC_ADDRESS)]
+    wbtc_weth_pool_address = pools[(WBTC_ADDRESS, WETH_ADDRESS)]
+    for label, pool_address in [("WETH/USDC", weth_usdc_pool_address), ("WBTC/WETH", wbtc_weth_pool_address)]:
+        if pool_address is None:
+            print(f"{label} pool not found in any fee tier.")
+            return None
+    return {
+        "weth_usdc_pool": weth_usdc_pool_address,
+        "wbtc_weth_pool": wbtc_weth_pool_address,
+        "weth_decimals": get_token_decimals(WETH_ADDRESS),
+        "wbtc_decimals": get_token_decimals(WBTC_ADDRESS),
+        "usdc_decimals": get_token_decimals(USDC_ADDRESS),
     }
+
+def calculate_eth_price(sqrt_price_x96, market):
+    """Returns the ETH price in USDC from the WETH/USDC pool's sqrtPriceX96."""
+    token0, _ = sort_tokens(WETH_ADDRESS, USDC_ADDRESS)
+
+    if token0 == WETH_ADDRESS: # Price is USDC per WETH
+        return calculate_price(sqrt_price_x96, market["weth_decimals"], market["usdc_decimals"])
+    else: # Price is WETH per USDC, so we need to invert
+        return 1 / calculate_price(sqrt_price_x96, market["usdc_decimals"], market["weth_decimals"])
+
+def calculate_wbtc_eth_ratio(sqrt_price_x96, market):
+    """Returns the WBTC price in WETH from the WBTC/WETH pool's sqrtPriceX96."""
+    token0, _ = sort_tokens(WBTC_ADDRESS, WETH_ADDRESS)
+
+    if token0 == WBTC_ADDRESS: # Price is WETH per WBTC
+        return calculate_price(sqrt_price_x96, market["wbtc_decimals"], market["weth_decimals"])
+    else: # Price is WBTC per WETH, so we need to invert
+        return 1 / calculate_price(sqrt_price_x96, market["weth_decimals"], market["wbtc_decimals"])
+
+def load_thresholds(path=THRESHOLDS_PATH):
+    """
+    Reads thresholds.json and returns the (adjusted_lower, adjusted_upper) thresholds,
+    or None if they are missing or the file cannot be read.
+    """
     try:
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-        print("Telegram notification sent successfully.")
-    except requests.exceptions.RequestException as e:
-        print(f"Error sending Telegram notification: {e}")
+        with open(path, "r") as f:
+            thresholds = json.load(f)
+    except FileNotFoundError:
+        print("thresholds.json not found. Skipping threshold check.")
+        return None
+    except json.JSONDecodeError:
+        print("Error decoding thresholds.json. Skipping threshold check.")
+        return None
+
+    percentage = thresholds.get("percentage", 100)
+    upper_threshold = thresholds.get("upper_threshold")
+    lower_threshold = thresholds.get("lower_threshold")
+
+    if upper_threshold is None or lower_threshold is None:
+        print("Thresholds not found in thresholds.json. Skipping threshold check.")
+        return None
+
+    # Calculate adjusted thresholds based on percentage
+    if percentage < 100:
+        average_threshold = (upper_threshold + lower_threshold) / 2
+        upper_diff = upper_threshold - average_threshold
+        lower_diff = average_threshold - lower_threshold
+
+        adjusted_upper_threshold = average_threshold + (upper_diff * percentage / 100)
+        adjusted_lower_threshold = average_threshold - (lower_diff * percentage / 100)
+    else:
+        adjusted_upper_threshold = upper_threshold
+        adjusted_lower_threshold = lower_threshold
+
+    return adjusted_lower_threshold, adjusted_upper_threshold
+
+def thresholds_rules(path):
+    """Rule loader for thresholds.json: one band rule on the ETH/WBTC ratio."""
+    thresholds = load_thresholds(path)
+    if thresholds is None:
+        return []
+    return [{
+        "id": "eth-wbtc-ratio", "ratio": ETH_WBTC_RATIO, "type": "band",
+        "lower": thresholds[0], "upper": thresholds[1], "name": "the adjusted thresholds",
+    }]
+
+def build_rule_engine(rules_path, static_rules=(), legacy_thresholds=True):
+    """
+    Returns a RuleEngine over the rule file (and thresholds.json unless disabled).
+    Both files are reloaded whenever they change on disk.
+    """
+    sources = [(THRESHOLDS_PATH, thresholds_rules)] if legacy_thresholds else []
+    sources.append((rules_path, load_rule_file))
+    return RuleEngine(sources, static_rules)
+
+def check_rules(engine, values):
+    """
+    Feeds {ratio name: value} to the rule engine and alerts on every rule that changed state.
+    The first value of a ratio also reports its rules in the normal state, so a rule that
+    alerted in an earlier run (e.g. a one-shot run from cron) re-arms once it has cleared.
+    """
+    for name, value in values.items():
+        first = any(index.last_value is None for (ratio, _), index in engine.indexes.items() if ratio == name)
+        for rule, state, message in engine.update(name, value):
+            alert(rule.id, state, message, rule.cooldown)
+        if first:
+            for rule in engine.rules(name):
+                if engine.states.get(rule.id) is None:
+                    alert(rule.id, None, None)
 
 def main():
+    load_env()
+    read_settings()
+    parser = argparse.ArgumentParser(description="Monitor the ETH/WBTC ratio on Uniswap V3 (Arbitrum).")
+    parser.add_argument("--daemon", action="store_true", help="Keep running and re-check the ratio whenever prices change (requires a websocket RPC).")
+    parser.add_argument("--feed", choices=["swaps", "blocks"], default="swaps", help="Daemon price source: Swap events (default) or slot0 on every new block.")
+    parser.add_argument("--config", help="Watch the pairs and ratios of a JSON config file (see market_graph.py) instead of ETH/WBTC.")
+    parser.add_argument("--rules", default=ALERT_RULES_PATH, help=f"Alert rule file (see alert_rules.py), reloaded when it changes (default: {ALERT_RULES_PATH}).")
+    parser.add_argument("--metrics-port", type=int, default=int(METRICS_PORT) if METRICS_PORT else None, help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics (env METRICS_PORT).")
+    parser.add_argument("--profile", action="store_true", help="Profile one monitoring cycle (the first price update in daemon mode).")
+    parser.add_argument("--store", default=os.getenv("PRICE_STORE_PATH"), help="Daemon mode: record every pool price in this price store directory (env PRICE_STORE_PATH, see price_store.py).")
+    args = parser.parse_args()
+
+    # Alerting requests are never shed by the RPC rate limiter
+    rate_limit.set_default_priority(rate_limit.HIGH)
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+        print(f"Serving metrics on http://127.0.0.1:{args.metrics_port}/metrics")
     configure_telegram()
-    # --- Get ETH price in USDC ---
-    # Fee for WETH/USDC pool is typically 0.05% (500)
-    weth_usdc_pool_address = get_pool_address(WETH_ADDRESS, USDC_ADDRESS, 500)
-    if weth_usdc_pool_address == "0x0000000000000000000000000000000000000000":
-        print("WETH/USDC pool not found for fee 500. Trying 3000.")
-        weth_usdc_pool_address = get_pool_address(WETH_ADDRESS, USDC_ADDRESS, 3000)
-        if weth_usdc_pool_address == "0x0000000000000000000000000000000000000000":
-            print("WETH/USDC pool not found for fee 3000 either.")
-            return
+    if not get_w3().is_connected():
+        print("Error: Could not connect to the Arbitrum network.")
+        sys.exit(1)
 
-    sqrt_price_x96 = get_pool_price(weth_usdc_pool_address)
-    token0 = WETH_ADDRESS if WETH_ADDRESS < USDC_ADDRESS else USDC_ADDRESS
-    token1 = USDC_ADDRESS if WETH_ADDRESS < USDC_ADDRESS else WETH_ADDRESS
-
-    if token0 == WETH_ADDRESS: # Price is USDC per WETH
-        eth_price = calculate_price(sqrt_price_x96, WETH_DECIMALS, USDC_DECIMALS)
-    else: # Price is WETH per USDC, so we need to invert
-        eth_price = 1 / calculate_price(sqrt_price_x96, USDC_DECIMALS, WETH_DECIMALS)
+    if args.config:
+        run_config(args)
+        return
 
-    print(f"The current price of ETH is: ${eth_price:,.2f}")
+    market = resolve_market()
+    if market is None:
+        return
 
-    # --- Get WBTC price in WETH ---
-    # Fee for WBTC/WETH pool is typically 0.05% (500)
-    wbtc_weth_pool_address = get_pool_address(WBTC_ADDRESS, WETH_ADDRESS, 500)
-    if wbtc_weth_pool_address == "0x0000000000000000000000000000000000000000":
-        print("WBTC/WETH pool not found for fee 500. Trying 3000.")
-        wbtc_weth_pool_address = get_pool_address(WBTC_ADDRESS, WETH_ADDRESS, 3000)
-        if wbtc_weth_pool_address == "0x0000000000000000000000000000000000000000":
-            print("WBTC/WETH pool not found for fee 3000 either.")
+    engine = build_rule_engine(args.rules)
+    if args.daemon:
+        if not engine.rule_count:
+            print(f"No alert rules in {THRESHOLDS_PATH} or {args.rules}. Nothing to monitor.")
             return
+        print(f"Monitoring ETH/WBTC ratio against {engine.rule_count} alert rules.")
+        pools = [market["weth_usdc_pool"], market["wbtc_weth_pool"]]
+        run_daemon(ARBITRUM_WS_URL, pools, ratio_watcher(market, engine), args.feed, args.profile, open_store(args.store))
+        return
 
-    sqrt_price_x96 = get_pool_price(wbtc_weth_pool_address)
-    token0 = WBTC_ADDRESS if WBTC_ADDRESS < WETH_ADDRESS else WETH_ADDRESS
-    token1 = WETH_ADDRESS if WBTC_ADDRESS < WETH_ADDRESS else WBTC_ADDRESS
+    with metrics.cycle("monitor", args.profile):
+        check_once(market, engine, args.rules)
 
-    if token0 == WBTC_ADDRESS: # Price is WETH per WBTC
-        wbtc_eth_ratio = calculate_price(sqrt_price_x96, WBTC_DECIMALS, WETH_DECIMALS)
-    else: # Price is WBTC per WETH, so we need to invert
-        wbtc_eth_ratio = 1 / calculate_price(sqrt_price_x96, WETH_DECIMALS, WBTC_DECIMALS)
+def check_once(market, engine, rules_path):
+    """Reads both pools once, prints the prices and checks the ETH/WBTC ratio against the alert rules."""
+    # --- Get ETH price in USDC ---
+    eth_price = calculate_eth_price(get_pool_price(market["weth_usdc_pool"]), market)
+    print(f"The current price of ETH is: ${eth_price:,.2f}")
 
+    # --- Get WBTC price in WETH ---
+    wbtc_eth_ratio = calculate_wbtc_eth_ratio(get_pool_price(market["wbtc_weth_pool"]), market)
     wbtc_price = wbtc_eth_ratio * eth_price
     print(f"The current price of WBTC is: ${wbtc_price:,.2f}")
 
@@ -228,45 +330,142 @@ def main():
         eth_wbtc_ratio = 1 / wbtc_eth_ratio
         print(f"The ETH/WBTC ratio is: {eth_wbtc_ratio:.8f}")
 
-        # Read thresholds from JSON file
+        if not engine.rule_count:
+            print(f"No alert rules in {THRESHOLDS_PATH} or {rules_path}. Skipping threshold check.")
+            return
+        print(f"Checking ETH/WBTC ratio against {engine.rule_count} alert rules.")
+        check_rules(engine, {ETH_WBTC_RATIO: eth_wbtc_ratio})
+
+# --- Config Mode ---
+
+def run_config(args):
+    """Watches every ratio of a config file, reading all of its pools in one multicall."""
+    from market_graph import load_graph
+
+    graph = load_graph(args.config)
+    missing = graph.resolve(find_pools, get_token_decimals)
+    if missing:
+        print(f"No pool found for: {', '.join(f'{graph.symbol(leg.token0)}/{graph.symbol(leg.token1)}' for leg in missing)}")
+        return
+    # A ratio's own lower/upper thresholds act as a band rule next to the rule file's
+    static_rules = [
+        Rule(ratio.name, ratio.name, PRICE, ratio.lower, ratio.upper, DEFAULT_HYSTERESIS, name="its thresholds")
+        for ratio in graph.ratios
+        if ratio.lower is not None or ratio.upper is not None
+    ]
+    engine = build_rule_engine(args.rules, static_rules, legacy_thresholds=False)
+    print(f"Watching {len(graph.ratios)} ratios across {len(graph.pools)} pools with {engine.rule_count} alert rules.")
+
+    if args.daemon:
+        run_daemon(ARBITRUM_WS_URL, graph.pools, graph_watcher(graph, engine), args.feed, args.profile, open_store(args.store))
+        return
+    with metrics.cycle("monitor", args.profile):
+        slot0s = aggregate3(get_w3(), graph.slot0_calls())
+        graph_watcher(graph, engine)("Latest block", {pool: slot0[0] for pool, slot0 in zip(graph.pools, slot0s)})
+
+def graph_watcher(graph, engine):
+    """Returns a price callback that prints every ratio of the graph and checks it against the alert rules."""
+
+    def on_prices(label, sqrt_prices):
+        values = graph.prices(sqrt_prices)
+        print(f"{label}: " + " | ".join(f"{name} {value:.8g}" for name, value in values.items()))
+        check_rules(engine, values)
+
+    return on_prices
+
+# --- Daemon Mode ---
+
+def evaluate_ratio(label, weth_usdc_sqrt_price, wbtc_weth_sqrt_price, market, engine):
+    """
+    Prices both pools, prints the ratio and checks it against the alert rules; the
+    notifier alerts on rules that moved into a new state.
+    """
+    eth_price = calculate_eth_price(weth_usdc_sqrt_price, market)
+    wbtc_eth_ratio = calculate_wbtc_eth_ratio(wbtc_weth_sqrt_price, market)
+    if wbtc_eth_ratio <= 0:
+        return
+    eth_wbtc_ratio = 1 / wbtc_eth_ratio
+    print(f"{label}: ETH ${eth_price:,.2f} | ETH/WBTC ratio {eth_wbtc_ratio:.8f}")
+    check_rules(engine, {ETH_WBTC_RATIO: eth_wbtc_ratio})
+
+def ratio_watcher(market, engine):
+    """Returns a price callback that evaluates the ETH/WBTC ratio."""
+
+    def on_prices(label, sqrt_prices):
+        evaluate_ratio(label, sqrt_prices[market["weth_usdc_pool"]], sqrt_prices[market["wbtc_weth_pool"]], market, engine)
+
+    return on_prices
+
+def open_store(path):
+    """Opens the price store at `path`, or returns None when no path is given."""
+    if not path:
+        return None
+    from price_store import PriceStore
+    print(f"Recording pool prices in {path}")
+    return PriceStore(path)
+
+def run_daemon(ws_url, pools, on_prices, feed="swaps", profile=False, store=None):
+    """
+    Keeps a websocket connection open and calls `on_prices(label, {pool: sqrtPriceX96})`
+    whenever a price changes. Notifications are sent in the background, only when a
+    ratio moves into a new state and at most once per ALERT_COOLDOWN.
+    Each update is one metrics cycle; with `profile`, the first one is profiled.
+    Every observed price is also appended to `store` (a PriceStore), if given.
+    """
+    import asyncio
+    runner = run_swap_feed if feed == "swaps" else run_block_feed
+    try:
+        asyncio.run(runner(ws_url, pools, on_prices, profile, store))
+    except KeyboardInterrupt:
+        print("\nStopping monitor.")
+    finally:
+        if store is not None:
+            store.close()
+
+async def run_swap_feed(ws_url, pools, on_prices, profile=False, store=None):
+    """Re-evaluates on every Swap event of any pool, once every pool has a price."""
+    from price_feed import stream_pool_prices
+
+    sqrt_prices = {}
+    async for update in stream_pool_prices(ws_url, pools, get_w3().provider.best_url()):
+        observe_block(update.block_number)
+        sqrt_prices[update.pool] = update.sqrt_price_x96
+        if store is not None:
+            # Prices are stored at their block's time, so replayed swaps land in the right bars
+            timestamp = get_block_timestamp(update.block_number)
+            store.append(update.pool, update.block_number, timestamp, update.sqrt_price_x96, update.tick)
+        if len(sqrt_prices) < len(pools):
+            continue
+        with metrics.cycle("monitor", profile):
+            on_prices(f"Block {update.block_number} ({update.source})", sqrt_prices)
+        profile = False
+
+async def run_block_feed(ws_url, pools, on_prices, profile=False, store=None):
+    """Re-reads every pool's slot0 in one multicall each time a new block arrives."""
+    import asyncio
+    from web3 import AsyncWeb3, WebSocketProvider
+    from web3.exceptions import Web3Exception
+    from websockets.exceptions import ConnectionClosed
+
+    calls = [Call(pool, "slot0()", returns=SLOT0_TYPES, allow_failure=False) for pool in pools]
+    while True:
         try:
-            with open("thresholds.json", "r") as f:
-                thresholds = json.load(f)
-            
-            percentage = thresholds.get("percentage", 100)
-            upper_threshold = thresholds.get("upper_threshold")
-            lower_threshold = thresholds.get("lower_threshold")
-
-            if upper_threshold is None or lower_threshold is None:
-                print("Thresholds not found in thresholds.json. Skipping threshold check.")
-                return
-
-            # Calculate adjusted thresholds based on percentage
-            if percentage < 100:
-                average_threshold = (upper_threshold + lower_threshold) / 2
-                upper_diff = upper_threshold - average_threshold
-                lower_diff = average_threshold - lower_threshold
-                
-                adjusted_upper_threshold = average_threshold + (upper_diff * percentage / 100)
-                adjusted_lower_threshold = average_threshold - (lower_diff * percentage / 100)
-            else:
-                adjusted_upper_threshold = upper_threshold
-                adjusted_lower_threshold = lower_threshold
-
-            print(f"Monitoring ETH/WBTC ratio against adjusted thresholds: {adjusted_lower_threshold:.8f} - {adjusted_upper_threshold:.8f})")
-
-            # Check if ratio is outside adjusted thresholds
-            if eth_wbtc_ratio > adjusted_upper_threshold:
-                message = f"📈 ETH/WBTC ratio is above the adjusted upper threshold!\n\nCurrent Ratio: {eth_wbtc_ratio:.8f}\nAdjusted Upper Threshold: {adjusted_upper_threshold:.8f}"
-                send_telegram_notification(message)
-            elif eth_wbtc_ratio < adjusted_lower_threshold:
-                message = f"📉 ETH/WBTC ratio is below the adjusted lower threshold!\n\nCurrent Ratio: {eth_wbtc_ratio:.8f}\nAdjusted Lower Threshold: {adjusted_lower_threshold:.8f}"
-                send_telegram_notification(message)
-
-        except FileNotFoundError:
-            print("thresholds.json not found. Skipping threshold check.")
-        except json.JSONDecodeError:
-            print("Error decoding thresholds.json. Skipping threshold check.")
+            async with AsyncWeb3(WebSocketProvider(ws_url)) as aw3:
+                await aw3.eth.subscribe("newHeads")
+                print(f"Subscribed to new blocks on {ws_url}")
+                async for payload in aw3.socket.process_subscriptions():
+                    block_number, timestamp = payload["result"]["number"], payload["result"]["timestamp"]
+                    observe_block(block_number)
+                    with metrics.cycle("monitor", profile):
+                        slot0s = await aggregate3_async(aw3, calls, block_number)
+                        if store is not None:
+                            for pool, slot0 in zip(pools, slot0s):
+                                store.append(pool, block_number, timestamp, slot0[0], slot0[1])
+                        on_prices(f"Block {block_number}", {pool: slot0[0] for pool, slot0 in zip(pools, slot0s)})
+                    profile = False
+        except (ConnectionError, OSError, Web3Exception, ConnectionClosed) as e:
+            print(f"Websocket connection lost ({e}). Reconnecting in {DAEMON_RECONNECT_DELAY} seconds...")
+            await asyncio.sleep(DAEMON_RECONNECT_DELAY)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Append-only, memory-mapped time series of pool prices.
+
+Every observation of a pool is one fixed-width record of (block, timestamp,
+sqrtPriceX96, tick) appended to a per-pool file. Queries map the file and
+return NumPy views of it: a range over months of per-block data costs two
+binary searches, with no parsing and no copies.
+
+Next to the raw records, OHLC rollups of the price (token1 per token0, in raw
+units) are maintained at 1 minute, 1 hour and 1 day: each append updates the
+last bucket of every rollup in place, or starts a new one.
+
+Layout: <directory>/<pool>/ticks.bin, 1m.bin, 1h.bin, 1d.bin, each a 16-byte
+header followed by records. A torn record at the end of a file (from a crash
+mid-write) is ignored.
+
+Queries open the files read-only and never create them: a pool with no series
+reads as empty, and a reader sees records appended by a writer in another process.
+
+Usage:
+    store = PriceStore("price_store")
+    store.append(pool, block, timestamp, sqrt_price_x96, tick)
+    records = store.records(pool, start_block=250_000_000)
+    candles = store.ohlc(pool, "1h")
+
+    python price_store.py <pool_address> [--interval 1h] [--limit 24]
+"""
+import argparse
+import os
+import struct
+
+import numpy as np
+
+DEFAULT_STORE_PATH = "price_store"
+
+# sqrtPriceX96 (160 bits) is split into two 64-bit and one 32-bit limb
+TICK_DTYPE = np.dtype([
+    ("block", "<u8"),
+    ("timestamp", "<i8"),
+    ("sqrt_price_lo", "<u8"),
+    ("sqrt_price_mid", "<u8"),
+    ("sqrt_price_hi", "<u4"),
+    ("tick", "<i4"),
+])
+
+OHLC_DTYPE = np.dtype([
+    ("start", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("first_block", "<u8"),
+    ("last_block", "<u8"),
+    ("count", "<u8"),
+])
+
+# Rollup name -> bucket length in seconds
+ROLLUPS = {"1m": 60, "1h": 3600, "1d": 86400}
+
+# File header: magic, format version, record size
+HEADER = struct.Struct("<8sII")
+MAGIC = b"PXSTORE\x00"
+VERSION = 1
+
+Q96 = 2 ** 96
+MASK64 = 2 ** 64 - 1
+
+def sqrt_prices(records):
+    """The sqrtPriceX96 of tick records as float64 (a new array)."""
+    return (records["sqrt_price_lo"].astype(np.float64)
+            + records["sqrt_price_mid"].astype(np.float64) * 2.0 ** 64
+            + records["sqrt_price_hi"].astype(np.float64) * 2.0 ** 128)
+
+def prices(records):
+    """The raw price (token1 per token0) of tick records as float64."""
+    return (sqrt_prices(records) / Q96) ** 2
+
+# --- Files ---
+
+class RecordFile:
+    """
+    A header plus fixed-width records, appended with os.write and read through a memory map.
+    With `writable=False` the file must exist and is only read.
+    """
+
+    def __init__(self, path, dtype, writable=True):
+        self.path = path
+        self.dtype = dtype
+        self.writable = writable
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT if writable else os.O_RDONLY, 0o644)
+        size = os.fstat(self._fd).st_size
+        if size < HEADER.size and writable:
+            os.ftruncate(self._fd, 0)
+            os.pwrite(self._fd, HEADER.pack(MAGIC, VERSION, dtype.itemsize), 0)
+        elif size >= HEADER.size:
+            magic, version, itemsize = HEADER.unpack(os.pread(self._fd, HEADER.size, 0))
+            if magic != MAGIC or version != VERSION or itemsize != dtype.itemsize:
+                raise ValueError(f"{path} is not a version {VERSION} price store file")
+        self._refresh()
+        if writable:
+            # Drop a torn record left by a crash mid-write
+            os.ftruncate(self._fd, HEADER.size + self.count * dtype.itemsize)
+        self._map = None
+
+    def _refresh(self):
+        """Counts the complete records in the file."""
+        self.count = max(0, (os.fstat(self._fd).st_size - HEADER.size) // self.dtype.itemsize)
+
+    def append(self, data):
+        os.pwrite(self._fd, data, HEADER.size + self.count * self.dtype.itemsize)
+        self.count += 1
+
+    def overwrite(self, index, data):
+        os.pwrite(self._fd, data, HEADER.size + index * self.dtype.itemsize)
+
+    def read(self, index):
+        """One record as a tuple, read without mapping the file."""
+        raw = os.pread(self._fd, self.dtype.itemsize, HEADER.size + index * self.dtype.itemsize)
+        return np.frombuffer(raw, dtype=self.dtype)[0]
+
+    def view(self):
+        """All records as a read-only memory-mapped array (remapped when the file has grown)."""
+        if not self.writable:
+            self._refresh()
+        if self.count == 0:
+            return np.empty(0, dtype=self.dtype)
+        if self._map is None or len(self._map) != self.count:
+            self._map = np.memmap(self.path, dtype=self.dtype, mode="r", offset=HEADER.size, shape=(self.count,))
+        return self._map
+
+    def close(self):
+        self._map = None
+        os.close(self._fd)
+
+# --- Series ---
+
+class PoolSeries:
+    """The tick records and OHLC rollups of one pool. With `writable=False` the files must exist."""
+
+    def __init__(self, directory, writable=True):
+        if writable:
+            os.makedirs(directory, exist_ok=True)
+        self.ticks = RecordFile(os.path.join(directory, "ticks.bin"), TICK_DTYPE, writable)
+        self.rollups = {
+            name: RecordFile(os.path.join(directory, f"{name}.bin"), OHLC_DTYPE, writable) for name in ROLLUPS
+        }
+        self.last_block = int(self.ticks.read(self.ticks.count - 1)["block"]) if self.ticks.count else None
+        # The open (last) bucket of every rollup, as a mutable list
+        self._buckets = {
+            name: list(rollup.read(rollup.count - 1).tolist()) if rollup.count else None
+            for name, rollup in self.rollups.items()
+        }
+
+    def append(self, block, timestamp, sqrt_price_x96, tick):
+        """Appends an observation. Observations older than the last stored block are ignored."""
+        if self.last_block is not None and block < self.last_block:
+            return False
+        self.ticks.append(struct.pack(
+            "<QqQQIi", block, int(timestamp),
+            sqrt_price_x96 & MASK64, (sqrt_price_x96 >> 64) & MASK64, sqrt_price_x96 >> 128, tick,
+        ))
+        self.last_block = block
+        price = (sqrt_price_x96 / Q96) ** 2
+        for name, rollup in self.rollups.items():
+            self._roll(name, rollup, block, int(timestamp), price)
+        return True
+
+    def _roll(self, name, rollup, block, timestamp, price):
+        start = timestamp - timestamp % ROLLUPS[name]
+        bucket = self._buckets[name]
+        if bucket is not None and start < bucket[0]:
+            # A late timestamp: the bucket it belongs to is already closed
+            return
+        if bucket is not None and start == bucket[0]:
+            bucket[2] = max(bucket[2], price)
+            bucket[3] = min(bucket[3], price)
+            bucket[4] = price
+            bucket[6] = block
+            bucket[7] += 1
+            rollup.overwrite(rollup.count - 1, struct.pack("<qddddQQQ", *bucket))
+        else:
+            bucket = self._buckets[name] = [start, price, price, price, price, block, block, 1]
+            rollup.append(struct.pack("<qddddQQQ", *bucket))
+
+    def close(self):
+        self.ticks.close()
+        for rollup in self.rollups.values():
+            rollup.close()
+
+class PriceStore:
+    """Per-pool price series under one directory."""
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.getenv("PRICE_STORE_PATH", DEFAULT_STORE_PATH)
+        self._series = {}
+        self._readers = {}
+
+    def series(self, pool):
+        """The pool's series opened for appending, created if needed."""
+        key = pool.lower()
+        if key not in self._series:
+            reader = self._readers.pop(key, None)
+            if reader is not None:
+                reader.close()
+            self._series[key] = PoolSeries(os.path.join(self.directory, key))
+        return self._series[key]
+
+    def _reader(self, pool):
+        """The pool's series for queries (the writer if one is open), or None if it has none."""
+        key = pool.lower()
+        if key in self._series:
+            return self._series[key]
+        if key not in self._readers:
+            try:
+                self._readers[key] = PoolSeries(os.path.join(self.directory, key), writable=False)
+            except FileNotFoundError:
+                return None
+        return self._readers[key]
+
+    def append(self, pool, block, timestamp, sqrt_price_x96, tick):
+        return self.series(pool).append(block, timestamp, sqrt_price_x96, tick)
+
+    def records(self, pool, start_block=None, end_block=None):
+        """Tick records with start_block <= block <= end_block, as a view of the memory-mapped file."""
+        series = self._reader(pool)
+        if series is None:
+            return np.empty(0, dtype=TICK_DTYPE)
+        view = series.ticks.view()
+        blocks = view["block"]
+        lo = 0 if start_block is None else np.searchsorted(blocks, start_block, side="left")
+        hi = len(view) if end_block is None else np.searchsorted(blocks, end_block, side="right")
+        return view[lo:hi]
+
+    def ohlc(self, pool, interval="1h", start=None, end=None):
+        """OHLC buckets of an interval ('1m', '1h', '1d') starting within [start, end] (unix seconds)."""
+        if interval not in ROLLUPS:
+            raise ValueError(f"Unknown interval {interval!r}; expected one of {', '.join(ROLLUPS)}")
+        series = self._reader(pool)
+        if series is None:
+            return np.empty(0, dtype=OHLC_DTYPE)
+        view = series.rollups[interval].view()
+        starts = view["start"]
+        lo = 0 if start is None else np.searchsorted(starts, start, side="left")
+        hi = len(view) if end is None else np.searchsorted(starts, end, side="right")
+        return view[lo:hi]
+
+    def close(self):
+        for series in [*self._series.values(), *self._readers.values()]:
+            series.close()
+        self._series = {}
+        self._readers = {}
+
+# --- CLI ---
+
+def main():
+    import time
+
+    parser = argparse.ArgumentParser(description="Show the stored OHLC history of a pool.")
+    parser.add_argument("pool", help="Pool address.")
+    parser.add_argument("--dir", default=None, help=f"Store directory (default: $PRICE_STORE_PATH or {DEFAULT_STORE_PATH}).")
+    parser.add_argument("--interval", choices=list(ROLLUPS), default="1h", help="Candle interval.")
+    parser.add_argument("--limit", type=int, default=24, help="Number of most recent candles to show.")
+    args = parser.parse_args()
+
+    store = PriceStore(args.dir)
+    records = store.records(args.pool)
+    candles = store.ohlc(args.pool, args.interval)[-args.limit:]
+    store.close()
+    print(f"{len(records)} observations, blocks {records['block'][0] if len(records) else '-'} to "
+          f"{records['block'][-1] if len(records) else '-'}")
+    print(f"{'Start (UTC)':<20} {'Open':>14} {'High':>14} {'Low':>14} {'Close':>14} {'Count':>7}")
+    for candle in candles:
+        start = time.strftime("%Y-%m-%d %H:%M", time.gmtime(candle["start"]))
+        print(f"{start:<20} {candle['open']:>14.8g} {candle['high']:>14.8g} {candle['low']:>14.8g} "
+              f"{candle['close']:>14.8g} {candle['count']:>7}")
+
+if __name__ == "__main__":
+    main()
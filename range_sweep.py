@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Vectorized range-sweep engine for Uniswap V3 liquidity positions.
+
+`calculate_liquidity` in the liquidity calculators evaluates one (min, max)
+scenario at a time. This module does the same math for whole grids of
+(min_price, max_price, total_usd) in a single NumPy pass, for any pair, and ranks
+the candidate ranges. Tens of thousands of ranges take a few milliseconds.
+
+Prices are always token1 per token0 (the Uniswap convention). For a position of
+liquidity L and sqrt prices sa < sb, with the current sqrt price clamped to
+[sa, sb] as sc:
+    amount0 = L * (sb - sc) / (sc * sb)
+    amount1 = L * (sc - sa)
+
+Capital efficiency is the liquidity obtained per dollar relative to a full-range
+(V2-style) position with the same capital.
+
+Usage:
+    python range_sweep.py wbtc-eth --amount 10000 --top 15
+"""
+import argparse
+import sys
+
+import numpy as np
+
+import metrics
+
+# Pairs the CLI can sweep: token symbols and CoinGecko IDs of (token0, token1).
+# Prices match the liquidity calculators: ETH is token0, so wbtc-eth is quoted as
+# the ETH/WBTC ratio (eth_usd / wbtc_usd) that wbtc_eth_liquidity.py takes.
+PAIRS = {
+    "wbtc-eth": ("ETH", "WBTC", "ethereum", "wrapped-bitcoin"),
+    "pendle-eth": ("ETH", "PENDLE", "ethereum", "pendle"),
+}
+
+# --- Engine ---
+
+def sweep(min_prices, max_prices, total_usd, current_price, token0_usd, token1_usd):
+    """
+    Evaluates every (min_price, max_price, total_usd) combination (NumPy broadcasting rules apply).
+
+    Returns a dict of arrays: min_price, max_price, total_usd, amount0, amount1,
+    liquidity, efficiency and in_range. Invalid ranges (min >= max or non-positive
+    prices) yield NaN amounts.
+    """
+    min_prices, max_prices, total_usd = np.broadcast_arrays(
+        np.asarray(min_prices, dtype=float),
+        np.asarray(max_prices, dtype=float),
+        np.asarray(total_usd, dtype=float),
+    )
+    valid = (min_prices > 0) & (max_prices > min_prices)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sqrt_min = np.sqrt(np.where(valid, min_prices, np.nan))
+        sqrt_max = np.sqrt(np.where(valid, max_prices, np.nan))
+        sqrt_current = np.clip(np.sqrt(current_price), sqrt_min, sqrt_max)
+
+        # Token amounts per unit of liquidity, and their USD value
+        amount0_per_l = (sqrt_max - sqrt_current) / (sqrt_current * sqrt_max)
+        amount1_per_l = sqrt_current - sqrt_min
+        usd_per_l = amount0_per_l * token0_usd + amount1_per_l * token1_usd
+
+        liquidity = total_usd / usd_per_l
+
+        # A full-range position holds L / sqrt(P) of token0 and L * sqrt(P) of token1
+        sqrt_price = np.sqrt(current_price)
+        full_range_usd_per_l = token0_usd / sqrt_price + token1_usd * sqrt_price
+        efficiency = full_range_usd_per_l / usd_per_l
+
+    return {
+        "min_price": min_prices,
+        "max_price": max_prices,
+        "total_usd": total_usd,
+        "amount0": liquidity * amount0_per_l,
+        "amount1": liquidity * amount1_per_l,
+        "liquidity": liquidity,
+        "efficiency": efficiency,
+        "in_range": valid & (min_prices < current_price) & (current_price < max_prices),
+    }
+
+def range_grid(current_price, lower_pcts, upper_pcts, amounts):
+    """
+    Builds a flat grid of candidate ranges around the current price.
+    `lower_pcts`/`upper_pcts` are distances in percent below/above the current price.
+    """
+    lower, upper, amount = np.meshgrid(
+        np.asarray(lower_pcts, dtype=float),
+        np.asarray(upper_pcts, dtype=float),
+        np.asarray(amounts, dtype=float),
+        indexing="ij",
+    )
+    min_prices = current_price * (1 - lower.ravel() / 100)
+    max_prices = current_price * (1 + upper.ravel() / 100)
+    return min_prices, max_prices, amount.ravel()
+
+def rank(results, by="efficiency", top=20, in_range_only=True, mask=None):
+    """
+    Returns the indices of the `top` best scenarios by a result column (descending).
+    `mask` optionally restricts the ranking to a boolean selection of scenarios.
+    """
+    score = np.where(np.isnan(results[by]), -np.inf, results[by])
+    if in_range_only:
+        score = np.where(results["in_range"], score, -np.inf)
+    if mask is not None:
+        score = np.where(mask, score, -np.inf)
+    candidates = np.flatnonzero(np.isfinite(score))
+    top = min(top, candidates.size)
+    if top == 0:
+        return candidates
+    best = candidates[np.argpartition(-score[candidates], top - 1)[:top]]
+    return best[np.argsort(-score[best], kind="stable")]
+
+def print_ranking(results, indices, current_price, symbol0, symbol1):
+    """Prints a ranked table of scenarios."""
+    print(f"{'#':>3}  {'Min':>14} {'Max':>14} {'Width':>8}  {'USD':>12}  {symbol0 + ' amount':>16} {symbol1 + ' amount':>16}  {'Efficiency':>10}")
+    print("-" * 104)
+    for position, i in enumerate(indices, start=1):
+        width = (results["max_price"][i] - results["min_price"][i]) / current_price * 100
+        print(f"{position:>3}  {results['min_price'][i]:>14.8f} {results['max_price'][i]:>14.8f} {width:>7.1f}%  "
+              f"${results['total_usd'][i]:>11,.2f}  {results['amount0'][i]:>16.8f} {results['amount1'][i]:>16.8f}  "
+              f"{results['efficiency'][i]:>9.2f}x")
+
+# --- Main Execution ---
+
+def get_usd_prices(coingecko_ids):
+    """Fetches current USD prices for the given CoinGecko IDs."""
+    import requests
+    import rate_limit
+
+    url = "https://api.coingecko.com/api/v3/simple/price"
+    params = {'ids': ",".join(coingecko_ids), 'vs_currencies': 'usd'}
+    try:
+        with metrics.http_request("coingecko"):
+            response = rate_limit.get(url, params=params, timeout=10)
+            response.raise_for_status()
+        data = response.json()
+        return [data[coin_id]['usd'] for coin_id in coingecko_ids]
+    except (requests.exceptions.RequestException, rate_limit.RateLimited) as e:
+        print(f"Error fetching USD prices from CoinGecko: {e}")
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep and rank Uniswap V3 price ranges for a pair.")
+    parser.add_argument("pair", choices=sorted(PAIRS), help="Pair to sweep.")
+    parser.add_argument("--amount", type=float, action="append", help="Total USD to invest (repeatable, default 10000).")
+    parser.add_argument("--max-distance", type=float, default=50.0, help="Largest distance from the current price, in percent (default 50).")
+    parser.add_argument("--steps", type=int, default=200, help="Grid steps per side (default 200).")
+    parser.add_argument("--min-width", type=float, default=0.0, help="Only rank ranges at least this wide, in percent of the current price.")
+    parser.add_argument("--by", choices=["efficiency", "liquidity"], default="efficiency", help="Ranking column (default efficiency).")
+    parser.add_argument("--top", type=int, default=20, help="Number of ranges to show (default 20).")
+    args = parser.parse_args()
+
+    symbol0, symbol1, coin0, coin1 = PAIRS[args.pair]
+    print("Fetching prices from CoinGecko...")
+    usd_prices = get_usd_prices([coin0, coin1])
+    if not usd_prices:
+        sys.exit(1)
+    token0_usd, token1_usd = usd_prices
+    current_price = token0_usd / token1_usd
+
+    print(f"  - Current price: {current_price:.8f} {symbol1} per {symbol0}")
+    print("-" * 25, "\n")
+
+    distances = np.linspace(args.max_distance / args.steps, args.max_distance, args.steps)
+    distances = distances[distances < 100]
+    min_prices, max_prices, amounts = range_grid(current_price, distances, distances, args.amount or [10000.0])
+    results = sweep(min_prices, max_prices, amounts, current_price, token0_usd, token1_usd)
+
+    width = (max_prices - min_prices) / current_price * 100
+    best = rank(results, by=args.by, top=args.top, mask=width >= args.min_width)
+    print(f"Evaluated {min_prices.size:,} ranges. Best by {args.by}:\n")
+    print_ranking(results, best, current_price, symbol0, symbol1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Out-of-range watcher for many Uniswap V3 positions.
+
+Positions are loaded like pool_info's portfolio mode (token IDs and/or every
+position of some owners) and grouped by pool. A position is in range while
+tick_lower <= tick < tick_upper, i.e. while the pool counts its liquidity.
+
+A position's state can only change when the pool's tick crosses one of its two
+boundaries. The boundaries of all positions in a pool are kept in one sorted
+array, so a tick change from a to b only visits the positions with a boundary
+in (a, b]: two binary searches, however many positions the pool has.
+
+Time in range is accounted the same way: a position remembers when its state
+last changed and adds the elapsed time when it leaves the range, so statistics
+cost nothing per tick and are computed when they are asked for.
+
+Ticks come from the pools' Swap events (see price_feed.py). An alert goes out
+through the Telegram notifier when a position leaves its range and re-arms when
+it comes back.
+
+Usage:
+    python range_watcher.py --owner 0xYourWallet
+    python range_watcher.py 12345 67890 --stats-interval 600
+"""
+import argparse
+import sys
+import time
+from bisect import bisect_right
+
+import metrics
+
+# Seconds between two time-in-range reports in the watch loop
+DEFAULT_STATS_INTERVAL = 3600
+
+class WatchedPosition:
+    """One position's range and its time-in-range accounting."""
+
+    def __init__(self, nft_id, pool, tick_lower, tick_upper, label=None, decimals=(0, 0)):
+        self.nft_id = nft_id
+        self.pool = pool
+        self.tick_lower = tick_lower
+        self.tick_upper = tick_upper
+        self.label = label or f"#{nft_id}"
+        self.decimals = decimals
+        self.in_range = None
+        self.since = None
+        self.first_seen = None
+        self.time_in_range = 0.0
+        self.exits = 0
+
+    @classmethod
+    def from_row(cls, row):
+        """Builds a position from a pool_info portfolio row."""
+        label = f"#{row['nft_id']} {row['token0_symbol']}/{row['token1_symbol']} {row['fee'] / 10000}%"
+        return cls(row["nft_id"], row["pool_address"], row["tick_lower"], row["tick_upper"], label,
+                   (row["token0_decimals"], row["token1_decimals"]))
+
+    def contains(self, tick):
+        return self.tick_lower <= tick < self.tick_upper
+
+    def observe(self, tick, now):
+        """Applies a tick; returns True if the position entered or left its range."""
+        in_range = self.contains(tick)
+        if self.in_range is None:
+            self.in_range, self.since, self.first_seen = in_range, now, now
+            return True
+        if in_range == self.in_range:
+            return False
+        if self.in_range:
+            self.time_in_range += now - self.since
+            self.exits += 1
+        self.in_range, self.since = in_range, now
+        return True
+
+    def stats(self, now):
+        """Seconds observed and seconds in range so far."""
+        if self.first_seen is None:
+            return 0.0, 0.0
+        in_range = self.time_in_range + (now - self.since if self.in_range else 0.0)
+        return now - self.first_seen, in_range
+
+    def message(self, tick):
+        from tick_math import tick_to_price
+
+        lower, upper, current = (tick_to_price(t, *self.decimals) for t in (self.tick_lower, self.tick_upper, tick))
+        state = "back in range" if self.in_range else "out of range"
+        return (f"Position {self.label} is {state}: price {current:.6g} "
+                f"(tick {tick}), range {lower:.6g} - {upper:.6g} (ticks {self.tick_lower} to {self.tick_upper}).")
+
+# --- Index ---
+
+class PoolIndex:
+    """The positions of one pool, indexed by their sorted tick boundaries."""
+
+    def __init__(self, positions):
+        pairs = sorted(((tick, position) for position in positions
+                        for tick in (position.tick_lower, position.tick_upper)), key=lambda pair: pair[0])
+        self.ticks = [tick for tick, _ in pairs]
+        self.positions = [position for _, position in pairs]
+        self.all_positions = list(positions)
+        self.tick = None
+
+    def crossed(self, old, new):
+        """Positions with a boundary in (min(old, new), max(old, new)]: the only ones whose state can change."""
+        low, high = min(old, new), max(old, new)
+        start, end = bisect_right(self.ticks, low), bisect_right(self.ticks, high)
+        return list({id(position): position for position in self.positions[start:end]}.values())
+
+    def update(self, tick, now):
+        """Applies a new pool tick; returns the positions that entered or left their range."""
+        candidates = self.all_positions if self.tick is None else self.crossed(self.tick, tick)
+        self.tick = tick
+        return [position for position in candidates if position.observe(tick, now)]
+
+class RangeWatcher:
+    """Positions grouped by pool, each pool with its own boundary index."""
+
+    def __init__(self, positions):
+        by_pool = {}
+        for position in positions:
+            by_pool.setdefault(position.pool.lower(), []).append(position)
+        self.indexes = {pool: PoolIndex(members) for pool, members in by_pool.items()}
+        self.pools = list(dict.fromkeys(position.pool for position in positions))
+        self.positions = list(positions)
+
+    def update(self, pool, tick, now=None):
+        """
+        Applies a pool's new tick. Returns the positions whose state changed, with their
+        new state in `in_range` (all of the pool's positions on its first tick).
+        """
+        index = self.indexes.get(pool.lower())
+        if index is None:
+            return []
+        return index.update(tick, time.time() if now is None else now)
+
+    def stats(self, now=None):
+        """Time-in-range statistics of every observed position, as dicts."""
+        now = time.time() if now is None else now
+        rows = []
+        for position in self.positions:
+            observed, in_range = position.stats(now)
+            rows.append({
+                "nft_id": position.nft_id,
+                "label": position.label,
+                "in_range": position.in_range,
+                "observed_s": observed,
+                "in_range_s": in_range,
+                "time_in_range": in_range / observed if observed > 0 else None,
+                "exits": position.exits,
+            })
+        return rows
+
+# --- Watch loop ---
+
+def print_stats(watcher, now=None):
+    print(f"\n{'Position':<36} {'Status':<12} {'Observed':>10} {'In range':>9} {'Exits':>6}")
+    for row in watcher.stats(now):
+        status = "-" if row["in_range"] is None else ("In Range" if row["in_range"] else "Out of Range")
+        share = "-" if row["time_in_range"] is None else f"{row['time_in_range']:.1%}"
+        print(f"{row['label']:<36} {status:<12} {row['observed_s'] / 3600:>9.1f}h {share:>9} {row['exits']:>6}")
+    print()
+
+def report(transitions, tick, initial=False):
+    """Alerts on positions that left their range and clears the alert of those that came back."""
+    from price_ratio_monitor import alert
+
+    for position in transitions:
+        if initial and position.in_range:
+            # Re-arms an alert left active by an earlier run
+            alert(f"range-{position.nft_id}", None, None)
+            continue
+        message = position.message(tick)
+        print(message)
+        alert(f"range-{position.nft_id}", None if position.in_range else "out of range", message)
+
+async def watch(ws_url, watcher, http_url=None, stats_interval=DEFAULT_STATS_INTERVAL):
+    """Streams the pools' ticks into the watcher, alerting on transitions and printing stats periodically."""
+    from price_feed import stream_pool_prices
+
+    next_stats = time.monotonic() + stats_interval
+    async for update in stream_pool_prices(ws_url, watcher.pools, http_url):
+        with metrics.cycle("range_watcher"):
+            report(watcher.update(update.pool, update.tick), update.tick)
+        if time.monotonic() >= next_stats:
+            print_stats(watcher)
+            next_stats = time.monotonic() + stats_interval
+
+def main():
+    import asyncio
+    from core import get_metadata_cache, load_env
+    from pool_info import DEFAULT_CONCURRENCY, connect, fetch_portfolio
+
+    parser = argparse.ArgumentParser(description="Alert when Uniswap V3 positions leave their price range.")
+    parser.add_argument("nft_ids", type=int, nargs="*", metavar="nft_id", help="Position IDs to watch.")
+    parser.add_argument("--owner", action="append", default=[], help="Watch every position owned by this address (repeatable).")
+    parser.add_argument("--ws-url", help="Websocket RPC URL for Swap events (default: $ARBITRUM_WS_URL).")
+    parser.add_argument("--stats-interval", type=float, default=DEFAULT_STATS_INTERVAL, help=f"Seconds between time-in-range reports (default {DEFAULT_STATS_INTERVAL}).")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Maximum concurrent requests while loading positions.")
+    args = parser.parse_args()
+    load_env()
+    if not args.nft_ids and not args.owner:
+        parser.error("provide at least one NFT ID or --owner address")
+
+    import rate_limit
+    from price_ratio_monitor import ARBITRUM_WS_URL
+
+    # Alerting requests are never shed by the RPC rate limiter
+    rate_limit.set_default_priority(rate_limit.HIGH)
+    w3 = connect()
+    http_url = w3.provider.best_url()
+    rows = asyncio.run(fetch_portfolio(http_url, args.owner, args.nft_ids, args.concurrency, get_metadata_cache()))
+    for row in rows:
+        if row["error"]:
+            print(f"Warning: {row['error']}. Not watching position {row['nft_id']}.", file=sys.stderr)
+    # Closed positions (no liquidity left) have no range to leave
+    rows = [row for row in rows if row["liquidity"] > 0 and not row["error"]]
+    if not rows:
+        print("No open positions to watch.")
+        sys.exit(1)
+
+    watcher = RangeWatcher([WatchedPosition.from_row(row) for row in rows])
+    now = time.time()
+    for pool in watcher.pools:
+        tick = next(row["current_tick"] for row in rows if row["pool_address"] == pool)
+        report(watcher.update(pool, tick, now), tick, initial=True)
+    print(f"Watching {len(watcher.positions)} positions in {len(watcher.pools)} pools, "
+          f"{sum(1 for position in watcher.positions if position.in_range)} in range.")
+
+    try:
+        asyncio.run(watch(args.ws_url or ARBITRUM_WS_URL, watcher, http_url, args.stats_interval))
+    except KeyboardInterrupt:
+        print("\nStopping watcher.")
+    print_stats(watcher)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Adaptive client-side rate limiting for RPC endpoints and HTTP APIs.
+
+Every host gets one token bucket, shared by all clients in the process:
+
+  - a request takes a token, and waits for one when the bucket is empty;
+  - the rate adapts (AIMD): while the bucket is the bottleneck and requests
+    succeed it grows by about RATE_GROWTH per second, and a 429 answer (or a
+    JSON-RPC rate-limit error) halves it. A Retry-After header also pauses the
+    bucket until then;
+  - requests have a priority. One that would wait longer than its priority
+    allows (MAX_WAIT) is shed at once with RequestShed instead of queueing, so
+    speculative work (LOW, e.g. hedged duplicates) gives way first, then
+    ordinary work, while HIGH (alerting) requests always wait their turn.
+
+Retries draw from a per-host RetryBudget: every request earns RETRY_RATIO of a
+retry and a small reserve refills over time, so a struggling host sees at most
+~10% extra load from retries. Each retry waits a full-jitter exponential
+backoff.
+
+Usage:
+    limiter = limiter_for(url)
+    limiter.acquire()                     # waits, or raises RequestShed
+    limiter.throttled(retry_after=30)     # after a 429
+    limiter.succeeded()
+
+    response = get("https://api.coingecko.com/api/v3/simple/price", params=params, timeout=10)
+
+    with priority(HIGH):
+        check_alerts()
+
+Per-host starting rates (requests per second) can be set with
+RATE_LIMITS="api.coingecko.com=0.5,arb1.arbitrum.io=10".
+"""
+import contextlib
+import contextvars
+import os
+import random
+import threading
+import time
+
+import metrics
+
+# Request priorities
+HIGH, NORMAL, LOW = 0, 1, 2
+
+# Longest a request of each priority may queue for a token before it is shed (None: no limit)
+MAX_WAIT = {HIGH: None, NORMAL: 300.0, LOW: 0.0}
+
+# Starting rates (requests per second) of known public hosts; others start at DEFAULT_RATE
+HOST_RATES = {
+    "api.coingecko.com": 0.5,
+    "arb1.arbitrum.io": 10.0,
+    "rpc.ankr.com": 10.0,
+    "arbitrum-one.public.blastapi.io": 10.0,
+}
+DEFAULT_RATE = 50.0
+
+# Fraction the rate grows per second at saturation, the factor it shrinks by on a 429,
+# and its floor
+RATE_GROWTH = 0.1
+RATE_DECREASE = 0.5
+MIN_RATE = 0.05
+
+# Seconds after a decrease during which further 429s (from the same burst) only pause
+DECREASE_HOLDOFF = 1.0
+
+# Pause after a rate-limit answer without Retry-After
+DEFAULT_RETRY_AFTER = 1.0
+
+# Retries earned per request, the retries that refill per second, and the budget's cap
+RETRY_RATIO = 0.1
+RETRY_RESERVE_PER_SECOND = 0.2
+RETRY_BUDGET_CAP = 10.0
+
+# Attempts per request, and the full-jitter backoff between them (seconds)
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+# JSON-RPC error messages that mean "slow down" rather than a failed request
+RATE_LIMIT_HINTS = ("rate limit", "rate-limit", "too many requests")
+
+class RateLimited(ConnectionError):
+    """A host answered that it is rate limiting us."""
+
+    def __init__(self, host, message="rate limited"):
+        super().__init__(f"{host}: {message}")
+        self.host = host
+
+class RequestShed(RateLimited):
+    """A request was dropped by the client limiter because it would wait longer than its priority allows."""
+
+    def __init__(self, host, wait):
+        super().__init__(host, f"request shed, next token in {wait:.1f}s")
+        self.wait = wait
+
+# --- Priorities ---
+
+_priority = contextvars.ContextVar("rate_limit_priority", default=None)
+_default_priority = NORMAL
+
+def current_priority():
+    level = _priority.get()
+    return _default_priority if level is None else level
+
+def set_default_priority(level):
+    """Sets the priority of requests outside any `priority()` block (e.g. HIGH for a monitor)."""
+    global _default_priority
+    _default_priority = level
+
+@contextlib.contextmanager
+def priority(level):
+    """Runs a block (and the tasks it starts) with a request priority."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+# --- Limiter ---
+
+class RetryBudget:
+    """Retries allowed in proportion to requests made, plus a slowly refilling reserve."""
+
+    def __init__(self, ratio=RETRY_RATIO, reserve_per_second=RETRY_RESERVE_PER_SECOND, cap=RETRY_BUDGET_CAP):
+        self.ratio = ratio
+        self.reserve_per_second = reserve_per_second
+        self.cap = cap
+        self.balance = cap
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.balance = min(self.cap, self.balance + self.ratio)
+
+    def withdraw(self):
+        """Takes one retry from the budget; False when it is spent."""
+        with self._lock:
+            now = time.monotonic()
+            self.balance = min(self.cap, self.balance + (now - self._updated) * self.reserve_per_second)
+            self._updated = now
+            if self.balance < 1:
+                return False
+            self.balance -= 1
+            return True
+
+class HostLimiter:
+    """An adaptive token bucket for one host. Tokens may go negative: they are reservations of queued requests."""
+
+    def __init__(self, host, rate):
+        self.host = host
+        self.rate = rate
+        self.tokens = max(1.0, rate)
+        self.retries = RetryBudget()
+        self._updated = time.monotonic()
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, level):
+        """Takes a token and returns how long to wait for it, or raises RequestShed."""
+        level = current_priority() if level is None else level
+        with self._lock:
+            now = time.monotonic()
+            # While paused, _updated lies in the future and nothing refills
+            if now > self._updated:
+                self.tokens = min(max(1.0, self.rate), self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+            wait = (self._updated - now) + max(0.0, 1 - self.tokens) / self.rate
+            limit = MAX_WAIT.get(level)
+            if limit is not None and wait > limit:
+                metrics.observe_rate_limit(self.host, "shed")
+                raise RequestShed(self.host, wait)
+            self.tokens -= 1
+            self.retries.deposit()
+            return wait
+
+    def acquire(self, level=None):
+        """Waits for a token. Raises RequestShed if the wait exceeds the priority's MAX_WAIT."""
+        wait = self._reserve(level)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, level=None):
+        import asyncio
+
+        wait = self._reserve(level)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def succeeded(self):
+        """Grows the rate while the bucket is the bottleneck (no spare tokens)."""
+        with self._lock:
+            if self.tokens < 1:
+                self.rate *= 1 + RATE_GROWTH / max(self.rate, RATE_GROWTH)
+
+    def throttled(self, retry_after=None):
+        """Slows down after a rate-limit answer, and pauses until Retry-After if the host sent one."""
+        metrics.observe_rate_limit(self.host, "throttled")
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease >= DECREASE_HOLDOFF:
+                self.rate = max(MIN_RATE, self.rate * RATE_DECREASE)
+                self._last_decrease = now
+            pause = DEFAULT_RETRY_AFTER if retry_after is None else retry_after
+            if now + pause > self._updated:
+                self.tokens = min(self.tokens, 0.0)
+                self._updated = now + pause
+
+    def paused(self):
+        """True while the host's Retry-After has not elapsed."""
+        return time.monotonic() < self._updated
+
+    def pause_remaining(self):
+        """Seconds until the host's Retry-After elapses (0 when not paused)."""
+        return max(0.0, self._updated - time.monotonic())
+
+    def __repr__(self):
+        return f"HostLimiter({self.host}, {self.rate:.2f}/s)"
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def _configured_rates():
+    rates = dict(HOST_RATES)
+    for entry in filter(None, os.getenv("RATE_LIMITS", "").split(",")):
+        host, _, rate = entry.partition("=")
+        rates[host.strip()] = float(rate)
+    return rates
+
+def limiter_for(url):
+    """The shared limiter of a URL's host."""
+    host = metrics.endpoint_label(url)
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = _limiters[host] = HostLimiter(host, _configured_rates().get(host, DEFAULT_RATE))
+        return limiter
+
+# --- Errors ---
+
+def backoff(attempt):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def retry_after(headers):
+    """Seconds from a Retry-After header (delta-seconds or an HTTP date), or None."""
+    value = headers.get("Retry-After") if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        from email.utils import parsedate_to_datetime
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+def is_rate_limit_error(error):
+    """Whether a JSON-RPC error object is a rate-limit answer."""
+    if not isinstance(error, dict):
+        return False
+    message = str(error.get("message", "")).lower()
+    return error.get("code") == 429 or any(hint in message for hint in RATE_LIMIT_HINTS)
+
+def _http_response(error):
+    """(status, headers) of an HTTP error from requests or aiohttp, or (None, None)."""
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is not None:
+        return status, response.headers
+    status = getattr(error, "status", None)
+    if isinstance(status, int):
+        return status, getattr(error, "headers", None)
+    return None, None
+
+def throttling(error):
+    """(True, Retry-After seconds or None) if a failed request was a rate-limit answer, else (False, None)."""
+    status, headers = _http_response(error)
+    if status == 429:
+        return True, retry_after(headers)
+    rpc_response = getattr(error, "rpc_response", None)
+    if isinstance(rpc_response, dict) and is_rate_limit_error(rpc_response.get("error")):
+        return True, None
+    return isinstance(error, RateLimited) and not isinstance(error, RequestShed), None
+
+def is_transient(error):
+    """Whether a failure is worth retrying: throttling, timeouts, connection errors and 5xx answers."""
+    if isinstance(error, RequestShed):
+        return False
+    if throttling(error)[0]:
+        return True
+    status, _ = _http_response(error)
+    if status is not None:
+        return status >= 500
+    # requests' connection errors and timeouts are OSErrors; aiohttp's are matched by name
+    return isinstance(error, (TimeoutError, OSError)) or type(error).__name__ in (
+        "ClientConnectionError", "ServerDisconnectedError",
+    )
+
+# --- HTTP ---
+
+def get(url, **kwargs):
+    """
+    `requests.get` through the host's limiter. 429s and 5xx answers, timeouts and connection
+    errors are retried with jittered backoff while the retry budget allows; the last
+    response is returned (or the last exception raised) when it does not.
+    """
+    import requests
+
+    limiter = limiter_for(url)
+    for attempt in range(MAX_ATTEMPTS):
+        limiter.acquire()
+        try:
+            response = requests.get(url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            if attempt + 1 >= MAX_ATTEMPTS or not is_transient(e) or not limiter.retries.withdraw():
+                raise
+        else:
+            if response.status_code == 429:
+                limiter.throttled(retry_after(response.headers))
+            elif response.status_code < 500:
+                limiter.succeeded()
+                return response
+            if attempt + 1 >= MAX_ATTEMPTS or not limiter.retries.withdraw():
+                return response
+        time.sleep(backoff(attempt))
@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Latency-aware pool of RPC endpoints shared by all scripts.
+
+The configured node (ETHEREUM_NODE_URL / ARBITRUM_RPC_URL) and the public
+Arbitrum nodes are kept in one health-scored pool. Every request records the
+endpoint's latency (EWMA) and error rate, and is routed to the fastest healthy
+endpoint. Failing endpoints are put on a short cooldown and the request fails
+over to the next one.
+
+Identical eth_calls within one block are answered once (see call_cache.py).
+
+With hedging enabled, a read that takes noticeably longer than the endpoint
+usually needs is also sent to the second-best endpoint, and whichever answers
+first wins.
+
+Every endpoint's requests go through its host's adaptive rate limiter (see
+rate_limit.py). An endpoint that answers 429 is paused for its Retry-After
+and left out of the ranking meanwhile, so requests go to the others (unless
+every endpoint is paused). A request that failed on every endpoint
+for a transient reason (throttling, timeouts, 5xx) is retried with jittered
+backoff while the pool's retry budget allows. Hedged duplicates are low
+priority, so they are the first requests dropped when a host is saturated.
+
+Usage:
+    w3 = create_web3()
+    print(w3.eth.block_number)
+
+Set RPC_HEDGE=1 to enable hedged reads by default, and RPC_CALL_CACHE=0 to
+disable the eth_call cache.
+"""
+import contextvars
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from web3 import HTTPProvider, Web3
+from web3.providers import JSONBaseProvider
+
+import metrics
+import rate_limit
+from call_cache import CallCache
+
+# List of public RPC nodes for Arbitrum
+PUBLIC_ARBITRUM_NODES = [
+    "https://arb1.arbitrum.io/rpc",
+    "https://rpc.ankr.com/arbitrum",
+    "https://arbitrum-one.public.blastapi.io",
+]
+
+# Seconds before a single HTTP request is abandoned
+REQUEST_TIMEOUT = 10
+
+# Weight of the newest sample in the latency / error-rate moving averages
+EWMA_ALPHA = 0.3
+
+# Latency assumed for endpoints that have not answered yet. Zero means every endpoint
+# is tried once (in list order) before the measurements take over.
+INITIAL_LATENCY = 0.0
+
+# Every EXPLORE_EVERY requests, the least recently used healthy endpoint is tried first,
+# so endpoints that were slow once get a chance to show they have recovered
+EXPLORE_EVERY = 50
+
+# An endpoint with this many consecutive errors is skipped for ERROR_COOLDOWN seconds
+MAX_CONSECUTIVE_ERRORS = 3
+ERROR_COOLDOWN = 30
+
+# Seconds added to an endpoint's score at a 100% error rate
+ERROR_PENALTY = 2.0
+
+# A hedged read is duplicated after HEDGE_FACTOR x the endpoint's usual latency
+HEDGE_FACTOR = 2.0
+HEDGE_MIN_DELAY = 0.05
+
+# Methods that are safe to send to two endpoints at once
+HEDGEABLE_METHODS = {
+    "eth_blockNumber", "eth_call", "eth_chainId", "eth_getBalance", "eth_getBlockByNumber",
+    "eth_getCode", "eth_getLogs", "eth_getStorageAt", "eth_getTransactionReceipt", "web3_clientVersion",
+}
+
+# --- Endpoints ---
+
+class Endpoint:
+    """A single RPC endpoint with its health statistics."""
+
+    def __init__(self, url, timeout=REQUEST_TIMEOUT):
+        self.url = url
+        self.label = metrics.endpoint_label(url)
+        self.limiter = rate_limit.limiter_for(url)
+        self.provider = HTTPProvider(url, request_kwargs={"timeout": timeout}, exception_retry_configuration=None)
+        self.latency = None
+        self.error_rate = 0.0
+        self.consecutive_errors = 0
+        self.down_until = 0.0
+        self.requests = 0
+        self.last_used = 0.0
+        self._lock = threading.Lock()
+
+    def record_success(self, elapsed):
+        with self._lock:
+            self.requests += 1
+            self.last_used = time.monotonic()
+            self.latency = elapsed if self.latency is None else EWMA_ALPHA * elapsed + (1 - EWMA_ALPHA) * self.latency
+            self.error_rate = (1 - EWMA_ALPHA) * self.error_rate
+            self.consecutive_errors = 0
+
+    def record_error(self):
+        with self._lock:
+            self.requests += 1
+            self.last_used = time.monotonic()
+            self.error_rate = EWMA_ALPHA + (1 - EWMA_ALPHA) * self.error_rate
+            self.consecutive_errors += 1
+            if self.consecutive_errors >= MAX_CONSECUTIVE_ERRORS:
+                self.down_until = time.monotonic() + ERROR_COOLDOWN
+
+    def is_healthy(self):
+        return time.monotonic() >= self.down_until and not self.limiter.paused()
+
+    def score(self):
+        """Expected cost of a request in seconds: latency plus a penalty for recent errors (lower is better)."""
+        latency = INITIAL_LATENCY if self.latency is None else self.latency
+        return latency + self.error_rate * ERROR_PENALTY
+
+    def __repr__(self):
+        latency = "n/a" if self.latency is None else f"{self.latency * 1000:.0f}ms"
+        return f"Endpoint({self.url}, latency={latency}, errors={self.error_rate:.0%})"
+
+# --- Provider ---
+
+class EndpointPoolProvider(JSONBaseProvider):
+    """Web3 provider that routes each request to the fastest healthy endpoint of a pool."""
+
+    def __init__(self, urls, hedge=False, timeout=REQUEST_TIMEOUT, cache=True, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoints = [Endpoint(url, timeout) for url in dict.fromkeys(urls)]
+        if not self.endpoints:
+            raise ValueError("EndpointPoolProvider needs at least one endpoint URL")
+        self.hedge = hedge
+        self._request_count = itertools.count(1)
+        self._executor = ThreadPoolExecutor(max_workers=2 * len(self.endpoints), thread_name_prefix="rpc-hedge")
+        self.retries = rate_limit.RetryBudget()
+        self.call_cache = CallCache(self.route) if cache else None
+
+    def ranked_endpoints(self):
+        """
+        Endpoints ordered from best to worst; unhealthy ones go last. Endpoints paused by
+        their rate limiter (Retry-After) are left out, so no request waits on one while
+        another endpoint is free; only when every endpoint is paused are they returned,
+        soonest to resume first.
+        """
+        order = {endpoint: index for index, endpoint in enumerate(self.endpoints)}
+        available = [endpoint for endpoint in self.endpoints if not endpoint.limiter.paused()]
+        if not available:
+            return sorted(self.endpoints, key=lambda e: (e.limiter.pause_remaining(), order[e]))
+        return sorted(available, key=lambda e: (not e.is_healthy(), e.score(), order[e]))
+
+    def best_url(self):
+        return self.ranked_endpoints()[0].url
+
+    def send_to(self, endpoint, method, params, priority=None):
+        """
+        Sends a request to one specific endpoint through its rate limiter, recording its
+        latency or failure. Rate-limit answers raise rate_limit.RateLimited.
+        """
+        endpoint.limiter.acquire(priority)
+        start = time.monotonic()
+        try:
+            response = endpoint.provider.make_request(method, params)
+        except Exception as e:
+            # Throttling slows the endpoint's limiter down instead of counting against its health
+            throttled, retry_after = rate_limit.throttling(e)
+            if throttled:
+                endpoint.limiter.throttled(retry_after)
+            else:
+                endpoint.record_error()
+            metrics.observe_rpc(method, endpoint.label, time.monotonic() - start, error=True)
+            raise
+        elapsed = time.monotonic() - start
+        if isinstance(response, dict) and rate_limit.is_rate_limit_error(response.get("error")):
+            endpoint.limiter.throttled()
+            metrics.observe_rpc(method, endpoint.label, elapsed, error=True)
+            raise rate_limit.RateLimited(endpoint.label, str(response["error"].get("message", "rate limited")))
+        endpoint.record_success(elapsed)
+        endpoint.limiter.succeeded()
+        metrics.observe_rpc(method, endpoint.label, elapsed)
+        return response
+
+    def _submit(self, *args):
+        # Worker threads do not inherit the caller's context (and its request priority)
+        return self._executor.submit(contextvars.copy_context().run, self.send_to, *args)
+
+    def _send_hedged(self, primary, secondary, method, params):
+        delay = max(HEDGE_MIN_DELAY, HEDGE_FACTOR * (primary.latency or 0))
+        futures = [self._submit(primary, method, params)]
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            # A speculative duplicate: dropped first when the secondary's host is saturated
+            futures.append(self._submit(secondary, method, params, rate_limit.LOW))
+        elif futures[0].exception() is not None:
+            futures.append(self._submit(secondary, method, params))
+
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def make_request(self, method, params):
+        if self.call_cache is not None:
+            return self.call_cache.request(method, params)
+        return self.route(method, params)
+
+    def route(self, method, params):
+        """
+        Sends a request to the best endpoint, failing over (or hedging) to the next ones.
+        If every endpoint failed transiently, retries with jittered backoff while the retry budget allows.
+        """
+        self.retries.deposit()
+        for attempt in range(rate_limit.MAX_ATTEMPTS):
+            try:
+                return self._route_once(method, params)
+            except Exception as e:
+                if (attempt + 1 >= rate_limit.MAX_ATTEMPTS or not rate_limit.is_transient(e)
+                        or not self.retries.withdraw()):
+                    raise
+            time.sleep(rate_limit.backoff(attempt))
+
+    def _route_once(self, method, params):
+        ranked = self.ranked_endpoints()
+        if next(self._request_count) % EXPLORE_EVERY == 0:
+            healthy = [endpoint for endpoint in ranked if endpoint.is_healthy()]
+            if healthy:
+                stalest = min(healthy, key=lambda e: e.last_used)
+                ranked.remove(stalest)
+                ranked.insert(0, stalest)
+        error = None
+        index = 0
+        while index < len(ranked):
+            endpoint = ranked[index]
+            hedged = self.hedge and method in HEDGEABLE_METHODS and index + 1 < len(ranked)
+            try:
+                if hedged:
+                    return self._send_hedged(endpoint, ranked[index + 1], method, params)
+                return self.send_to(endpoint, method, params)
+            except Exception as e:
+                error = e
+            # A failed hedged attempt has already tried the next endpoint too
+            index += 2 if hedged else 1
+        raise error
+
+    def __repr__(self):
+        return f"EndpointPoolProvider({self.endpoints})"
+
+def default_urls():
+    """The configured node URLs followed by the public Arbitrum nodes."""
+    configured = [os.getenv("ETHEREUM_NODE_URL"), os.getenv("ARBITRUM_RPC_URL")]
+    return [url for url in configured if url] + PUBLIC_ARBITRUM_NODES
+
+def create_web3(urls=None, hedge=None, cache=None):
+    """
+    Creates a Web3 instance backed by an endpoint pool (default: default_urls()).
+    Hedging is enabled by default when the RPC_HEDGE environment variable is set to 1;
+    the eth_call cache unless RPC_CALL_CACHE is set to 0.
+    """
+    if hedge is None:
+        hedge = os.getenv("RPC_HEDGE") == "1"
+    if cache is None:
+        cache = os.getenv("RPC_CALL_CACHE") != "0"
+    return Web3(EndpointPoolProvider(urls or default_urls(), hedge=hedge, cache=cache))
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Streaming batch mode for the liquidity calculators.
+
+Scenarios (total_usd, min_price, max_price) are read as CSV or JSON Lines from
+a file or stdin, CHUNK_SIZE lines at a time. Each chunk is evaluated in one
+vectorized call and its results are written to stdout before the next chunk is
+read, so memory stays constant however long the input is.
+
+CSV input may start with a header naming the columns (in any order, extra
+columns are ignored); without one, columns are total_usd,min_price,max_price.
+JSON Lines input has one object per line with those keys. Results repeat the
+scenario and add one column per token amount plus an `error` column; rows that
+cannot be parsed or describe an invalid position keep their place in the output
+with an error instead of amounts (unparseable rows name their input line).
+
+Usage:
+    python wbtc_eth_liquidity.py --batch scenarios.csv > results.csv
+    cat scenarios.jsonl | python pendle_eth_liquidity.py --batch - --format jsonl
+"""
+import itertools
+import json
+import math
+from operator import itemgetter
+
+import numpy as np
+
+# Input columns, in the order of headerless CSV
+FIELDS = ("total_usd", "min_price", "max_price")
+
+# Lines read, evaluated and written per step
+CHUNK_SIZE = 65536
+
+NAN_ROW = [math.nan] * len(FIELDS)
+
+# Significant digits of calculated amounts (inputs are echoed exactly)
+AMOUNT_DIGITS = 12
+
+# --- Input ---
+
+def _csv_columns(first_line):
+    """Column indices of FIELDS from a CSV header, or None if the line is data."""
+    names = [name.strip().lower() for name in first_line.split(",")]
+    try:
+        [float(name) for name in names]
+        return None
+    except ValueError:
+        pass
+    missing = [field for field in FIELDS if field not in names]
+    if missing:
+        raise ValueError(f"CSV header is missing column(s): {', '.join(missing)}")
+    return [names.index(field) for field in FIELDS]
+
+def _parse_csv_line(line, columns):
+    fields = line.split(",")
+    try:
+        return [float(fields[i]) for i in columns]
+    except (IndexError, ValueError):
+        return NAN_ROW
+
+def _parse_json_line(line):
+    try:
+        scenario = json.loads(line)
+        return [float(scenario[field]) for field in FIELDS]
+    except (ValueError, KeyError, TypeError):
+        return NAN_ROW
+
+def _parse_chunk(chunk, fmt, columns):
+    """Parses the non-blank lines of one chunk into an (n, 3) float array."""
+    if fmt == "jsonl":
+        try:
+            # One C-level parse of the whole chunk as a JSON array. A line holding
+            # several objects ("{...},{...}") would shift every later row: re-parse per line
+            scenarios = json.loads("[" + ",".join(chunk) + "]")
+            if len(scenarios) == len(chunk):
+                return np.array(list(map(itemgetter(*FIELDS), scenarios)), dtype=float).reshape(-1, len(FIELDS))
+        except (ValueError, KeyError, TypeError):
+            pass
+        return np.array([_parse_json_line(line) for line in chunk], dtype=float)
+    try:
+        # NumPy's C parser; a malformed line anywhere falls back to line-by-line parsing
+        return np.loadtxt(chunk, delimiter=",", usecols=columns, ndmin=2, dtype=float, comments=None)
+    except ValueError:
+        return np.array([_parse_csv_line(line, columns) for line in chunk], dtype=float)
+
+def read_chunks(stream, fmt="csv", chunk_size=CHUNK_SIZE):
+    """
+    Yields (scenarios, line_numbers): an (n, 3) float array and the input line number
+    (from 1) of each row. Unparseable lines become rows of NaN; blank lines are skipped.
+    """
+    lines = enumerate(stream, start=1)
+    columns = list(range(len(FIELDS)))
+    if fmt == "csv":
+        for number, first in lines:
+            if first.strip():
+                header = _csv_columns(first)
+                if header is None:
+                    lines = itertools.chain([(number, first)], lines)
+                else:
+                    columns = header
+                break
+
+    while True:
+        numbered = list(itertools.islice(lines, chunk_size))
+        if not numbered:
+            return
+        numbered = [(number, line) for number, line in numbered if line.strip()]
+        if numbered:
+            yield _parse_chunk([line for _, line in numbered], fmt, columns), [number for number, _ in numbered]
+
+# --- Output ---
+
+def _error(line_number, total_usd, min_price, max_price):
+    if not all(math.isfinite(value) for value in (total_usd, min_price, max_price)):
+        return f"unparseable line {line_number}"
+    if total_usd <= 0:
+        return "total_usd must be positive"
+    if min_price <= 0:
+        return "min_price must be positive"
+    if max_price <= min_price:
+        return "max_price must be greater than min_price"
+    return "calculation failed"
+
+def _json_number(value):
+    return value if math.isfinite(value) else None
+
+def _csv_number(value):
+    return repr(value) if math.isfinite(value) else ""
+
+def format_rows(scenarios, amounts, amount_names, fmt="csv", line_numbers=None):
+    """
+    Formats one chunk of scenarios and their amounts as output text. `line_numbers`
+    (input line of each row) identify unparseable rows in their error.
+    """
+    if line_numbers is None:
+        line_numbers = range(1, len(scenarios) + 1)
+    columns = [scenarios[:, i] for i in range(len(FIELDS))] + list(amounts)
+    valid = np.isfinite(np.column_stack(columns)).all(axis=1) & (scenarios[:, 0] > 0)
+    rows = zip(*(column.tolist() for column in columns))
+
+    if fmt == "jsonl":
+        template = "{" + ", ".join(f'"{name}": %r' for name in FIELDS) + "".join(
+            f', "{name}": %.{AMOUNT_DIGITS}g' for name in amount_names) + ', "error": null}\n'
+        lines = []
+        for row, ok, number in zip(rows, valid.tolist(), line_numbers):
+            if ok:
+                lines.append(template % row)
+            else:
+                scenario = {name: _json_number(value) for name, value in zip(FIELDS, row)}
+                scenario.update({name: None for name in amount_names}, error=_error(number, *row[:len(FIELDS)]))
+                lines.append(json.dumps(scenario) + "\n")
+        return "".join(lines)
+
+    template = ",".join(["%r"] * len(FIELDS) + [f"%.{AMOUNT_DIGITS}g"] * len(amount_names)) + ",\n"
+    blanks = "," * len(amount_names)
+    return "".join(
+        template % row if ok else
+        ",".join(map(_csv_number, row[:len(FIELDS)])) + f"{blanks},{_error(number, *row[:len(FIELDS)])}\n"
+        for row, ok, number in zip(rows, valid.tolist(), line_numbers)
+    )
+
+def header(amount_names, fmt="csv"):
+    return ",".join(FIELDS + tuple(amount_names) + ("error",)) + "\n" if fmt == "csv" else ""
+
+# --- Driver ---
+
+def run(stream, out, calculate, amount_names, fmt="csv", chunk_size=CHUNK_SIZE):
+    """
+    Streams scenarios from `stream` to `out`. `calculate(total_usd, min_prices, max_prices)`
+    evaluates one chunk of arrays and returns one array per name in `amount_names`.
+    Returns the number of scenarios processed.
+    """
+    out.write(header(amount_names, fmt))
+    count = 0
+    for scenarios, line_numbers in read_chunks(stream, fmt, chunk_size):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            amounts = calculate(scenarios[:, 0], scenarios[:, 1], scenarios[:, 2])
+        out.write(format_rows(scenarios, amounts, amount_names, fmt, line_numbers))
+        out.flush()
+        count += len(scenarios)
+    return count
+
+def detect_format(path):
+    """The input format implied by a file name ('csv' unless it ends in .jsonl/.ndjson)."""
+    return "jsonl" if path and path.lower().endswith((".jsonl", ".ndjson")) else "csv"
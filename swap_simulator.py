@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Off-chain Uniswap V3 swap simulator.
+
+Replays `UniswapV3Pool.swap` (exact input) on a TickSnapshot with integer ports
+of SwapMath, SqrtPriceMath and FullMath, stepping through initialized ticks and
+bitmap word boundaries the same way the pool does, so the output amounts match
+the Quoter to the wei. No RPC call is made per trade size.
+
+Many sizes are simulated in one pass: the sizes are processed in ascending
+order and share every step they all complete in full, so each size only pays
+for its final, partial step.
+
+Usage:
+    python swap_simulator.py wbtc-eth --sell WBTC --amount 0.1 --amount 1 --amount 10
+    python swap_simulator.py pendle-eth --sell ETH --amount 5 --fee 3000
+"""
+import argparse
+from bisect import bisect_left, bisect_right
+
+from core import PENDLE_ADDRESS, WBTC_ADDRESS, WETH_ADDRESS, load_env, sort_tokens
+from pool_discovery import FEE_TIERS
+from tick_math import (
+    MAX_SQRT_RATIO, MAX_TICK, MAX_UINT256, MIN_SQRT_RATIO, MIN_TICK, Q96, get_sqrt_ratio_at_tick, get_tick_at_sqrt_ratio,
+)
+
+# Pairs the CLI can simulate: symbol -> token address
+PAIRS = {
+    "wbtc-eth": {"WBTC": WBTC_ADDRESS, "ETH": WETH_ADDRESS},
+    "pendle-eth": {"PENDLE": PENDLE_ADDRESS, "ETH": WETH_ADDRESS},
+}
+
+FEE_DENOMINATOR = 1000000
+RESOLUTION = 96
+
+# --- FullMath / SqrtPriceMath ---
+
+def mul_div(a, b, denominator):
+    return a * b // denominator
+
+def mul_div_rounding_up(a, b, denominator):
+    return -(-a * b // denominator)
+
+def div_rounding_up(a, b):
+    return -(-a // b)
+
+def get_amount0_delta(sqrt_a, sqrt_b, liquidity, round_up):
+    """token0 amount between two sqrt prices for `liquidity` (SqrtPriceMath.getAmount0Delta)."""
+    if sqrt_a > sqrt_b:
+        sqrt_a, sqrt_b = sqrt_b, sqrt_a
+    numerator1 = liquidity << RESOLUTION
+    numerator2 = sqrt_b - sqrt_a
+    if round_up:
+        return div_rounding_up(mul_div_rounding_up(numerator1, numerator2, sqrt_b), sqrt_a)
+    return mul_div(numerator1, numerator2, sqrt_b) // sqrt_a
+
+def get_amount1_delta(sqrt_a, sqrt_b, liquidity, round_up):
+    """token1 amount between two sqrt prices for `liquidity` (SqrtPriceMath.getAmount1Delta)."""
+    if sqrt_a > sqrt_b:
+        sqrt_a, sqrt_b = sqrt_b, sqrt_a
+    if round_up:
+        return mul_div_rounding_up(liquidity, sqrt_b - sqrt_a, Q96)
+    return mul_div(liquidity, sqrt_b - sqrt_a, Q96)
+
+def get_next_sqrt_price_from_input(sqrt_price, liquidity, amount_in, zero_for_one):
+    """Price after adding `amount_in` of the input token (SqrtPriceMath.getNextSqrtPriceFromInput)."""
+    if zero_for_one:
+        # getNextSqrtPriceFromAmount0RoundingUp, add = true
+        if amount_in == 0:
+            return sqrt_price
+        numerator1 = liquidity << RESOLUTION
+        product = amount_in * sqrt_price
+        if numerator1 + product <= MAX_UINT256:
+            return mul_div_rounding_up(numerator1, sqrt_price, numerator1 + product)
+        # The contract falls back to a less precise formula when the product overflows
+        return div_rounding_up(numerator1, numerator1 // sqrt_price + amount_in)
+    # getNextSqrtPriceFromAmount1RoundingDown, add = true
+    return sqrt_price + (amount_in << RESOLUTION) // liquidity
+
+# --- SwapMath ---
+
+def compute_swap_step(sqrt_current, sqrt_target, liquidity, amount_remaining, fee_pips):
+    """
+    One exact-input swap step towards `sqrt_target` (SwapMath.computeSwapStep).
+    Returns (sqrt_next, amount_in, amount_out, fee_amount).
+    """
+    zero_for_one = sqrt_current >= sqrt_target
+    amount_remaining_less_fee = mul_div(amount_remaining, FEE_DENOMINATOR - fee_pips, FEE_DENOMINATOR)
+    if zero_for_one:
+        amount_in = get_amount0_delta(sqrt_target, sqrt_current, liquidity, True)
+    else:
+        amount_in = get_amount1_delta(sqrt_current, sqrt_target, liquidity, True)
+
+    if amount_remaining_less_fee >= amount_in:
+        sqrt_next = sqrt_target
+    else:
+        sqrt_next = get_next_sqrt_price_from_input(sqrt_current, liquidity, amount_remaining_less_fee, zero_for_one)
+    reached_target = sqrt_next == sqrt_target
+
+    if zero_for_one:
+        if not reached_target:
+            amount_in = get_amount0_delta(sqrt_next, sqrt_current, liquidity, True)
+        amount_out = get_amount1_delta(sqrt_next, sqrt_current, liquidity, False)
+    else:
+        if not reached_target:
+            amount_in = get_amount1_delta(sqrt_current, sqrt_next, liquidity, True)
+        amount_out = get_amount0_delta(sqrt_current, sqrt_next, liquidity, False)
+
+    if not reached_target:
+        fee_amount = amount_remaining - amount_in
+    else:
+        fee_amount = mul_div_rounding_up(amount_in, fee_pips, FEE_DENOMINATOR - fee_pips)
+    return sqrt_next, amount_in, amount_out, fee_amount
+
+# --- Swap ---
+
+def next_initialized_tick_within_one_word(snapshot, tick, lte):
+    """
+    The next tick the pool steps to (TickBitmap.nextInitializedTickWithinOneWord):
+    the next initialized tick in the direction of the swap, or the edge of the
+    current bitmap word when there is none. Returns (tick, initialized).
+    """
+    spacing = snapshot.tick_spacing
+    compressed = tick // spacing
+    if lte:
+        word_start = ((compressed >> 8) << 8) * spacing
+        index = bisect_right(snapshot.ticks, compressed * spacing) - 1
+        if index >= 0 and snapshot.ticks[index] >= word_start:
+            return snapshot.ticks[index], True
+        return word_start, False
+    word_end = ((((compressed + 1) >> 8) << 8) + 255) * spacing
+    index = bisect_left(snapshot.ticks, (compressed + 1) * spacing)
+    if index < len(snapshot.ticks) and snapshot.ticks[index] <= word_end:
+        return snapshot.ticks[index], True
+    return word_end, False
+
+class _SwapState:
+    __slots__ = ("sqrt_price", "tick", "liquidity", "amount_in", "amount_out")
+
+    def __init__(self, sqrt_price, tick, liquidity, amount_in=0, amount_out=0):
+        self.sqrt_price = sqrt_price
+        self.tick = tick
+        self.liquidity = liquidity
+        self.amount_in = amount_in
+        self.amount_out = amount_out
+
+def _step_target(snapshot, state, zero_for_one, sqrt_price_limit):
+    tick_next, initialized = next_initialized_tick_within_one_word(snapshot, state.tick, zero_for_one)
+    tick_next = min(max(tick_next, MIN_TICK), MAX_TICK)
+    sqrt_next = get_sqrt_ratio_at_tick(tick_next)
+    if zero_for_one:
+        sqrt_target = max(sqrt_next, sqrt_price_limit)
+    else:
+        sqrt_target = min(sqrt_next, sqrt_price_limit)
+    return tick_next, initialized, sqrt_next, sqrt_target
+
+def _apply_step(snapshot, state, zero_for_one, tick_next, initialized, sqrt_next, step):
+    """Moves the swap state by one computed step, crossing the tick if it was reached."""
+    sqrt_start = state.sqrt_price
+    state.sqrt_price, amount_in, amount_out, fee_amount = step
+    state.amount_in += amount_in + fee_amount
+    state.amount_out += amount_out
+    if state.sqrt_price == sqrt_next:
+        if initialized:
+            net = snapshot.liquidity_net[bisect_left(snapshot.ticks, tick_next)]
+            state.liquidity += -net if zero_for_one else net
+        state.tick = tick_next - 1 if zero_for_one else tick_next
+    elif state.sqrt_price != sqrt_start:
+        state.tick = get_tick_at_sqrt_ratio(state.sqrt_price)
+
+def simulate_swaps(snapshot, amounts_in, zero_for_one, sqrt_price_limit=None):
+    """
+    Simulates exact-input swaps of every size in `amounts_in` (raw integer units of the
+    input token) against the snapshot's pool state.
+
+    Returns a list of dicts (in the order of `amounts_in`) with amount_in (actually
+    consumed, fees included; less than requested if the price limit or the end of the
+    liquidity is hit), amount_out, sqrt_price_x96, tick, price_impact (relative move of
+    the pool price) and slippage (execution price vs. the spot price, fees included).
+    """
+    if sqrt_price_limit is None:
+        sqrt_price_limit = MIN_SQRT_RATIO + 1 if zero_for_one else MAX_SQRT_RATIO - 1
+    fee_pips = snapshot.fee
+    spot_price = snapshot.sqrt_price_x96 ** 2 / Q96 ** 2
+    spot_price = spot_price if zero_for_one else 1 / spot_price
+
+    # Steps every remaining size completes in full advance this shared state
+    shared = _SwapState(snapshot.sqrt_price_x96, snapshot.tick, snapshot.liquidity)
+    results = [None] * len(amounts_in)
+    for i in sorted(range(len(amounts_in)), key=amounts_in.__getitem__):
+        amount = amounts_in[i]
+        state = None
+        while True:
+            current = state or shared
+            remaining = amount - current.amount_in
+            if remaining <= 0 or current.sqrt_price == sqrt_price_limit:
+                break
+            target = _step_target(snapshot, current, zero_for_one, sqrt_price_limit)
+            step = compute_swap_step(current.sqrt_price, target[3], current.liquidity, remaining, fee_pips)
+            if state is None and step[0] != target[3]:
+                # This size stops inside the step: continue on a private copy
+                state = current = _SwapState(shared.sqrt_price, shared.tick, shared.liquidity, shared.amount_in, shared.amount_out)
+            _apply_step(snapshot, current, zero_for_one, *target[:3], step)
+        final = state or shared
+
+        if final.amount_in:
+            execution_price = final.amount_out / final.amount_in
+            slippage = 1 - execution_price / spot_price
+        else:
+            slippage = 0.0
+        final_price = final.sqrt_price ** 2 / Q96 ** 2
+        results[i] = {
+            "amount_requested": amount,
+            "amount_in": final.amount_in,
+            "amount_out": final.amount_out,
+            "sqrt_price_x96": final.sqrt_price,
+            "tick": final.tick,
+            "price_impact": abs(final_price / (snapshot.sqrt_price_x96 ** 2 / Q96 ** 2) - 1),
+            "slippage": slippage,
+        }
+    return results
+
+# --- Main Execution ---
+
+def main():
+    # .env is loaded before price_ratio_monitor reads its settings
+    load_env()
+    from price_ratio_monitor import get_pool_address, get_token_decimals, get_w3
+    from metadata_cache import ZERO_ADDRESS
+    from tick_snapshot import fetch_snapshot
+
+    parser = argparse.ArgumentParser(description="Simulate Uniswap V3 swaps of several sizes across fee tiers.")
+    parser.add_argument("pair", choices=sorted(PAIRS), help="Pair to simulate.")
+    parser.add_argument("--sell", required=True, help="Symbol of the token to sell.")
+    parser.add_argument("--amount", type=float, action="append", required=True, help="Amount to sell, in tokens (repeatable).")
+    parser.add_argument("--fee", type=int, action="append", choices=FEE_TIERS, help="Fee tier(s) to simulate (default: all existing).")
+    args = parser.parse_args()
+
+    tokens = PAIRS[args.pair]
+    if args.sell not in tokens:
+        parser.error(f"--sell must be one of {', '.join(tokens)}")
+    (buy_symbol, token_out), = [(symbol, address) for symbol, address in tokens.items() if symbol != args.sell]
+    token_in = tokens[args.sell]
+    token0, _ = sort_tokens(token_in, token_out)
+    zero_for_one = token_in == token0
+
+    decimals_in, decimals_out = get_token_decimals(token_in), get_token_decimals(token_out)
+    amounts = [int(amount * 10 ** decimals_in) for amount in args.amount]
+
+    w3 = get_w3()
+    for fee in args.fee or FEE_TIERS:
+        try:
+            pool_address = get_pool_address(token_in, token_out, fee)
+        except ValueError as e:
+            print(f"Error: {e}")
+            continue
+        if pool_address == ZERO_ADDRESS:
+            continue
+        try:
+            snapshot = fetch_snapshot(w3, pool_address)
+        except Exception as e:
+            print(f"Error reading pool {pool_address}: {e}")
+            continue
+        if snapshot.liquidity == 0 and not snapshot.ticks:
+            continue
+
+        print(f"\n--- {args.sell} -> {buy_symbol}, fee {fee / 10000}% ({pool_address}, block {snapshot.block_number}) ---")
+        print(f"{'Sell':>16} {'Receive':>20} {'Avg price':>16} {'Slippage':>9} {'Impact':>9} {'End tick':>9}")
+        for result in simulate_swaps(snapshot, amounts, zero_for_one):
+            amount_in = result["amount_in"] / 10 ** decimals_in
+            amount_out = result["amount_out"] / 10 ** decimals_out
+            partial = " (partial fill)" if result["amount_in"] < result["amount_requested"] else ""
+            print(f"{amount_in:>16.6f} {amount_out:>20.6f} {amount_out / amount_in if amount_in else 0:>16.6f} "
+                  f"{result['slippage']:>8.3%} {result['price_impact']:>8.3%} {result['tick']:>9}{partial}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Exact Uniswap V3 tick and price math.
+
+`get_sqrt_ratio_at_tick` and `get_tick_at_sqrt_ratio` are integer ports of
+Uniswap's TickMath library: they use the same bit-constant lookup table and
+return exactly what the pool contracts compute. Prices are converted from
+sqrtPriceX96 with exact integer arithmetic and rounded once to a float, so
+8-vs-18-decimal pairs like WBTC/WETH keep full precision.
+
+For arrays of ticks, `sqrt_prices_at_ticks` / `prices_at_ticks` apply the same
+bit-constant table with NumPy (float64), without a Python loop per tick.
+
+Prices are token1 per token0, adjusted for decimals (the Uniswap convention).
+"""
+import functools
+from fractions import Fraction
+from math import isqrt
+
+MIN_TICK = -887272
+MAX_TICK = 887272
+
+MIN_SQRT_RATIO = 4295128739
+MAX_SQRT_RATIO = 1461446703485210103287273052203988822378723970342
+
+Q96 = 1 << 96
+Q192 = 1 << 192
+MAX_UINT256 = (1 << 256) - 1
+
+# ratio multipliers for each bit of |tick|: 1 / sqrt(1.0001) ** (2 ** i), as Q128.128
+TICK_BIT_CONSTANTS = [
+    0xfffcb933bd6fad37aa2d162d1a594001,
+    0xfff97272373d413259a46990580e213a,
+    0xfff2e50f5f656932ef12357cf3c7fdcc,
+    0xffe5caca7e10e4e61c3624eaa0941cd0,
+    0xffcb9843d60f6159c9db58835c926644,
+    0xff973b41fa98c081472e6896dfb254c0,
+    0xff2ea16466c96a3843ec78b326b52861,
+    0xfe5dee046a99a2a811c461f1969c3053,
+    0xfcbe86c7900a88aedcffc83b479aa3a4,
+    0xf987a7253ac413176f2b074cf7815e54,
+    0xf3392b0822b70005940c7a398e4b70f3,
+    0xe7159475a2c29b7443b29c7fa6e889d9,
+    0xd097f3bdfd2022b8845ad8f792aa5825,
+    0xa9f746462d870fdf8a65dc1f90e061e5,
+    0x70d869a156d2a1b890bb3df62baf32f7,
+    0x31be135f97d08fd981231505542fcfa6,
+    0x9aa508b5b7a84e1c677de54f3e99bc9,
+    0x5d6af8dedb81196699c329225ee604,
+    0x2216e584f5fa1ea926041bedfe98,
+    0x48a170391f7dc42444e8fa2,
+]
+
+# --- TickMath ---
+
+@functools.lru_cache(maxsize=65536)
+def get_sqrt_ratio_at_tick(tick):
+    """Returns sqrt(1.0001 ** tick) as a Q64.96 integer, exactly as TickMath.getSqrtRatioAtTick."""
+    if not MIN_TICK <= tick <= MAX_TICK:
+        raise ValueError(f"Tick {tick} is outside [{MIN_TICK}, {MAX_TICK}]")
+    abs_tick = abs(tick)
+
+    ratio = TICK_BIT_CONSTANTS[0] if abs_tick & 1 else 1 << 128
+    for bit in range(1, len(TICK_BIT_CONSTANTS)):
+        if abs_tick & (1 << bit):
+            ratio = (ratio * TICK_BIT_CONSTANTS[bit]) >> 128
+
+    if tick > 0:
+        ratio = MAX_UINT256 // ratio
+
+    # Round up when converting from Q128.128 to Q64.96
+    return (ratio >> 32) + (0 if ratio % (1 << 32) == 0 else 1)
+
+def get_tick_at_sqrt_ratio(sqrt_price_x96):
+    """
+    Returns the greatest tick whose sqrt ratio is <= sqrt_price_x96,
+    exactly as TickMath.getTickAtSqrtRatio.
+    """
+    if not MIN_SQRT_RATIO <= sqrt_price_x96 < MAX_SQRT_RATIO:
+        raise ValueError(f"sqrtPriceX96 {sqrt_price_x96} is outside [{MIN_SQRT_RATIO}, {MAX_SQRT_RATIO})")
+    ratio = sqrt_price_x96 << 32
+
+    msb = ratio.bit_length() - 1
+    r = ratio >> (msb - 127) if msb >= 128 else ratio << (127 - msb)
+
+    # Integer part of log2, then 14 fractional bits by repeated squaring
+    log_2 = (msb - 128) << 64
+    for i in range(14):
+        r = (r * r) >> 127
+        f = r >> 128
+        log_2 |= f << (63 - i)
+        r >>= f
+
+    log_sqrt10001 = log_2 * 255738958999603826347141  # 128.128 number
+
+    tick_low = (log_sqrt10001 - 3402992956809132418596140100660247210) >> 128
+    tick_high = (log_sqrt10001 + 291339464771989622907027621153398088495) >> 128
+
+    if tick_low == tick_high:
+        return tick_low
+    return tick_high if get_sqrt_ratio_at_tick(tick_high) <= sqrt_price_x96 else tick_low
+
+# --- Price Conversions ---
+
+def sqrt_price_x96_to_price(sqrt_price_x96, decimals0, decimals1):
+    """Converts a sqrtPriceX96 to a human-readable price (token1 per token0), rounding only once."""
+    numerator = sqrt_price_x96 * sqrt_price_x96
+    denominator = Q192
+    if decimals0 >= decimals1:
+        numerator *= 10 ** (decimals0 - decimals1)
+    else:
+        denominator *= 10 ** (decimals1 - decimals0)
+    # int / int is correctly rounded in Python, even for very large integers
+    return numerator / denominator
+
+def tick_to_price(tick, decimals0, decimals1):
+    """Converts a Uniswap V3 tick to a human-readable price (token1 per token0)."""
+    return sqrt_price_x96_to_price(get_sqrt_ratio_at_tick(tick), decimals0, decimals1)
+
+def price_to_sqrt_price_x96(price, decimals0, decimals1):
+    """Converts a human-readable price (token1 per token0) to a sqrtPriceX96, rounding down."""
+    raw_price = Fraction(price) * Fraction(10) ** (decimals1 - decimals0)
+    return isqrt(raw_price.numerator * Q192 // raw_price.denominator)
+
+def price_to_tick(price, decimals0, decimals1):
+    """Returns the tick at or just below a human-readable price (token1 per token0)."""
+    sqrt_price_x96 = price_to_sqrt_price_x96(price, decimals0, decimals1)
+    return get_tick_at_sqrt_ratio(min(max(sqrt_price_x96, MIN_SQRT_RATIO), MAX_SQRT_RATIO - 1))
+
+# --- Vectorized ---
+
+@functools.cache
+def _bit_factors():
+    import numpy as np
+    return np.array([constant / 2 ** 128 for constant in TICK_BIT_CONSTANTS])
+
+def sqrt_prices_at_ticks(ticks):
+    """
+    Returns sqrt(1.0001 ** tick) for an array of ticks as float64, using the
+    TickMath bit-constant table (relative error ~1e-15).
+    """
+    import numpy as np
+
+    ticks = np.asarray(ticks, dtype=np.int64)
+    if ticks.size and (ticks.min() < MIN_TICK or ticks.max() > MAX_TICK):
+        raise ValueError(f"Ticks must be within [{MIN_TICK}, {MAX_TICK}]")
+    abs_ticks = np.abs(ticks)
+
+    ratio = np.ones(ticks.shape)
+    for bit, factor in enumerate(_bit_factors()):
+        ratio = np.where(abs_ticks & (1 << bit), ratio * factor, ratio)
+    return np.where(ticks > 0, 1 / ratio, ratio)
+
+def prices_at_ticks(ticks, decimals0, decimals1):
+    """Converts an array of ticks to human-readable prices (token1 per token0)."""
+    return sqrt_prices_at_ticks(ticks) ** 2 * 10.0 ** (decimals0 - decimals1)
+
+def get_sqrt_ratios_at_ticks(ticks):
+    """Exact Q64.96 sqrt ratios for an iterable of ticks (Python ints, cached per tick)."""
+    return [get_sqrt_ratio_at_tick(int(tick)) for tick in ticks]
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Snapshot of a Uniswap V3 pool's tick liquidity, for offline depth queries.
+
+A snapshot is read in three Multicall3 rounds, all pinned to one block: the pool
+state, every `tickBitmap` word, then `ticks(i)` for each initialized tick. The
+initialized ticks are kept in a sorted array together with the active liquidity
+of each segment between them and prefix sums of the token amounts each segment
+holds, so:
+
+  - liquidity_at_tick(tick) is a binary search, exact (Python ints);
+  - amounts_between / depth (tokens available within +-X% of the price) are two
+    binary searches plus a prefix-sum difference (float64).
+
+No query makes an RPC call.
+
+Usage:
+    python tick_snapshot.py 0xC6962004f452bE9203591991D15f6b388e09E8D0 --depth 0.5 --depth 2
+"""
+import argparse
+import sys
+from bisect import bisect_right
+
+import numpy as np
+
+from core import TICK_TYPES, get_metadata_cache, get_web3, load_env
+from multicall import Call, aggregate3, aggregate3_chunked
+from tick_math import MAX_TICK, MIN_TICK, Q96, sqrt_price_x96_to_price, sqrt_prices_at_ticks
+
+# Bitmap words are cheap to read; tick structs touch several storage slots
+BITMAP_BATCH_SIZE = 500
+TICKS_BATCH_SIZE = 200
+
+DEFAULT_DEPTHS = [0.5, 1.0, 2.0, 5.0]
+
+# --- Snapshot ---
+
+class TickSnapshot:
+    """
+    Initialized ticks of a pool at one block, with cumulative liquidity.
+
+    `ticks` is sorted; `liquidity_net`, `fee_growth_outside0` and `fee_growth_outside1`
+    are aligned with it. `active_liquidity[k]` is the pool liquidity between
+    ticks[k - 1] and ticks[k] (k = 0 is below the first tick, k = n above the last).
+    """
+
+    def __init__(self, pool, block_number, token0, token1, fee, tick_spacing, sqrt_price_x96, tick, liquidity,
+                 ticks, liquidity_net, fee_growth_outside0=None, fee_growth_outside1=None):
+        self.pool = pool
+        self.block_number = block_number
+        self.token0 = token0
+        self.token1 = token1
+        self.fee = fee
+        self.tick_spacing = tick_spacing
+        self.sqrt_price_x96 = sqrt_price_x96
+        self.tick = tick
+        self.liquidity = liquidity
+
+        order = sorted(range(len(ticks)), key=ticks.__getitem__)
+        self.ticks = [ticks[i] for i in order]
+        self.liquidity_net = [liquidity_net[i] for i in order]
+        self.fee_growth_outside0 = [fee_growth_outside0[i] for i in order] if fee_growth_outside0 else None
+        self.fee_growth_outside1 = [fee_growth_outside1[i] for i in order] if fee_growth_outside1 else None
+
+        # Cumulative liquidityNet, anchored so the current segment matches the pool's liquidity()
+        # (this also holds when only part of the bitmap was read)
+        cumulative = [0]
+        for net in self.liquidity_net:
+            cumulative.append(cumulative[-1] + net)
+        offset = liquidity - cumulative[bisect_right(self.ticks, tick)]
+        self.active_liquidity = [value + offset for value in cumulative]
+
+        # Segment boundaries as float sqrt prices, and the token amounts each full segment holds
+        boundaries = np.array([MIN_TICK] + self.ticks + [MAX_TICK], dtype=np.int64)
+        self._sqrt_bounds = sqrt_prices_at_ticks(boundaries)
+        segment_liquidity = np.array(self.active_liquidity, dtype=float)
+        lower, upper = self._sqrt_bounds[:-1], self._sqrt_bounds[1:]
+        self._segment_liquidity = segment_liquidity
+        self._prefix0 = np.concatenate([[0.0], np.cumsum(segment_liquidity * (1 / lower - 1 / upper))])
+        self._prefix1 = np.concatenate([[0.0], np.cumsum(segment_liquidity * (upper - lower))])
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def liquidity_at_tick(self, tick):
+        """Active liquidity when the pool's current tick is `tick` (exact)."""
+        return self.active_liquidity[bisect_right(self.ticks, tick)]
+
+    def next_initialized_tick(self, tick, zero_for_one):
+        """
+        The next initialized tick the price reaches from `tick`, or None: at or below `tick`
+        when selling token0 (price falls), strictly above it otherwise.
+        """
+        index = bisect_right(self.ticks, tick)
+        if zero_for_one:
+            return self.ticks[index - 1] if index > 0 else None
+        return self.ticks[index] if index < len(self.ticks) else None
+
+    def _segment(self, sqrt_price):
+        return min(max(int(np.searchsorted(self._sqrt_bounds, sqrt_price, side="right")) - 1, 0), len(self.ticks))
+
+    def _partial(self, segment, sqrt_lower, sqrt_upper):
+        liquidity = self._segment_liquidity[segment]
+        return liquidity * (1 / sqrt_lower - 1 / sqrt_upper), liquidity * (sqrt_upper - sqrt_lower)
+
+    def amounts_between(self, sqrt_lower, sqrt_upper):
+        """
+        Raw token amounts (amount0, amount1) held by the pool's liquidity between two
+        sqrt prices (floats, sqrt of raw token1 per token0).
+        """
+        if sqrt_upper <= sqrt_lower:
+            return 0.0, 0.0
+        first, last = self._segment(sqrt_lower), self._segment(sqrt_upper)
+        if first == last:
+            amount0, amount1 = self._partial(first, sqrt_lower, sqrt_upper)
+            return float(amount0), float(amount1)
+        head = self._partial(first, sqrt_lower, self._sqrt_bounds[first + 1])
+        tail = self._partial(last, self._sqrt_bounds[last], sqrt_upper)
+        return (
+            float(head[0] + self._prefix0[last] - self._prefix0[first + 1] + tail[0]),
+            float(head[1] + self._prefix1[last] - self._prefix1[first + 1] + tail[1]),
+        )
+
+    def depth(self, pct):
+        """
+        Liquidity within `pct` percent of the current price, in raw units:
+        token0 that can be bought before the price rises by pct (asks), and token1
+        that can be bought before it falls by pct (bids).
+        """
+        sqrt_price = self.sqrt_price_x96 / Q96
+        asks = self.amounts_between(sqrt_price, sqrt_price * (1 + pct / 100) ** 0.5)[0]
+        bids = self.amounts_between(sqrt_price * max(1 - pct / 100, 0) ** 0.5, sqrt_price)[1]
+        return asks, bids
+
+    def __repr__(self):
+        return f"TickSnapshot({self.pool}, block={self.block_number}, ticks={len(self.ticks)}, tick={self.tick})"
+
+# --- Fetching ---
+
+def bitmap_words(tick_spacing, around_tick=None, word_radius=None):
+    """Positions of the tickBitmap words to read (all usable words, or a radius around a tick)."""
+    first, last = (MIN_TICK // tick_spacing) >> 8, (MAX_TICK // tick_spacing) >> 8
+    if word_radius is not None and around_tick is not None:
+        center = (around_tick // tick_spacing) >> 8
+        first, last = max(first, center - word_radius), min(last, center + word_radius)
+    return range(first, last + 1)
+
+def initialized_ticks(words, bitmaps, tick_spacing):
+    """Decodes tickBitmap words into the sorted list of initialized ticks."""
+    ticks = []
+    for word, bitmap in zip(words, bitmaps):
+        while bitmap:
+            bit = (bitmap & -bitmap).bit_length() - 1
+            ticks.append(((word << 8) + bit) * tick_spacing)
+            bitmap &= bitmap - 1
+    return ticks
+
+def fetch_snapshot(w3, pool, word_radius=None, block_identifier=None):
+    """
+    Reads a TickSnapshot of `pool` in three multicall rounds pinned to one block.
+    `word_radius` limits the bitmap scan to that many words (256 tick spacings each)
+    on both sides of the current tick.
+    """
+    block_number = w3.eth.block_number if block_identifier is None else block_identifier
+
+    # Round 1: pool state
+    slot0, liquidity, tick_spacing, fee, token0, token1 = aggregate3(w3, [
+        Call(pool, "slot0()", returns=["uint160", "int24"], allow_failure=False),
+        Call(pool, "liquidity()", returns=["uint128"], allow_failure=False),
+        Call(pool, "tickSpacing()", returns=["int24"], allow_failure=False),
+        Call(pool, "fee()", returns=["uint24"], allow_failure=False),
+        Call(pool, "token0()", returns=["address"], allow_failure=False),
+        Call(pool, "token1()", returns=["address"], allow_failure=False),
+    ], block_number)
+    sqrt_price_x96, tick = slot0
+
+    # Round 2: which ticks are initialized
+    words = bitmap_words(tick_spacing, tick, word_radius)
+    bitmaps = aggregate3_chunked(w3, [
+        Call(pool, "tickBitmap(int16)", [word], ["uint256"], allow_failure=False) for word in words
+    ], BITMAP_BATCH_SIZE, block_number)
+    ticks = initialized_ticks(words, bitmaps, tick_spacing)
+
+    # Round 3: their liquidity and fee growth
+    infos = aggregate3_chunked(w3, [
+        Call(pool, "ticks(int24)", [t], TICK_TYPES, allow_failure=False) for t in ticks
+    ], TICKS_BATCH_SIZE, block_number)
+
+    return TickSnapshot(
+        pool, block_number, token0, token1, fee, tick_spacing, sqrt_price_x96, tick, liquidity,
+        ticks,
+        [info[1] for info in infos],
+        [info[2] for info in infos],
+        [info[3] for info in infos],
+    )
+
+# --- Main Execution ---
+
+def print_depth(snapshot, decimals0, decimals1, symbol0, symbol1, depths=DEFAULT_DEPTHS):
+    """Prints the token amounts available within each +-X% of the current price."""
+    price = sqrt_price_x96_to_price(snapshot.sqrt_price_x96, decimals0, decimals1)
+    print(f"Price: {price:.8f} {symbol1} per {symbol0} (tick {snapshot.tick}, "
+          f"{len(snapshot)} initialized ticks, block {snapshot.block_number})")
+    print(f"{'Range':>8}  {symbol0 + ' to +X%':>22}  {symbol1 + ' to -X%':>22}")
+    for pct in depths:
+        asks, bids = snapshot.depth(pct)
+        print(f"{pct:>7}%  {asks / 10 ** decimals0:>22.6f}  {bids / 10 ** decimals1:>22.6f}")
+
+def main():
+    from pool_info import resolve_token_calls, store_token_results
+
+    parser = argparse.ArgumentParser(description="Snapshot a Uniswap V3 pool's tick liquidity and print its depth.")
+    parser.add_argument("pool", help="Pool address.")
+    parser.add_argument("--depth", type=float, action="append", help="Depth range in percent (repeatable).")
+    parser.add_argument("--word-radius", type=int, help="Only scan this many bitmap words around the current tick.")
+    args = parser.parse_args()
+    load_env()
+
+    w3 = get_web3()
+    try:
+        snapshot = fetch_snapshot(w3, w3.to_checksum_address(args.pool), args.word_radius)
+    except Exception as e:
+        print(f"Error reading pool {args.pool}: {e}")
+        sys.exit(1)
+
+    cache = get_metadata_cache()
+    tokens, missing, calls = resolve_token_calls(cache, [snapshot.token0, snapshot.token1])
+    store_token_results(cache, tokens, missing, aggregate3(w3, calls))
+    (symbol0, decimals0), (symbol1, decimals1) = tokens[snapshot.token0], tokens[snapshot.token1]
+    if decimals0 is None or decimals1 is None:
+        print(f"Error reading decimals() of the tokens of pool {args.pool}")
+        sys.exit(1)
+    print_depth(snapshot, decimals0, decimals1, symbol0, symbol1, args.depth or DEFAULT_DEPTHS)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
+import argparse
+import contextlib
 import os
 import sys
 import requests
 import math
 from dotenv import load_dotenv
 
+import metrics
+import rate_limit
+
 # --- Price Fetching ---
 
 def get_usd_prices():
@@ -11,14 +16,15 @@ def get_usd_prices():
     url = "https://api.coingecko.com/api/v3/simple/price"
     params = {'ids': 'wrapped-bitcoin,ethereum', 'vs_currencies': 'usd'}
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
+        with metrics.http_request("coingecko"):
+            response = rate_limit.get(url, params=params)
+            response.raise_for_status()
         data = response.json()
         return {
             'wbtc_usd': data['wrapped-bitcoin']['usd'],
             'eth_usd': data['ethereum']['usd']
         }
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, rate_limit.RateLimited) as e:
         print(f"Error fetching USD prices from CoinGecko: {e}")
         return None
 
@@ -63,6 +69,15 @@ def calculate_liquidity(total_usd, min_price_eth_per_wbtc, max_price_eth_per_wbt
     return amount_wbtc, amount_eth
 
 
+def calculate_batch(total_usd, min_prices, max_prices, current_price_eth_per_wbtc, usd_prices):
+    """Vectorized calculate_liquidity over arrays of scenarios. Returns (WBTC, ETH) amount arrays, NaN where invalid."""
+    from range_sweep import sweep
+
+    # The sweep's convention for wbtc-eth (see range_sweep.PAIRS): ETH is token0 of the
+    # ETH/WBTC ratio, which is the position calculate_liquidity builds after its inversion
+    results = sweep(min_prices, max_prices, total_usd, current_price_eth_per_wbtc,
+                    usd_prices['eth_usd'], usd_prices['wbtc_usd'])
+    return results["amount1"], results["amount0"]
 
 # --- Main Execution ---
 
@@ -100,16 +115,56 @@ def get_user_input(current_price):
             
     return total_usd, min_price, max_price
 
-def main():
-    print("--- Uniswap V3 Liquidity Calculator ---")
-    print("This script helps you calculate the required tokens for a liquidity position.")
-    print("-" * 25, "\n")
-
-    print("Fetching prices from CoinGecko...")
-    usd_prices = get_usd_prices()
+def run_batch(path, fmt, usd_prices):
+    """Streams scenarios from a file ('-' for stdin) to stdout with one price snapshot."""
+    import time
+    import scenario_batch
 
-    if not usd_prices:
+    eth_wbtc_price = usd_prices['eth_usd'] / usd_prices['wbtc_usd']
+    stream = sys.stdin if path == "-" else open(path, "r")
+    start = time.perf_counter()
+    try:
+        count = scenario_batch.run(
+            stream, sys.stdout,
+            lambda total_usd, min_prices, max_prices: calculate_batch(total_usd, min_prices, max_prices, eth_wbtc_price, usd_prices),
+            ["amount_wbtc", "amount_eth"], fmt or scenario_batch.detect_format(path),
+        )
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    elapsed = time.perf_counter() - start
+    print(f"Processed {count:,} scenarios in {elapsed:.2f}s at ETH/WBTC {eth_wbtc_price:.8f}", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Calculate the tokens needed for an ETH/WBTC Uniswap V3 position.")
+    parser.add_argument("--batch", metavar="FILE", help="Read scenarios (total_usd,min_price,max_price) from FILE, or '-' for stdin, and stream results to stdout instead of prompting.")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Batch input and output format (default: from the file extension, else csv).")
+    parser.add_argument("--wbtc-usd", type=float, help="WBTC price in USD (default: fetched from CoinGecko).")
+    parser.add_argument("--eth-usd", type=float, help="ETH price in USD (default: fetched from CoinGecko).")
+    args = parser.parse_args()
+
+    if not args.batch:
+        print("--- Uniswap V3 Liquidity Calculator ---")
+        print("This script helps you calculate the required tokens for a liquidity position.")
+        print("-" * 25, "\n")
+
+    # In batch mode stdout carries results only
+    console = sys.stderr if args.batch else sys.stdout
+    if args.wbtc_usd and args.eth_usd:
+        usd_prices = {'wbtc_usd': args.wbtc_usd, 'eth_usd': args.eth_usd}
+    else:
+        with contextlib.redirect_stdout(console):
+            print("Fetching prices from CoinGecko...")
+            usd_prices = get_usd_prices()
+        if not usd_prices:
+            sys.exit(1)
+
+    if args.batch:
+        run_batch(args.batch, args.format, usd_prices)
+        return
 
     eth_wbtc_price = usd_prices['eth_usd'] / usd_prices['wbtc_usd']
 